@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+清理日志写入延迟基准
+
+测量 add_clean_log 在调用线程（即托盘 UI 回调线程）上的耗时，
+对比同步写入与异步批量写入在 none / flush / fsync 三种落盘策略下的表现。
+
+用法:
+    python benchmarks/bench_log_write.py [--count 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.log_manager import LogManager
+
+
+def measure(log_file, count, write_behind, durability):
+    """返回每次 add_clean_log 调用的耗时列表(毫秒)，以及 close 的耗时"""
+    manager = LogManager(log_file, write_behind=write_behind, durability=durability)
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.25)
+        samples.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    manager.close()
+    close_ms = (time.perf_counter() - start) * 1000
+    return samples, close_ms
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=200, help="每种组合写入的日志条数")
+    args = parser.parse_args()
+
+    print(f"{'mode':<13}{'policy':<8}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}{'close':>10}  (ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for write_behind in (False, True):
+            for durability in LogManager.DURABILITY_POLICIES:
+                mode = "write-behind" if write_behind else "sync"
+                log_file = os.path.join(tmp, f"{mode}-{durability}.log")
+                samples, close_ms = measure(log_file, args.count, write_behind, durability)
+                print(f"{mode:<13}{durability:<8}"
+                      f"{statistics.mean(samples):>9.3f}{percentile(samples, 50):>9.3f}"
+                      f"{percentile(samples, 95):>9.3f}{max(samples):>9.3f}{close_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
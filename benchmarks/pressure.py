@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+合成内存压力生成器
+
+在子进程中分配 N GB 内存并逐页写入，使这些页真正驻留在物理内存中，
+用于在 Linux 上复现高内存占用，测试清理和自动清理。
+
+用法:
+    python benchmarks/pressure.py --gb 2 --hold 60
+"""
+
+import argparse
+import multiprocessing
+import time
+
+PAGE_SIZE = 4096
+CHUNK_BYTES = 256 * 1024 * 1024
+
+
+def _hold_memory(nbytes, ready, stop):
+    """子进程：分块分配并逐页写入，然后保持到 stop 被设置"""
+    chunks = []
+    remaining = nbytes
+    while remaining > 0:
+        size = min(CHUNK_BYTES, remaining)
+        chunk = bytearray(size)
+        # bytearray is zero-filled lazily by the kernel; touching one byte per page commits it
+        chunk[::PAGE_SIZE] = b"\x01" * len(range(0, size, PAGE_SIZE))
+        chunks.append(chunk)
+        remaining -= size
+    ready.set()
+    stop.wait()
+
+
+class MemoryPressure:
+    """
+    子进程内存压力
+
+    用作上下文管理器时，进入即分配并等待全部页面写入完成，退出时释放:
+
+        with MemoryPressure(gb=1):
+            ...
+    """
+
+    def __init__(self, gb, timeout=120):
+        if gb <= 0:
+            raise ValueError(f"gb must be positive, got {gb}")
+        self.nbytes = int(gb * 1024 ** 3)
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ready = self._ctx.Event()
+        self._stop = self._ctx.Event()
+        self._process = None
+
+    @property
+    def pid(self):
+        return self._process.pid if self._process is not None else None
+
+    def start(self):
+        """启动子进程，直到内存全部写入后返回"""
+        self._process = self._ctx.Process(
+            target=_hold_memory,
+            args=(self.nbytes, self._ready, self._stop),
+            name="memory-pressure",
+            daemon=True
+        )
+        self._process.start()
+        if not self._ready.wait(self.timeout):
+            self.stop()
+            raise TimeoutError(f"Allocating {self.nbytes} bytes took longer than {self.timeout}s")
+        if not self._process.is_alive():
+            raise RuntimeError(f"Pressure process exited early with code {self._process.exitcode}")
+        return self
+
+    def stop(self):
+        """释放内存并结束子进程"""
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成内存压力生成器")
+    parser.add_argument("--gb", type=float, required=True, help="分配的内存大小(GB)")
+    parser.add_argument("--hold", type=float, default=30, help="保持时间(秒)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with MemoryPressure(args.gb) as pressure:
+        print(f"pid {pressure.pid} 已占用 {args.gb} GB (耗时 {time.perf_counter() - start:.1f}s)，保持 {args.hold}s")
+        time.sleep(args.hold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基准测试套件
+
+覆盖监控采样、清理（fake 后端）、日志读写、图标绘制和一次完整采样周期的耗时，
+结果写入 JSON，便于在不同提交之间比较。另外直接测量 @timed 的每次调用开销，
+超出 INSTRUMENTATION_BUDGET_PERCENT 时以非零状态退出。
+
+用法:
+    python benchmarks/run.py                         # 运行全部用例
+    python benchmarks/run.py --filter log            # 只运行名称包含 log 的用例
+    python benchmarks/run.py --compare old.json      # 与之前的结果比较
+    python benchmarks/run.py --pressure-gb 2         # 额外运行内存压力场景（自动清理路径）
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.memory_monitor import MemoryMonitor
+from src.memory_cleaner import MemoryCleaner
+from src.clean_backends import FakeBackend, LinuxDropCachesBackend
+from src.log_manager import LogManager
+from src.clean_record import CleanRecord
+from src.clean_analytics import CleanAnalytics
+from src.scheduler import MonitorScheduler
+from src.adaptive_sampler import AdaptiveSampler
+from src.instrumentation import metrics
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# 与基准相比 p50 变慢超过该比例视为回退
+REGRESSION_RATIO = 1.2
+
+CASES = {}
+
+
+def case(name):
+    """注册基准用例
+
+    被装饰的函数接收临时目录，返回待计时的无参函数，
+    或 (函数, 清理函数) 二元组，清理函数在计时结束后调用。
+    """
+    def register(factory):
+        CASES[name] = factory
+        return factory
+    return register
+
+
+@case("monitor.get_memory_info")
+def _monitor_basic(tmp):
+    return MemoryMonitor().get_memory_info
+
+
+@case("monitor.get_extended_info")
+def _monitor_extended(tmp):
+    return MemoryMonitor().get_extended_info
+
+
+@case("cleaner.clean[fake]")
+def _clean_fake(tmp):
+    cleaner = MemoryCleaner(monitor=MemoryMonitor(), backend=FakeBackend())
+    return cleaner.clean
+
+
+def _full_log(tmp, name, **kwargs):
+    """返回一个日志已写满 MAX_LOGS 条的 LogManager"""
+    manager = LogManager(os.path.join(tmp, name), **kwargs)
+    manager._save_logs([
+        CleanRecord(id=f"{i:032x}", timestamp=datetime.now().isoformat(), before_percent=80,
+                    after_percent=60, freed_gb=1.0, mode="working_set", trigger="auto", duration_ms=12.5)
+        for i in range(LogManager.MAX_LOGS)
+    ])
+    return manager
+
+
+@case("log.add_clean_log[sync]")
+def _log_write_sync(tmp):
+    manager = _full_log(tmp, "sync.log")
+    return lambda: manager.add_clean_log(80, 60, 1.0)
+
+
+@case("log.add_clean_log[write_behind]")
+def _log_write_behind(tmp):
+    manager = _full_log(tmp, "write_behind.log", write_behind=True)
+    return lambda: manager.add_clean_log(80, 60, 1.0), manager.close
+
+
+@case("log.get_recent_logs")
+def _log_read(tmp):
+    manager = _full_log(tmp, "read.log")
+    return lambda: manager.get_recent_logs(limit=10)
+
+
+def _varying_percent():
+    """每次调用返回不同的使用率，依次覆盖所有填充高度"""
+    state = {"percent": 0.0}
+
+    def next_percent():
+        state["percent"] = (state["percent"] + 3.7) % 100
+        return state["percent"]
+    return next_percent
+
+
+@case("icon.render")
+def _icon_render(tmp):
+    """缓存未命中：每次清空缓存，测量真正的绘制开销"""
+    from src.icon_renderer import render_memory_icon, clear_icon_cache
+
+    percent = _varying_percent()
+
+    def render():
+        clear_icon_cache()
+        render_memory_icon("yellow", percent())
+    return render, clear_icon_cache
+
+
+@case("icon.render[cached]")
+def _icon_render_cached(tmp):
+    """缓存命中：使用率逐次变化，与托盘刷新时的调用方式相同"""
+    from src.icon_renderer import render_memory_icon, clear_icon_cache
+
+    percent = _varying_percent()
+    return lambda: render_memory_icon("yellow", percent()), clear_icon_cache
+
+
+@case("tick.end_to_end")
+def _tick(tmp):
+    from src.icon_renderer import render_memory_icon
+
+    monitor = MemoryMonitor()
+    analytics = CleanAnalytics(state_file=None)
+    sampler = AdaptiveSampler()
+    scheduler = MonitorScheduler(monitor, sampler=sampler, extended=True)
+    # 与托盘应用相同的监听器：阈值检查、图标、统计
+    scheduler.add_listener(monitor.check_thresholds)
+    scheduler.add_listener(lambda info: render_memory_icon("green", info["percent"]))
+    scheduler.add_listener(lambda info: analytics.record_sample(info["percent"]))
+    scheduler.add_listener(sampler.next_interval)
+    return scheduler.tick
+
+
+def _rule_engine(count):
+    """count 条规则，每条都要走到进程条件；进程列表用固定集合代替系统扫描"""
+    from src.rules import RuleEngine
+
+    rules = [{
+        "name": f"rule-{i}",
+        "when": {"all": [
+            {"metric": "percent", "op": ">", "value": 50},
+            {"process": f"build{i}*", "running": False}
+        ]},
+        "blackout": ["03:00-04:00"],
+        "action": {"type": "clean"}
+    } for i in range(count)]
+    engine = RuleEngine(rules, metric_names=MemoryMonitor.EXTENDED_METRICS,
+                        process_source=lambda: {f"proc{i}.exe" for i in range(200)})
+    sample = MemoryMonitor().get_extended_info()
+    sample["percent"] = 90.0
+    now = datetime(2025, 1, 15, 14, 0)
+    return lambda: engine.evaluate(sample, now=now)
+
+
+@case("rules.evaluate[100]")
+def _rules_100(tmp):
+    return _rule_engine(100)
+
+
+@case("rules.evaluate[1000]")
+def _rules_1000(tmp):
+    return _rule_engine(1000)
+
+
+@case("fleet.ingest[1000]")
+def _fleet_ingest(tmp):
+    """汇总服务解析并写入一批 1000 条 JSON Lines（100 台主机）"""
+    from src.fleet_aggregator import FleetStore
+
+    store = FleetStore()
+    body = "".join(
+        json.dumps({"host": f"host-{i % 100}", "type": "sample", "ts": 1700000000.0 + i,
+                    "percent": 50 + i % 40, "available": 4.5, "swap_percent": 10.0,
+                    "commit_percent": 60.0, "psi_some_avg10": 1.5, "psi_full_avg10": 0.2}) + "\n"
+        for i in range(1000)
+    ).encode("utf-8")
+    return lambda: store.ingest_lines(body)
+
+
+# 开启计时时允许的开销占比(%)
+INSTRUMENTATION_BUDGET_PERCENT = 1.0
+
+
+def _best_per_call(fn, iterations, rounds):
+    """同一循环重复 rounds 轮，取最快一轮的每次调用耗时(秒)，排除调度和缓存带来的噪声"""
+    loop = range(iterations)
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in loop:
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / iterations
+
+
+def measure_instrumentation_overhead(iterations=20000, rounds=7):
+    """
+    直接测量 @timed 的开销
+
+    两次采样周期的 p50 相减时，噪声比开销本身大一个数量级，无法判断是否在预算内。
+    这里用同一个空函数分别以不装饰、装饰后关闭、装饰后开启各调用 iterations 次，
+    取 rounds 轮中的最小值得到每次调用的额外耗时，乘以一次采样周期中经过 @timed 的调用次数，
+    再除以采样周期的最短耗时，得到开销占比的上界。
+
+    Returns:
+        dict: {disabled_ns, enabled_ns, timed_calls_per_tick, tick_min_us,
+               disabled_percent, enabled_percent, budget_percent, within_budget}
+    """
+    from src.instrumentation import Instrumentation, timed
+
+    registry = Instrumentation(enabled=False)
+
+    def noop():
+        pass
+
+    wrapped = timed("overhead", registry=registry)(noop)
+    baseline = _best_per_call(noop, iterations, rounds)
+    disabled = max(0.0, _best_per_call(wrapped, iterations, rounds) - baseline)
+    registry.enabled = True
+    enabled = max(0.0, _best_per_call(wrapped, iterations, rounds) - baseline)
+
+    tick = _tick(None)
+    previous = metrics.enabled
+    try:
+        # Count the timed calls one tick makes, then time the tick with timing switched off
+        metrics.enabled = True
+        before = {name: t["count"] for name, t in metrics.snapshot()["timings"].items()}
+        tick()
+        after = metrics.snapshot()["timings"]
+        calls = sum(t["count"] - before.get(name, 0) for name, t in after.items())
+        metrics.enabled = False
+        tick_min = measure(tick, iterations=50, warmup=5)["min_us"] / 1e6
+    finally:
+        metrics.enabled = previous
+
+    enabled_percent = calls * enabled / tick_min * 100
+    return {
+        "disabled_ns": round(disabled * 1e9, 1),
+        "enabled_ns": round(enabled * 1e9, 1),
+        "timed_calls_per_tick": calls,
+        "tick_min_us": round(tick_min * 1e6, 1),
+        "disabled_percent": round(calls * disabled / tick_min * 100, 3),
+        "enabled_percent": round(enabled_percent, 3),
+        "budget_percent": INSTRUMENTATION_BUDGET_PERCENT,
+        "within_budget": enabled_percent <= INSTRUMENTATION_BUDGET_PERCENT
+    }
+
+
+def _percentile(ordered, pct):
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, iterations, warmup):
+    """
+    计时
+
+    Returns:
+        dict: 以微秒为单位的 mean/p50/p95/min/max
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    ordered = sorted(samples)
+    return {
+        "iterations": iterations,
+        "mean_us": round(statistics.mean(samples), 3),
+        "p50_us": round(_percentile(ordered, 50), 3),
+        "p95_us": round(_percentile(ordered, 95), 3),
+        "min_us": round(ordered[0], 3),
+        "max_us": round(ordered[-1], 3)
+    }
+
+
+def run_suite(name_filter=None, iterations=200, warmup=10):
+    """运行匹配的用例，返回 {用例名: 统计}；缺少依赖的用例记录为 skipped"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in CASES.items():
+            if name_filter and name_filter not in name:
+                continue
+            try:
+                fn = factory(tmp)
+            except ImportError as e:
+                results[name] = {"skipped": str(e)}
+                continue
+            cleanup = None
+            if isinstance(fn, tuple):
+                fn, cleanup = fn
+            try:
+                results[name] = measure(fn, iterations, warmup)
+            finally:
+                if cleanup is not None:
+                    cleanup()
+    return results
+
+
+def run_pressure_scenario(gb, interval=0.05, timeout=30, monitor=None, pressure=None):
+    """
+    内存压力场景：在 gb GB 的分配下驱动与托盘相同的自动清理路径
+
+    采样线程按 interval 秒采样，每个样本经 should_auto_clean() 判断，超过阈值时
+    通过 DeferredCleaner（不等待空闲）执行清理。阈值取空闲读数与预期峰值的中点。
+    报告从开始分配到自动清理触发的时间，以及释放分配后读数回落到阈值以下的时间。
+    被占用的是进程的匿名内存，任何清理后端都无法回收，因此不再报告释放量。
+
+    以 root 运行在 Linux 上时使用 drop_caches 后端，否则使用 fake 后端。
+
+    Args:
+        monitor / pressure: 测试时替换监控和压力源（pressure 为上下文管理器），默认真实采集和 MemoryPressure(gb)
+    """
+    from benchmarks.pressure import MemoryPressure
+    from src.deferred_clean import DeferredCleaner
+    from src.idle_detector import FakeIdleDetector
+
+    monitor = monitor or MemoryMonitor()
+    if sys.platform.startswith("linux") and os.geteuid() == 0:
+        backend = LinuxDropCachesBackend()
+    else:
+        backend = FakeBackend()
+    cleaner = MemoryCleaner(monitor=monitor, backend=backend)
+    pressure = pressure or MemoryPressure(gb)
+
+    idle = monitor.get_extended_info(track=False)
+    expected_rise = gb / idle["total"] * 100 if idle["total"] else 0.0
+    threshold = round(min(idle["percent"] + expected_rise / 2, 99.0), 1)
+
+    events = {}
+    triggered = threading.Event()
+    recovered = threading.Event()
+    releasing = threading.Event()
+    cleans = []
+
+    def auto_clean(mode):
+        start = time.perf_counter()
+        result = cleaner.clean(mode)
+        cleans.append({"clean_ms": round((time.perf_counter() - start) * 1000, 3), "success": result["success"]})
+        return result
+
+    # min_interval keeps it to a single clean while the allocation is held, as in the tray
+    deferred = DeferredCleaner(auto_clean, FakeIdleDetector(idle=False), max_defer=0,
+                               min_interval=3600, fault_source=lambda: None)
+    scheduler = MonitorScheduler(monitor, interval=interval, extended=True)
+
+    def on_sample(info):
+        events["peak_percent"] = max(events.get("peak_percent", info["percent"]), info["percent"])
+        if monitor.should_auto_clean(info, "percent", threshold):
+            deferred.request(reason="auto_clean")
+        else:
+            deferred.cancel(reason="auto_clean")
+            if releasing.is_set() and not recovered.is_set():
+                events["recovered"] = time.perf_counter()
+                events["recovered_percent"] = info["percent"]
+                recovered.set()
+        if deferred.poll(info) is not None and not triggered.is_set():
+            events["triggered"] = time.perf_counter()
+            events["trigger_percent"] = info["percent"]
+            triggered.set()
+
+    scheduler.add_listener(on_sample)
+    scheduler.start()
+    try:
+        start = time.perf_counter()
+        with pressure:
+            allocate_seconds = time.perf_counter() - start
+            triggered.wait(timeout)
+            released = time.perf_counter()
+            releasing.set()
+        recovered.wait(timeout)
+    finally:
+        scheduler.stop(timeout=5)
+
+    return {
+        "gb": gb,
+        "backend": backend.name,
+        "threshold_percent": threshold,
+        "idle_percent": idle["percent"],
+        "peak_percent": events.get("peak_percent"),
+        "allocate_seconds": round(allocate_seconds, 3),
+        "triggered": triggered.is_set(),
+        "trigger_seconds": round(events["triggered"] - start, 3) if triggered.is_set() else None,
+        "trigger_percent": events.get("trigger_percent"),
+        "auto_cleans": len(cleans),
+        "clean_ms": cleans[0]["clean_ms"] if cleans else None,
+        "clean_success": cleans[0]["success"] if cleans else None,
+        "recovered": recovered.is_set(),
+        "recovery_seconds": round(events["recovered"] - released, 3) if recovered.is_set() else None,
+        "recovered_percent": events.get("recovered_percent")
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline, current):
+    """
+    比较两次结果的 p50
+
+    Returns:
+        list: 回退的用例名
+    """
+    regressions = []
+    print(f"\n{'case':<34}{'base p50':>12}{'now p50':>12}{'ratio':>8}")
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base or "p50_us" not in base or "p50_us" not in stats:
+            continue
+        ratio = stats["p50_us"] / base["p50_us"] if base["p50_us"] else float("inf")
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<34}{base['p50_us']:>12.1f}{stats['p50_us']:>12.1f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="内存清理工具基准测试")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", help="结果 JSON 路径，默认 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="与之前的结果 JSON 比较")
+    parser.add_argument("--pressure-gb", type=float, help="额外运行分配该大小内存的压力场景")
+    args = parser.parse_args(argv)
+
+    commit = _git_commit()
+    results = run_suite(args.filter, args.iterations, args.warmup)
+
+    print(f"{'case':<34}{'mean':>10}{'p50':>10}{'p95':>10}  (us)")
+    for name, stats in results.items():
+        if "skipped" in stats:
+            print(f"{name:<34}  skipped: {stats['skipped']}")
+        else:
+            print(f"{name:<34}{stats['mean_us']:>10.1f}{stats['p50_us']:>10.1f}{stats['p95_us']:>10.1f}")
+    overhead = None
+    if not args.filter or args.filter in "instrumentation.overhead":
+        overhead = measure_instrumentation_overhead()
+        print(f"\ninstrumentation overhead: {overhead['enabled_ns']}ns/call enabled, "
+              f"{overhead['disabled_ns']}ns/call disabled, {overhead['timed_calls_per_tick']} timed calls "
+              f"per {overhead['tick_min_us']}us tick -> {overhead['enabled_percent']}% enabled, "
+              f"{overhead['disabled_percent']}% disabled (budget {overhead['budget_percent']}%)"
+              f"{'' if overhead['within_budget'] else '  OVER BUDGET'}")
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+    if overhead is not None:
+        report["instrumentation_overhead"] = overhead
+    if args.pressure_gb:
+        report["pressure"] = run_pressure_scenario(args.pressure_gb)
+        print(f"\npressure: {json.dumps(report['pressure'], ensure_ascii=False)}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    output_dir = os.path.dirname(output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已保存到 {output}")
+
+    status = 0 if overhead is None or overhead["within_budget"] else 1
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(baseline["results"], results):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
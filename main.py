@@ -6,16 +6,105 @@ Windows 内存清理工具
 用于清理系统内存缓存，解决长时间运行后内存占用过高的问题
 """
 
+import argparse
+import logging
 import sys
 import os
 
 # 添加 src 目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.tray_app import MemoryTrayApp
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Windows 内存清理工具")
+    parser.add_argument("--stats", action="store_true", help="输出清理效果统计后退出")
+    parser.add_argument("--metrics", nargs="?", const="logs/metrics.json", metavar="FILE",
+                        help="输出托盘程序记录的热路径耗时后退出 (默认: logs/metrics.json)")
+    parser.add_argument("--aggregator", nargs="?", const="127.0.0.1:8765", metavar="ADDR",
+                        help="运行多机汇总服务，接收各台机器上报的数据 (默认只监听本机: 127.0.0.1:8765；"
+                             "接收其他机器的上报时指定地址，例如 0.0.0.0:8765)")
+    parser.add_argument("--service", nargs="?", const="run",
+                        choices=("run", "daemon", "install", "remove", "start", "stop", "install-task"),
+                        help="以后台服务运行监控和清理: run 前台运行 / daemon POSIX 守护进程 / "
+                             "install remove start stop 管理 Windows 服务 / install-task 注册开机计划任务")
+    return parser.parse_args(argv)
+
+
+def setup_logging():
+    """长时间运行的模式（托盘、服务、汇总服务）把日志输出到控制台"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def show_stats():
+    """在控制台输出清理效果统计"""
+    from src.clean_analytics import CleanAnalytics, format_summary
+
+    print(format_summary(CleanAnalytics().summary()))
+
+
+def show_metrics(path):
+    """在控制台输出托盘程序写出的热路径耗时"""
+    import json
+    from src.instrumentation import format_metrics
+
+    if not os.path.exists(path):
+        print(f"没有找到 {path}，托盘程序运行一段时间后会自动生成")
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        print(format_metrics(json.load(f)))
+
+
+def run_service(action):
+    """运行或管理后台服务"""
+    import subprocess
+    from src.service import MemoryService, runtime_dir, secure_runtime_dir
+    from src.service_host import (ForegroundHost, PosixDaemonHost, handle_windows_service,
+                                  scheduled_task_command)
+
+    if action in ("install", "remove", "start", "stop"):
+        handle_windows_service([sys.argv[0], action])
+        return
+    if action == "install-task":
+        subprocess.run(scheduled_task_command(), check=True)
+        print("已注册开机计划任务，重启后服务以 SYSTEM 身份运行")
+        return
+
+    # Hosts started by the system begin elsewhere; config.json and logs/ live next to main.py
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    service = MemoryService()
+    if action == "daemon":
+        secure_runtime_dir(runtime_dir(), service.config.service_group or None)
+        host = PosixDaemonHost(pidfile=os.path.join(runtime_dir(), "service.pid"))
+    else:
+        print("内存清理服务运行中，按 Ctrl+C 退出")
+        host = ForegroundHost()
+    host.run(service)
+
 
 def main():
     """主入口函数"""
+    args = parse_args()
+    if args.stats:
+        show_stats()
+        return
+    if args.metrics:
+        show_metrics(args.metrics)
+        return
+    setup_logging()
+    if args.service:
+        run_service(args.service)
+        return
+    if args.aggregator:
+        from src.config import ConfigManager
+        from src.fleet_aggregator import run_aggregator
+
+        run_aggregator(args.aggregator, token=ConfigManager().fleet_token)
+        return
+
+    # 托盘依赖（pystray/Pillow）只在启动托盘时加载，统计命令无需图形环境
+    from src.tray_app import MemoryTrayApp
+
     print("Windows 内存清理工具启动中...")
     app = MemoryTrayApp()
     app.run()
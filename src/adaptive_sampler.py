@@ -0,0 +1,139 @@
+import logging
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveSampler:
+    """
+    自适应采样间隔
+
+    内存使用率变化快或接近警告阈值时立即收紧到 min_interval；
+    使用率平稳或使用电池供电时按 backoff_factor 指数退避，直到 max_interval。
+    """
+
+    # 电池状态变化很慢，缓存一段时间避免每次采样都读取
+    BATTERY_CACHE_SECONDS = 60
+
+    def __init__(self, base_interval=5, min_interval=1, max_interval=60, warning_threshold=85,
+                 near_threshold_margin=5, volatility_threshold=2.0, backoff_factor=2.0,
+                 battery_source=None, clock=time.monotonic):
+        """
+        Args:
+            base_interval: 固定采样间隔(秒)，也是统计节省比例的基准
+            min_interval: 最短采样间隔(秒)
+            max_interval: 最长采样间隔(秒)
+            warning_threshold: 警告阈值(%)
+            near_threshold_margin: 使用率距警告阈值不足该值(百分点)即视为接近阈值
+            volatility_threshold: 每个 base_interval 内使用率变化超过该值(百分点)视为波动；
+                间隔更短时按实际变化量比较，不按比例放大
+            backoff_factor: 平稳时每次采样间隔的放大倍数
+            battery_source: 返回 psutil.sensors_battery() 风格对象的函数，默认使用 psutil
+            clock: 单调时钟，测试时可替换
+        """
+        if min_interval <= 0:
+            raise ValueError(f"min_interval must be positive, got {min_interval}")
+        if max_interval < min_interval:
+            raise ValueError(f"max_interval must be >= min_interval, got {max_interval} < {min_interval}")
+        if not min_interval <= base_interval <= max_interval:
+            raise ValueError(f"base_interval must be between {min_interval} and {max_interval}, got {base_interval}")
+        if backoff_factor < 1:
+            raise ValueError(f"backoff_factor must be >= 1, got {backoff_factor}")
+
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.warning_threshold = warning_threshold
+        self.near_threshold_margin = near_threshold_margin
+        self.volatility_threshold = volatility_threshold
+        self.backoff_factor = backoff_factor
+        self._battery_source = battery_source if battery_source is not None else self._read_battery
+        self._clock = clock
+
+        self.interval = base_interval
+        self.samples = 0
+        self._started = None
+        self._last_percent = None
+        self._last_time = None
+        self._on_battery = False
+        self._battery_checked = None
+
+    def next_interval(self, mem_info):
+        """
+        根据最新样本计算下一次采样前的等待时间
+
+        Args:
+            mem_info: MemoryMonitor.get_memory_info() 的结果
+
+        Returns:
+            float: 等待秒数
+        """
+        now = self._clock()
+        percent = mem_info["percent"]
+        if self._started is None:
+            self._started = now
+        self.samples += 1
+
+        volatile = False
+        if self._last_time is None:
+            self._last_percent = percent
+            self._last_time = now
+        else:
+            # Compare against a reference at least base_interval old instead of extrapolating
+            # short gaps: at min_interval a 0.4-point jitter would otherwise count as 2 points
+            elapsed = now - self._last_time
+            change = abs(percent - self._last_percent)
+            if elapsed > self.base_interval:
+                change *= self.base_interval / elapsed
+            volatile = change >= self.volatility_threshold
+            if elapsed >= self.base_interval:
+                self._last_percent = percent
+                self._last_time = now
+
+        near_threshold = percent >= self.warning_threshold - self.near_threshold_margin
+        if volatile or near_threshold:
+            # Urgency wins over power saving: a spike on battery still gets tight sampling
+            self.interval = self.min_interval
+        else:
+            # Grow from at least the base interval when on battery so laptops back off faster
+            start = max(self.interval, self.base_interval) if self.on_battery() else self.interval
+            self.interval = min(start * self.backoff_factor, self.max_interval)
+        return self.interval
+
+    def on_battery(self):
+        """是否使用电池供电（结果会缓存 BATTERY_CACHE_SECONDS 秒）"""
+        now = self._clock()
+        if self._battery_checked is None or now - self._battery_checked >= self.BATTERY_CACHE_SECONDS:
+            self._battery_checked = now
+            try:
+                battery = self._battery_source()
+                self._on_battery = battery is not None and not battery.power_plugged
+            except Exception as e:
+                logger.debug(f"Battery state unavailable: {e}")
+                self._on_battery = False
+        return self._on_battery
+
+    def stats(self):
+        """
+        采样统计
+
+        Returns:
+            dict: {samples, baseline_samples, saved_ratio, interval}
+                baseline_samples 为同一时间段内按固定 base_interval 采样的次数
+        """
+        elapsed = 0 if self._started is None else self._clock() - self._started
+        baseline = int(elapsed // self.base_interval) + 1 if self.samples else 0
+        saved = round(1 - self.samples / baseline, 3) if baseline else 0.0
+        return {
+            "samples": self.samples,
+            "baseline_samples": baseline,
+            "saved_ratio": saved,
+            "interval": self.interval
+        }
+
+    @staticmethod
+    def _read_battery():
+        sensors_battery = getattr(psutil, "sensors_battery", None)
+        return sensors_battery() if sensors_battery is not None else None
@@ -0,0 +1,349 @@
+"""
+阈值告警
+
+每个样本交给 AlertManager.evaluate()，内存使用率越过 warning / critical 阈值、
+或扩展指标越过各自阈值时产生告警，再交给通知器（托盘气泡、控制台、回调）发送。
+
+为了在持续高占用时不刷屏:
+    去重      同一指标保持在同一级别时只通知一次，repeat_interval 秒后仍未恢复才再次提醒
+    升级      warning 升到 critical 时立即通知
+    回差      数值回落到阈值减 hysteresis 以下才算恢复，避免在阈值附近来回抖动
+    免打扰    quiet_hours 时间窗口内不发送 warning（critical 照常发送）
+    限流      每 rate_window 秒最多发送 rate_limit 条（critical 不受限）
+
+被免打扰或限流拦下的告警不会丢失，条件仍成立时在之后的样本中补发。
+
+服务模式下告警由后台服务评估（见 src.service），托盘用 ServiceAlertRelay 读取服务的事件并显示。
+"""
+
+import collections
+import logging
+import time
+from datetime import datetime
+
+from src.rules import in_time_window, parse_time_window
+
+logger = logging.getLogger(__name__)
+
+WARNING = 1
+CRITICAL = 2
+LEVEL_NAMES = {WARNING: "warning", CRITICAL: "critical"}
+
+APP_TITLE = "内存清理工具"
+
+_METRIC_LABELS = {
+    "percent": "内存使用率",
+    "swap_percent": "交换区使用率",
+    "commit_percent": "提交量",
+    "swap_in_rate": "换入速率",
+    "psi_some_avg10": "内存压力 (PSI some)",
+    "psi_full_avg10": "内存压力 (PSI full)"
+}
+_METRIC_UNITS = {"swap_in_rate": "MB/s"}
+
+
+class Alert:
+    """一条告警"""
+
+    __slots__ = ("key", "level", "message", "value", "threshold")
+
+    def __init__(self, key, level, message, value=None, threshold=None):
+        self.key = key
+        self.level = level
+        self.message = message
+        self.value = value
+        self.threshold = threshold
+
+    @property
+    def level_name(self):
+        return LEVEL_NAMES[self.level]
+
+    def to_dict(self):
+        return {"key": self.key, "level": self.level_name, "message": self.message,
+                "value": self.value, "threshold": self.threshold}
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict() 的结果恢复"""
+        level = CRITICAL if data.get("level") == LEVEL_NAMES[CRITICAL] else WARNING
+        return cls(data["key"], level, data["message"], data.get("value"), data.get("threshold"))
+
+    def __repr__(self):
+        return f"Alert(key={self.key!r}, level={self.level_name!r}, message={self.message!r})"
+
+
+class Notifier:
+    """通知器基类"""
+
+    def notify(self, alert):
+        """
+        发送告警
+
+        Returns:
+            bool: 是否已送达；返回 False 时告警保留，之后再试
+        """
+        raise NotImplementedError
+
+
+class TrayNotifier(Notifier):
+    """通过 pystray 图标的气泡通知发送"""
+
+    def __init__(self, icon_source):
+        """
+        Args:
+            icon_source: 返回 pystray.Icon 的函数，图标尚未创建时返回 None
+        """
+        self._icon_source = icon_source
+
+    def notify(self, alert):
+        icon = self._icon_source()
+        if icon is None:
+            return False
+        icon.notify(alert.message, title=APP_TITLE)
+        return True
+
+
+class ConsoleNotifier(Notifier):
+    """无图形界面时输出到控制台"""
+
+    def notify(self, alert):
+        print(f"[{alert.level_name}] {alert.message}")
+        return True
+
+
+class CallbackNotifier(Notifier):
+    """把告警交给回调，例如转发给 IPC 客户端"""
+
+    def __init__(self, callback):
+        self._callback = callback
+
+    def notify(self, alert):
+        result = self._callback(alert)
+        return result is None or bool(result)
+
+
+class _AlertState:
+    __slots__ = ("level", "notified_level", "notified_at")
+
+    def __init__(self):
+        self.level = 0
+        self.notified_level = 0
+        self.notified_at = None
+
+
+def parse_quiet_hours(windows, path="alert_quiet_hours"):
+    """
+    解析免打扰时间窗口列表
+
+    Raises:
+        ValueError: 格式无效，消息指出出错的位置
+    """
+    if not isinstance(windows, (list, tuple)):
+        raise ValueError(f"{path} must be a list of time windows")
+    return tuple(parse_time_window(f"{path}[{i}]", w) for i, w in enumerate(windows))
+
+
+class AlertManager:
+    """根据样本产生并限流告警"""
+
+    def __init__(self, notifiers, warning_threshold=85, critical_threshold=95, metric_thresholds=None,
+                 hysteresis=5, repeat_interval=1800, quiet_hours=(), rate_limit=3, rate_window=3600,
+                 clock=time.monotonic):
+        """
+        Args:
+            notifiers: Notifier 列表
+            warning_threshold / critical_threshold: 内存使用率的两级阈值(%)
+            metric_thresholds: {扩展指标: 阈值}，超过时产生 warning，通常取 MemoryMonitor 的指标阈值
+            hysteresis: 使用率回落多少(%)才算恢复；扩展指标按阈值的 hysteresis% 计算
+            repeat_interval: 未恢复时再次提醒的间隔(秒)，0 表示不重复
+            quiet_hours: 免打扰时间窗口，例如 ["22:00-08:00"]
+            rate_limit: 每 rate_window 秒最多发送的告警数
+            clock: 单调时钟
+        """
+        if not 0 < warning_threshold <= critical_threshold <= 100:
+            raise ValueError("need 0 < warning_threshold <= critical_threshold <= 100")
+        if hysteresis < 0 or repeat_interval < 0:
+            raise ValueError("hysteresis and repeat_interval must not be negative")
+        if rate_limit < 1 or rate_window <= 0:
+            raise ValueError("rate_limit and rate_window must be positive")
+        self.notifiers = list(notifiers)
+        self.warning_threshold = warning_threshold
+        self.critical_threshold = critical_threshold
+        self.metric_thresholds = dict(metric_thresholds or {})
+        self.hysteresis = hysteresis
+        self.repeat_interval = repeat_interval
+        self.quiet_hours = parse_quiet_hours(quiet_hours)
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._clock = clock
+        self._states = {}
+        self._sent_times = collections.deque()
+        self.sent = 0
+        self.suppressed = {"quiet": 0, "rate": 0}
+
+    def evaluate(self, sample, now=None):
+        """
+        检查一个样本
+
+        Args:
+            sample: get_extended_info() 或 get_memory_info() 的结果
+            now: 当前本地时间，用于免打扰判断，默认 datetime.now()
+
+        Returns:
+            list: 本次实际发送的 Alert
+        """
+        sent = []
+        percent = sample.get("percent")
+        if percent is not None:
+            level = self._percent_level(percent)
+            threshold = self.critical_threshold if level == CRITICAL else self.warning_threshold
+            alert = self._update("percent", level, percent, threshold, now)
+            if alert is not None:
+                sent.append(alert)
+        for metric, threshold in self.metric_thresholds.items():
+            value = sample.get(metric)
+            if value is None:
+                continue
+            state = self._states.get(metric)
+            active = state is not None and state.level
+            # Scale the hysteresis to the threshold so it also works for MB/s metrics
+            margin = threshold * self.hysteresis / 100
+            level = WARNING if value >= threshold or (active and value >= threshold - margin) else 0
+            alert = self._update(metric, level, value, threshold, now)
+            if alert is not None:
+                sent.append(alert)
+        return sent
+
+    def send(self, key, message, level=WARNING, now=None):
+        """
+        发送一条不对应阈值的告警（例如规则的 notify 动作），同样受免打扰和限流约束
+
+        Returns:
+            bool: 是否已发送
+        """
+        alert = Alert(key, level, message)
+        return self._deliver(alert, now)
+
+    def active(self):
+        """当前处于告警状态的指标 {key: 级别名}"""
+        return {key: LEVEL_NAMES[state.level] for key, state in self._states.items() if state.level}
+
+    def _percent_level(self, percent):
+        state = self._states.get("percent")
+        current = state.level if state is not None else 0
+        if percent >= self.critical_threshold:
+            return CRITICAL
+        if current == CRITICAL and percent >= self.critical_threshold - self.hysteresis:
+            return CRITICAL
+        if percent >= self.warning_threshold:
+            return WARNING
+        if current and percent >= self.warning_threshold - self.hysteresis:
+            return WARNING
+        return 0
+
+    def _update(self, key, level, value, threshold, now):
+        """更新指标状态，需要时发送告警"""
+        state = self._states.get(key)
+        if state is None:
+            if not level:
+                return None
+            state = self._states[key] = _AlertState()
+        if not level:
+            if state.notified_level:
+                logger.info(f"Alert {key} recovered at {value}")
+            del self._states[key]
+            return None
+        state.level = level
+        if level < state.notified_level:
+            # Dropped from critical to warning: stay quiet, but notify again if it escalates
+            state.notified_level = level
+            return None
+        mono = self._clock()
+        if level == state.notified_level:
+            if not self.repeat_interval or mono - state.notified_at < self.repeat_interval:
+                return None
+        alert = Alert(key, level, self._message(key, level, value, threshold), value, threshold)
+        if not self._deliver(alert, now):
+            return None
+        state.notified_level = level
+        state.notified_at = mono
+        return alert
+
+    def _deliver(self, alert, now):
+        """经过免打扰和限流检查后交给通知器"""
+        mono = self._clock()
+        if alert.level < CRITICAL:
+            if self.quiet_hours:
+                now = now or datetime.now()
+                minute = now.hour * 60 + now.minute
+                if any(in_time_window(w, minute) for w in self.quiet_hours):
+                    self.suppressed["quiet"] += 1
+                    return False
+            while self._sent_times and mono - self._sent_times[0] >= self.rate_window:
+                self._sent_times.popleft()
+            if len(self._sent_times) >= self.rate_limit:
+                self.suppressed["rate"] += 1
+                return False
+        delivered = False
+        for notifier in self.notifiers:
+            try:
+                delivered = notifier.notify(alert) or delivered
+            except Exception:
+                logger.exception(f"Notifier {type(notifier).__name__} failed")
+        if delivered:
+            self._sent_times.append(mono)
+            self.sent += 1
+        return delivered
+
+    @staticmethod
+    def _message(key, level, value, threshold):
+        label = _METRIC_LABELS.get(key, key)
+        unit = _METRIC_UNITS.get(key, "%")
+        prefix = "内存严重不足" if level == CRITICAL else "内存告警"
+        return f"{prefix}: {label} {value}{unit}，超过阈值 {threshold}{unit}"
+
+
+class ServiceAlertRelay:
+    """
+    把后台服务产生的告警交给本地通知器
+
+    服务已经做过去重、免打扰和限流，这里只按事件序号读取新告警并逐条显示。
+    第一次读取只记录位置，不补发托盘启动前的旧告警；服务重启后序号从头开始，服务端会返回全部新事件。
+    """
+
+    def __init__(self, fetch, notifiers):
+        """
+        Args:
+            fetch: fetch(since) -> 序号大于 since 的事件列表，通常为 ServiceClient.events
+            notifiers: Notifier 列表
+        """
+        self._fetch = fetch
+        self.notifiers = list(notifiers)
+        self._seen = None
+        self.sent = 0
+
+    def poll(self):
+        """
+        读取并显示新告警，连接错误由调用方处理
+
+        Returns:
+            list: 本次显示的 Alert
+        """
+        events = self._fetch(self._seen or 0)
+        first = self._seen is None
+        self._seen = events[-1]["seq"] if events else (self._seen or 0)
+        if first:
+            return []
+        shown = []
+        for event in events:
+            if event.get("type") != "alert":
+                continue
+            alert = Alert.from_dict(event["data"])
+            for notifier in self.notifiers:
+                try:
+                    notifier.notify(alert)
+                except Exception:
+                    logger.exception(f"Notifier {type(notifier).__name__} failed")
+            shown.append(alert)
+        self.sent += len(shown)
+        return shown
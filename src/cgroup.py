@@ -0,0 +1,231 @@
+"""
+cgroup（容器）内存
+
+容器里 psutil.virtual_memory() 和 /proc/meminfo 报告的是宿主机内存，
+按它计算的使用率和阈值对容器没有意义。这里检测本进程所在的 cgroup，
+有内存上限时改为读取 cgroup 的接口文件生成监控快照：
+
+    v2: memory.current, memory.max, memory.stat, memory.swap.current, memory.swap.max, memory.pressure
+    v1: memory.usage_in_bytes, memory.limit_in_bytes, memory.stat, memory.memsw.*
+
+已用内存按 "使用量 - inactive_file" 计算（与 docker stats / kubelet 的 working set 口径一致），
+因为不活跃的页缓存在接近上限时会被优先回收。
+"""
+
+import errno
+import logging
+import os
+import sys
+import time
+
+from src.memory_sources import read_linux_meminfo, read_pressure
+
+logger = logging.getLogger(__name__)
+
+# cgroup v1 用接近 2^63 的数表示不限制
+_V1_UNLIMITED = 2 ** 62
+
+
+class Cgroup:
+    """一个 cgroup 目录的内存接口"""
+
+    def __init__(self, path, version, meminfo_path="/proc/meminfo"):
+        """
+        Args:
+            path: cgroup 目录
+            version: 1 或 2
+            meminfo_path: 宿主机 /proc/meminfo，用于没有上限时的总量
+        """
+        if version not in (1, 2):
+            raise ValueError(f"version must be 1 or 2, got {version!r}")
+        self.path = path
+        self.version = version
+        self._meminfo_path = meminfo_path
+
+    def __repr__(self):
+        return f"Cgroup(path={self.path!r}, version={self.version})"
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_int(self, name):
+        """读取单个数值文件；"max" 或 v1 的极大值表示不限制，返回 None；文件不存在或内容无法解析也返回 None"""
+        try:
+            with open(self._file(name), 'r', encoding='ascii') as f:
+                text = f.read().strip()
+        except (IOError, OSError):
+            return None
+        if text == "max":
+            return None
+        try:
+            value = int(text)
+        except ValueError:
+            logger.debug(f"Unexpected content in {self._file(name)}: {text[:40]!r}")
+            return None
+        if self.version == 1 and value >= _V1_UNLIMITED:
+            return None
+        return value
+
+    @property
+    def limit(self):
+        """内存上限(字节)，不限制时为 None"""
+        return self._read_int("memory.max" if self.version == 2 else "memory.limit_in_bytes")
+
+    def read_stat(self):
+        """解析 memory.stat，无法解析的行跳过"""
+        stat = {}
+        with open(self._file("memory.stat"), 'r', encoding='ascii') as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                try:
+                    stat[name] = int(value)
+                except ValueError:
+                    continue
+        return stat
+
+    @property
+    def pressure_path(self):
+        """memory.pressure 的路径，v1 没有 PSI 时为 None"""
+        return self._file("memory.pressure") if self.version == 2 else None
+
+    def read_pressure(self):
+        """memory.pressure (仅 v2)，格式见 memory_sources.read_pressure()"""
+        if self.version != 2:
+            return None
+        return read_pressure(self.pressure_path)
+
+    @property
+    def supports_reclaim(self):
+        """是否提供 memory.reclaim（cgroup v2，内核 5.19+）"""
+        return self.version == 2 and os.path.exists(self._file("memory.reclaim"))
+
+    def reclaim(self, nbytes):
+        """
+        请求内核从该 cgroup 回收 nbytes 字节
+
+        Returns:
+            bool: 全部回收为 True；内核只回收了一部分 (EAGAIN) 时为 False
+        """
+        try:
+            with open(self._file("memory.reclaim"), 'w', encoding='ascii') as f:
+                f.write(f"{int(nbytes)}\n")
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return False
+            raise
+        return True
+
+    def collect(self):
+        """
+        采集一次 cgroup 范围的原始快照，字段与 memory_sources.collect_raw_snapshot() 相同，
+        外加 psi（memory.pressure 解析结果，v1 为 None）
+        """
+        host = None
+        total = self.limit
+        if total is None:
+            host = read_linux_meminfo(self._meminfo_path)
+            total = host["MemTotal"]
+        stat = self.read_stat()
+
+        if self.version == 2:
+            usage = self._read_int("memory.current") or 0
+            inactive_file = stat.get("inactive_file", 0)
+            cached = stat.get("file")
+            swap_used = self._read_int("memory.swap.current") or 0
+            swap_limit = self._read_int("memory.swap.max")
+        else:
+            usage = self._read_int("memory.usage_in_bytes") or 0
+            inactive_file = stat.get("total_inactive_file", stat.get("inactive_file", 0))
+            cached = stat.get("total_cache", stat.get("cache"))
+            memsw_usage = self._read_int("memory.memsw.usage_in_bytes")
+            memsw_limit = self._read_int("memory.memsw.limit_in_bytes")
+            swap_used = max(0, memsw_usage - usage) if memsw_usage is not None else 0
+            swap_limit = max(0, memsw_limit - total) if memsw_limit is not None else None
+        if swap_limit is None:
+            # No swap limit of its own: the container can use whatever the host has
+            if host is None:
+                host = read_linux_meminfo(self._meminfo_path)
+            swap_limit = host.get("SwapTotal", 0)
+
+        used = min(total, max(0, usage - inactive_file))
+        return {
+            "total": total,
+            "available": total - used,
+            "used": used,
+            "cached": cached,
+            "swap_total": swap_limit,
+            "swap_used": min(swap_used, swap_limit) if swap_limit else swap_used,
+            # Swap-in/out counters and commit charge are host-wide only
+            "swap_in_bytes": None,
+            "swap_out_bytes": None,
+            "commit_total": None,
+            "commit_limit": None,
+            "psi": self.read_pressure(),
+            "time": time.monotonic()
+        }
+
+
+def _parse_proc_cgroup(proc_cgroup):
+    """解析 /proc/self/cgroup，返回 (v1 memory 控制器路径, v2 路径)"""
+    v1_path = v2_path = None
+    with open(proc_cgroup, 'r', encoding='ascii') as f:
+        for line in f:
+            parts = line.rstrip("\n").split(":", 2)
+            if len(parts) != 3:
+                continue
+            hierarchy, controllers, path = parts
+            if hierarchy == "0" and controllers == "":
+                v2_path = path
+            elif "memory" in controllers.split(","):
+                v1_path = path
+    return v1_path, v2_path
+
+
+def _resolve(root, path, marker):
+    """cgroup 目录：优先 root/path；容器内有 cgroup 命名空间或只挂载了自己的子树时用 root"""
+    for candidate in (os.path.join(root, path.lstrip("/")), root):
+        if os.path.exists(os.path.join(candidate, marker)):
+            return candidate
+    return None
+
+
+def detect_cgroup(proc_cgroup="/proc/self/cgroup", mount_root="/sys/fs/cgroup", meminfo_path="/proc/meminfo"):
+    """
+    检测本进程所在的内存 cgroup
+
+    v1 的 memory 控制器优先（混合模式下 memory 仍挂在 v1 层级）；
+    v2 要求该 cgroup 启用了 memory 控制器（存在 memory.current）。
+
+    Returns:
+        Cgroup | None: 找不到时为 None
+    """
+    try:
+        v1_path, v2_path = _parse_proc_cgroup(proc_cgroup)
+    except (IOError, OSError):
+        return None
+    if v1_path is not None:
+        path = _resolve(os.path.join(mount_root, "memory"), v1_path, "memory.usage_in_bytes")
+        if path is not None:
+            return Cgroup(path, 1, meminfo_path)
+    if v2_path is not None:
+        path = _resolve(mount_root, v2_path, "memory.current")
+        if path is not None:
+            return Cgroup(path, 2, meminfo_path)
+    return None
+
+
+def limited_cgroup(**kwargs):
+    """
+    本进程所在、且设置了内存上限的 cgroup；不在 Linux、没有 cgroup 或不限制时为 None
+
+    参数同 detect_cgroup()，测试时可指向伪造的 cgroupfs。
+    """
+    if not sys.platform.startswith("linux") and not kwargs:
+        return None
+    try:
+        cgroup = detect_cgroup(**kwargs)
+        if cgroup is not None and cgroup.limit is not None:
+            return cgroup
+    except (IOError, OSError, ValueError) as e:
+        logger.warning(f"cgroup detection failed, monitoring host memory: {e}")
+    return None
@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _new_stats(freed_buckets, regrow_buckets):
+    return {
+        "cleans": 0,
+        "freed_total_gb": 0.0,
+        "freed_hist": [0] * (len(freed_buckets) + 1),
+        "regrown": 0,
+        "regrow_total_seconds": 0.0,
+        "regrow_hist": [0] * (len(regrow_buckets) + 1),
+        "held": 0,
+        "wasted": 0
+    }
+
+
+def _bucket_index(edges, value):
+    """返回 value 落入的直方图桶下标，最后一个桶是 > edges[-1]"""
+    for i, edge in enumerate(edges):
+        if value <= edge:
+            return i
+    return len(edges)
+
+
+class CleanAnalytics:
+    """
+    清理效果统计
+
+    把每次清理事件与其后的监控样本关联，增量计算释放量分布、内存回涨时间
+    以及按清理模式、按小时划分的效果。每个样本只更新仍在跟踪中的清理事件，
+    不会回扫历史日志；统计结果以聚合值形式保存在 state_file 中。
+
+    record_clean() / record_sample() 在清理和采样回调中调用，只修改内存中的聚合值；
+    文件最多每 save_interval 秒写一次，close() 时写出最后的改动。
+    """
+
+    # 释放量直方图上界(GB)
+    FREED_BUCKETS_GB = (0.1, 0.25, 0.5, 1, 2, 4)
+    # 回涨时间直方图上界(秒)
+    REGROW_BUCKETS_SECONDS = (30, 60, 120, 300, 600, 1800)
+
+    def __init__(self, state_file="logs/analytics.json", regrow_window=1800,
+                 regrow_tolerance=1.0, wasted_seconds=120, save_interval=60, clock=time.monotonic):
+        """
+        Args:
+            state_file: 聚合结果文件路径，为 None 时只保存在内存中
+            regrow_window: 单次清理最长跟踪时间(秒)，超过仍未回涨记为"保持"
+            regrow_tolerance: 使用率回到清理前值减去该容差(百分点)即视为回涨
+            wasted_seconds: 在该时间内回涨的清理视为无效
+            save_interval: 两次写文件之间的最短间隔(秒)，0 表示每次改动都写
+            clock: 单调时钟，测试时可替换
+        """
+        if not isinstance(regrow_window, (int, float)) or regrow_window <= 0:
+            raise ValueError(f"regrow_window must be positive, got {regrow_window!r}")
+        if regrow_tolerance < 0:
+            raise ValueError(f"regrow_tolerance must be non-negative, got {regrow_tolerance}")
+        if not isinstance(wasted_seconds, (int, float)) or wasted_seconds <= 0:
+            raise ValueError(f"wasted_seconds must be positive, got {wasted_seconds!r}")
+        if save_interval < 0:
+            raise ValueError(f"save_interval must be non-negative, got {save_interval}")
+        self.state_file = state_file
+        self.regrow_window = regrow_window
+        self.regrow_tolerance = regrow_tolerance
+        self.wasted_seconds = wasted_seconds
+        self.save_interval = save_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Orders file writes; held while writing, which happens outside _lock so a slow disk never delays a clean
+        self._save_lock = threading.Lock()
+        self._open = []  # 正在跟踪回涨的清理事件
+        self._dirty = False
+        self._last_save = clock()
+        self._state = self._load_state()
+
+    def record_clean(self, before_percent, after_percent, freed_gb, mode="working_set", timestamp=None):
+        """记录一次成功的清理并开始跟踪其回涨"""
+        timestamp = time.time() if timestamp is None else timestamp
+        hour = datetime.fromtimestamp(timestamp).hour
+        with self._lock:
+            for stats in self._stats_for(mode, hour):
+                stats["cleans"] += 1
+                stats["freed_total_gb"] = round(stats["freed_total_gb"] + freed_gb, 4)
+                stats["freed_hist"][_bucket_index(self.FREED_BUCKETS_GB, freed_gb)] += 1
+            self._open.append({
+                "start": timestamp,
+                "before_percent": before_percent,
+                "after_percent": after_percent,
+                "mode": mode,
+                "hour": hour
+            })
+            self._dirty = True
+        self._maybe_save()
+
+    def record_sample(self, percent, timestamp=None):
+        """处理一个监控样本，结束已回涨或超出跟踪窗口的清理事件"""
+        if not self._open:
+            if self._dirty:
+                self._maybe_save()
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            still_open = []
+            for event in self._open:
+                elapsed = timestamp - event["start"]
+                if percent >= event["before_percent"] - self.regrow_tolerance:
+                    self._finish(event, elapsed)
+                    self._dirty = True
+                elif elapsed >= self.regrow_window:
+                    self._finish(event, None)
+                    self._dirty = True
+                else:
+                    still_open.append(event)
+            self._open = still_open
+        self._maybe_save()
+
+    def flush(self):
+        """立即写出尚未保存的改动"""
+        self._save_state()
+
+    def close(self):
+        """退出前写出尚未保存的改动，可重复调用"""
+        self.flush()
+
+    @property
+    def tracking(self):
+        """正在跟踪回涨的清理事件数"""
+        return len(self._open)
+
+    def summary(self):
+        """
+        获取统计摘要
+
+        Returns:
+            dict: {overall, modes: {mode: stats}, hours: {hour: stats}}，
+                每个 stats 额外包含 mean_freed_gb / mean_regrow_seconds /
+                median_regrow_seconds / effective_rate
+        """
+        with self._lock:
+            return {
+                "overall": self._describe(self._state["overall"]),
+                "modes": {mode: self._describe(s) for mode, s in self._state["modes"].items()},
+                "hours": {int(hour): self._describe(s) for hour, s in self._state["hours"].items()}
+            }
+
+    def _stats_for(self, mode, hour):
+        modes = self._state["modes"]
+        hours = self._state["hours"]
+        if mode not in modes:
+            modes[mode] = _new_stats(self.FREED_BUCKETS_GB, self.REGROW_BUCKETS_SECONDS)
+        if str(hour) not in hours:
+            hours[str(hour)] = _new_stats(self.FREED_BUCKETS_GB, self.REGROW_BUCKETS_SECONDS)
+        return self._state["overall"], modes[mode], hours[str(hour)]
+
+    def _finish(self, event, regrow_seconds):
+        """把一次清理的回涨结果合入聚合值；regrow_seconds 为 None 表示窗口内未回涨"""
+        for stats in self._stats_for(event["mode"], event["hour"]):
+            if regrow_seconds is None:
+                stats["held"] += 1
+                continue
+            stats["regrown"] += 1
+            stats["regrow_total_seconds"] = round(stats["regrow_total_seconds"] + regrow_seconds, 3)
+            stats["regrow_hist"][_bucket_index(self.REGROW_BUCKETS_SECONDS, regrow_seconds)] += 1
+            if regrow_seconds < self.wasted_seconds:
+                stats["wasted"] += 1
+
+    def _describe(self, stats):
+        finished = stats["regrown"] + stats["held"]
+        described = dict(stats)
+        described["mean_freed_gb"] = round(stats["freed_total_gb"] / stats["cleans"], 2) if stats["cleans"] else None
+        described["mean_regrow_seconds"] = (
+            round(stats["regrow_total_seconds"] / stats["regrown"], 1) if stats["regrown"] else None
+        )
+        described["median_regrow_seconds"] = self._hist_median(stats["regrow_hist"], stats["regrown"])
+        described["effective_rate"] = round(1 - stats["wasted"] / finished, 3) if finished else None
+        return described
+
+    def _hist_median(self, hist, count):
+        """按直方图估算中位数，返回所在桶的上界（超出最后一个桶时返回 None）"""
+        if not count:
+            return None
+        seen = 0
+        for i, n in enumerate(hist):
+            seen += n
+            if seen * 2 >= count:
+                return self.REGROW_BUCKETS_SECONDS[i] if i < len(self.REGROW_BUCKETS_SECONDS) else None
+        return None
+
+    def _empty_state(self):
+        return {
+            "overall": _new_stats(self.FREED_BUCKETS_GB, self.REGROW_BUCKETS_SECONDS),
+            "modes": {},
+            "hours": {}
+        }
+
+    def _load_state(self):
+        """加载聚合结果文件"""
+        if self.state_file and os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if all(key in state for key in ("overall", "modes", "hours")):
+                    return state
+                logger.warning(f"Analytics file {self.state_file} has unexpected layout, starting fresh")
+            except json.JSONDecodeError as e:
+                logger.warning(f"Failed to decode JSON from analytics file {self.state_file}: {e}")
+            except IOError as e:
+                logger.warning(f"Failed to read analytics file {self.state_file}: {e}")
+        return self._empty_state()
+
+    def _maybe_save(self):
+        """距上次写文件超过 save_interval 时写出改动"""
+        if self._dirty and self._clock() - self._last_save >= self.save_interval:
+            self._save_state()
+
+    def _save_state(self):
+        """保存聚合结果；序列化在 _lock 内完成，写文件时不持有 _lock"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                self._last_save = self._clock()
+                if not self.state_file:
+                    return
+                data = json.dumps(self._state, indent=2, ensure_ascii=False)
+            try:
+                state_dir = os.path.dirname(self.state_file)
+                if state_dir and not os.path.exists(state_dir):
+                    os.makedirs(state_dir)
+                with open(self.state_file, 'w', encoding='utf-8') as f:
+                    f.write(data)
+            except IOError as e:
+                # Statistics are best effort; never fail a clean because of them
+                logger.error(f"Failed to write analytics file {self.state_file}: {e}")
+
+
+def format_summary(summary):
+    """把 summary() 的结果格式化为便于阅读的多行文本"""
+    def describe(stats):
+        if not stats["cleans"]:
+            return "暂无数据"
+        parts = [f"{stats['cleans']} 次", f"平均释放 {stats['mean_freed_gb']}GB"]
+        if stats["median_regrow_seconds"] is not None:
+            parts.append(f"回涨中位数 ≤{stats['median_regrow_seconds']}s")
+        if stats["effective_rate"] is not None:
+            parts.append(f"有效率 {stats['effective_rate'] * 100:.0f}%")
+        return ", ".join(parts)
+
+    lines = [f"总体: {describe(summary['overall'])}"]
+    for mode, stats in sorted(summary["modes"].items()):
+        lines.append(f"  模式 {mode}: {describe(stats)}")
+    for hour, stats in sorted(summary["hours"].items()):
+        lines.append(f"  {hour:02d}:00 时段: {describe(stats)}")
+    return "\n".join(lines)
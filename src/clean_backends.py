@@ -0,0 +1,214 @@
+"""
+内存清理后端
+
+MemoryCleaner 把实际的系统调用委托给后端，后端声明自己支持的清理模式。
+每个后端的 clean(mode) 失败时抛出异常，由 MemoryCleaner 转换为结果字典。
+"""
+
+import ctypes
+import ctypes.wintypes
+import os
+import time
+
+
+class CleanBackend:
+    """清理后端基类"""
+
+    name = "base"
+    modes = ()
+
+    @property
+    def default_mode(self):
+        return self.modes[0]
+
+    def supports(self, mode):
+        return mode in self.modes
+
+    def clean(self, mode):
+        """
+        执行一次清理，失败时抛出异常
+
+        Returns:
+            list | None: 只针对部分进程时返回这些进程名，整个系统范围的清理返回 None
+        """
+        raise NotImplementedError
+
+
+class _LUID(ctypes.Structure):
+    _fields_ = [("LowPart", ctypes.wintypes.DWORD), ("HighPart", ctypes.wintypes.LONG)]
+
+
+class _LUID_AND_ATTRIBUTES(ctypes.Structure):
+    _fields_ = [("Luid", _LUID), ("Attributes", ctypes.wintypes.DWORD)]
+
+
+class _TOKEN_PRIVILEGES(ctypes.Structure):
+    _fields_ = [("PrivilegeCount", ctypes.wintypes.DWORD), ("Privileges", _LUID_AND_ATTRIBUTES * 1)]
+
+
+def _load_kernel32():
+    """
+    加载本模块私有的 kernel32 实例并声明用到的函数原型
+
+    ctypes.windll.kernel32 是进程内共享的，在上面改 restype/argtypes 会影响其他模块的调用。
+    """
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.GetCurrentProcess.restype = ctypes.wintypes.HANDLE
+    kernel32.GetCurrentProcess.argtypes = ()
+    kernel32.SetProcessWorkingSetSize.restype = ctypes.wintypes.BOOL
+    kernel32.SetProcessWorkingSetSize.argtypes = (ctypes.wintypes.HANDLE, ctypes.c_size_t, ctypes.c_size_t)
+    kernel32.CloseHandle.restype = ctypes.wintypes.BOOL
+    kernel32.CloseHandle.argtypes = (ctypes.wintypes.HANDLE,)
+    return kernel32
+
+
+def _load_ntdll():
+    """加载本模块私有的 ntdll 实例并声明 NtSetSystemInformation 的原型"""
+    ntdll = ctypes.WinDLL("ntdll")
+    ntdll.NtSetSystemInformation.restype = ctypes.c_long
+    ntdll.NtSetSystemInformation.argtypes = (ctypes.c_int, ctypes.c_void_p, ctypes.c_ulong)
+    return ntdll
+
+
+class WindowsBackend(CleanBackend):
+    """
+    Windows 清理后端
+
+    working_set:  SetProcessWorkingSetSize(-1, -1, -1) 触发系统整理工作集
+    standby_list: NtSetSystemInformation(MemoryPurgeStandbyList) 清空备用列表，
+                  需要管理员权限（SeProfileSingleProcessPrivilege）
+    """
+
+    name = "windows"
+    modes = ("working_set", "standby_list")
+
+    _SYSTEM_MEMORY_LIST_INFORMATION = 80
+    _MEMORY_PURGE_STANDBY_LIST = 4
+    _TOKEN_ADJUST_PRIVILEGES = 0x0020
+    _TOKEN_QUERY = 0x0008
+    _SE_PRIVILEGE_ENABLED = 0x0002
+
+    def __init__(self, kernel32=None, ntdll=None):
+        self._kernel32 = kernel32 if kernel32 is not None else _load_kernel32()
+        self._ntdll = ntdll
+        self._privilege_enabled = False
+
+    def clean(self, mode):
+        if mode == "standby_list":
+            self._purge_standby_list()
+        else:
+            self._kernel32.SetProcessWorkingSetSize(
+                self._kernel32.GetCurrentProcess(), ctypes.c_size_t(-1), ctypes.c_size_t(-1)
+            )
+
+    def _purge_standby_list(self):
+        if not self._privilege_enabled:
+            self._enable_privilege("SeProfileSingleProcessPrivilege")
+            self._privilege_enabled = True
+        if self._ntdll is None:
+            self._ntdll = _load_ntdll()
+        command = ctypes.c_int(self._MEMORY_PURGE_STANDBY_LIST)
+        status = self._ntdll.NtSetSystemInformation(
+            self._SYSTEM_MEMORY_LIST_INFORMATION, ctypes.byref(command), ctypes.sizeof(command)
+        )
+        if status != 0:
+            raise OSError(f"NtSetSystemInformation failed with NTSTATUS 0x{status & 0xFFFFFFFF:08X}")
+
+    def _enable_privilege(self, privilege):
+        """为当前进程令牌启用指定特权，进程没有该特权时抛出 OSError"""
+        advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+        kernel32 = self._kernel32
+
+        token = ctypes.wintypes.HANDLE()
+        if not advapi32.OpenProcessToken(kernel32.GetCurrentProcess(),
+                                         self._TOKEN_ADJUST_PRIVILEGES | self._TOKEN_QUERY,
+                                         ctypes.byref(token)):
+            raise ctypes.WinError(ctypes.get_last_error())
+        try:
+            luid = _LUID()
+            if not advapi32.LookupPrivilegeValueW(None, privilege, ctypes.byref(luid)):
+                raise ctypes.WinError(ctypes.get_last_error())
+            privileges = _TOKEN_PRIVILEGES()
+            privileges.PrivilegeCount = 1
+            privileges.Privileges[0].Luid = luid
+            privileges.Privileges[0].Attributes = self._SE_PRIVILEGE_ENABLED
+            ctypes.set_last_error(0)
+            advapi32.AdjustTokenPrivileges(token, False, ctypes.byref(privileges), 0, None, None)
+            # AdjustTokenPrivileges "succeeds" with ERROR_NOT_ALL_ASSIGNED when not elevated
+            error = ctypes.get_last_error()
+            if error:
+                raise ctypes.WinError(error)
+        finally:
+            kernel32.CloseHandle(token)
+
+
+class LinuxDropCachesBackend(CleanBackend):
+    """Linux：写 /proc/sys/vm/drop_caches 释放页缓存（需要 root）"""
+
+    name = "linux_drop_caches"
+    modes = ("page_cache",)
+
+    def __init__(self, drop_caches_path="/proc/sys/vm/drop_caches"):
+        self.drop_caches_path = drop_caches_path
+
+    def clean(self, mode):
+        # Dirty pages cannot be dropped, write them back first
+        os.sync()
+        with open(self.drop_caches_path, 'w', encoding='ascii') as f:
+            f.write("1\n")
+
+
+class CgroupReclaimBackend(CleanBackend):
+    """
+    cgroup v2：写 memory.reclaim 让内核只回收本 cgroup（容器）的内存，不需要 root，
+    也不会影响宿主机上的其他进程
+    """
+
+    name = "cgroup_reclaim"
+    modes = ("cgroup_reclaim",)
+
+    def __init__(self, cgroup, amount=None):
+        """
+        Args:
+            cgroup: src.cgroup.Cgroup 实例，需要 supports_reclaim
+            amount: 每次请求回收的字节数，默认为当前不活跃页缓存的大小（memory.stat 的 inactive_file）；
+                按全部页缓存请求时，内核回收不够会继续回收匿名内存
+        """
+        if not cgroup.supports_reclaim:
+            raise ValueError(f"{cgroup!r} does not provide memory.reclaim")
+        self.cgroup = cgroup
+        self.amount = amount
+
+    def clean(self, mode):
+        amount = self.amount
+        if amount is None:
+            amount = self.cgroup.read_stat().get("inactive_file", 0)
+        if amount <= 0:
+            return
+        # EAGAIN means the kernel reclaimed less than asked, which still counts as a clean
+        self.cgroup.reclaim(amount)
+
+
+class FakeBackend(CleanBackend):
+    """测试和基准用的后端：不触碰系统，只记录调用"""
+
+    name = "fake"
+
+    def __init__(self, modes=("working_set",), delay=0.0, error=None):
+        """
+        Args:
+            modes: 声明支持的模式
+            delay: 每次清理的模拟耗时(秒)
+            error: 提供时每次清理都抛出该异常
+        """
+        self.modes = tuple(modes)
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def clean(self, mode):
+        self.calls.append(mode)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,268 @@
+"""
+清理代价测量
+
+清理释放的内存并不都是收益：被换出的页面很快又会被访问，产生缺页和换入，
+这部分开销就是用户感受到的卡顿。CleanCostTracker 比较清理前后各 window 秒内的
+系统缺页率和换入速率，给每次清理算出净收益并写回清理日志。
+清理后的窗口由 FaultWindows 统计，DeferredCleaner 的空闲 / 非空闲缺页对比也用同一份。
+
+净收益(MB) = 释放量 - 新增缺页数 x 页大小 - 新增换入量
+新增量按清理后窗口的速率减去清理前窗口的速率计算，不低于 0；
+为负说明这次清理弊大于利，应考虑换用其他模式或关闭自动清理。
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from src.memory_sources import read_fault_counters
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 ** 2
+# 每次缺页按一页计入代价
+PAGE_SIZE = 4096
+
+
+def _rates(start, end, elapsed):
+    """两次计数之间的每秒速率，字段不可用时为 None"""
+    rates = {}
+    for key in ("page_faults", "swap_in_bytes"):
+        if start.get(key) is None or end.get(key) is None or elapsed <= 0:
+            rates[key] = None
+        else:
+            rates[key] = max(0, end[key] - start[key]) / elapsed
+    return rates
+
+
+class FaultWindows:
+    """
+    清理后的缺页统计窗口，CleanCostTracker 和 DeferredCleaner 共用一份
+
+    open() 在清理线程上调用，poll() 在采样线程上调用，计数器历史和进行中的窗口由锁保护。
+    窗口满 window 秒后调用 on_close(before, after)：before 为清理前 window 秒内的速率
+    （没有历史时为 None），after 为清理后的速率，都是 {page_faults, swap_in_bytes} 的每秒值。
+    """
+
+    # 同一次清理的多个使用方在该时间(秒)内先后 open() 时共用一次计数器读取
+    SHARE_READING = 1.0
+
+    def __init__(self, window=60, counter_source=read_fault_counters, history_size=256, clock=time.monotonic):
+        """
+        Args:
+            window: 清理前后各自统计的时长(秒)
+            counter_source: 返回 {page_faults, swap_in_bytes} 累计值的函数，不支持时返回 None
+            history_size: 保留的计数器样本数，用于计算清理前窗口
+            clock: 单调时钟，测试时可替换
+        """
+        if window <= 0:
+            raise ValueError(f"window must be positive, got {window}")
+        self.window = window
+        self._counter_source = counter_source
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._history = collections.deque(maxlen=history_size)
+        # 进行中的窗口: [(开始时间, 开始时的计数, 清理前速率, on_close)]
+        self._open = []
+        self._last_open = None
+
+    @property
+    def measuring(self):
+        """进行中的窗口数"""
+        with self._lock:
+            return len(self._open)
+
+    def open(self, on_close):
+        """
+        清理完成后调用，开始一个窗口；清理前的速率取自之前 poll() 记录的样本
+
+        Returns:
+            bool: 是否开始了统计（计数器不可用时为 False）
+        """
+        now = self._clock()
+        with self._lock:
+            last = self._last_open
+        if last is not None and 0 <= now - last[0] <= self.SHARE_READING:
+            counters = last[1]
+        else:
+            counters = self._read()
+            if counters is None:
+                return False
+        with self._lock:
+            before = self._rates_since(now - self.window, now, counters)
+            self._history.append((now, counters))
+            self._open.append((now, counters, before, on_close))
+            self._last_open = (now, counters)
+        return True
+
+    def poll(self):
+        """
+        每个监控样本调用一次：记录计数器，结束已满 window 秒的窗口并调用其 on_close
+
+        多个使用方在同一个样本中各自调用时，后面的调用没有额外开销。
+
+        Returns:
+            int: 本次结束的窗口数
+        """
+        now = self._clock()
+        with self._lock:
+            due = any(now - start >= self.window for start, _, _, _ in self._open)
+            # Two samples per window are enough for the before-clean baseline
+            if not due and self._history and now - self._history[-1][0] < self.window / 2:
+                return 0
+        counters = self._read()
+        if counters is None:
+            return 0
+        with self._lock:
+            self._history.append((now, counters))
+            closed = [w for w in self._open if now - w[0] >= self.window]
+            self._open = [w for w in self._open if now - w[0] < self.window]
+        for start, start_counters, before, on_close in closed:
+            try:
+                on_close(before, _rates(start_counters, counters, now - start))
+            except Exception:
+                logger.exception("Failed to close a page fault window")
+        return len(closed)
+
+    def _read(self):
+        try:
+            return self._counter_source()
+        except Exception as e:
+            logger.debug(f"Fault counters unavailable: {e}")
+            return None
+
+    def _rates_since(self, since, now, counters):
+        """
+        计算清理前的速率（调用方需持有 _lock）：取 since 之后最早的历史样本，
+        没有时取最近的一个更早样本；没有任何历史时为 None
+        """
+        chosen = None
+        for sample_time, sample in self._history:
+            if sample_time >= now:
+                break
+            chosen = (sample_time, sample)
+            if sample_time >= since:
+                break
+        if chosen is None:
+            return None
+        return _rates(chosen[1], counters, now - chosen[0])
+
+
+class CleanCostTracker:
+    """为每次清理测量清理前后窗口内的缺页和换入"""
+
+    def __init__(self, window=60, on_complete=None, counter_source=read_fault_counters,
+                 history_size=256, clock=time.monotonic, fault_windows=None):
+        """
+        Args:
+            window: 清理前后各自统计的时长(秒)
+            on_complete: 测量完成时调用 on_complete(entry_id, {"cost": cost})，通常为 LogManager.annotate
+            counter_source: 返回 {page_faults, swap_in_bytes} 累计值的函数
+            history_size: 保留的计数器样本数，用于计算清理前窗口
+            clock: 单调时钟，测试时可替换
+            fault_windows: 与 DeferredCleaner 共用的 FaultWindows；给出时忽略前面的窗口参数
+        """
+        if fault_windows is None:
+            fault_windows = FaultWindows(window, counter_source, history_size, clock)
+        self.windows = fault_windows
+        self.window = fault_windows.window
+        self._on_complete = on_complete
+        self._lock = threading.Lock()
+        self._measuring = 0
+        self._completed = []
+        # 每种模式的 [次数, 净收益总和]
+        self._by_mode = {}
+
+    @property
+    def measuring(self):
+        """正在测量中的清理次数"""
+        with self._lock:
+            return self._measuring
+
+    def begin(self, entry_id, freed_gb, mode=None):
+        """清理完成后调用，开始测量；可以在采样线程以外的线程调用"""
+        freed_mb = freed_gb * 1024
+
+        def on_close(before, after):
+            self._complete(entry_id, mode, self._score(before, after, freed_mb))
+
+        with self._lock:
+            self._measuring += 1
+        if not self.windows.open(on_close):
+            with self._lock:
+                self._measuring -= 1
+
+    def poll(self):
+        """
+        每个监控样本调用一次：记录计数器，结束已满 window 秒的测量
+
+        Returns:
+            list: 自上次调用以来完成的 (entry_id, cost)
+        """
+        self.windows.poll()
+        with self._lock:
+            completed, self._completed = self._completed, []
+        return completed
+
+    def summary(self):
+        """
+        按清理模式汇总净收益
+
+        Returns:
+            dict: {mode: {count, mean_net_benefit_mb}}
+        """
+        with self._lock:
+            return {
+                mode: {"count": count, "mean_net_benefit_mb": round(total / count, 1)}
+                for mode, (count, total) in self._by_mode.items()
+            }
+
+    def _complete(self, entry_id, mode, cost):
+        with self._lock:
+            self._measuring -= 1
+            stats = self._by_mode.setdefault(mode, [0, 0.0])
+            stats[0] += 1
+            stats[1] += cost["net_benefit_mb"]
+            self._completed.append((entry_id, cost))
+        if self._on_complete is not None:
+            try:
+                self._on_complete(entry_id, {"cost": cost})
+            except Exception:
+                logger.exception(f"Failed to record clean cost for {entry_id}")
+
+    def _score(self, before, after, freed_mb):
+        def extra(key):
+            if after[key] is None:
+                return None
+            baseline = before[key] if before is not None and before[key] is not None else 0
+            return max(0.0, after[key] - baseline) * self.window
+
+        extra_faults = extra("page_faults")
+        extra_swap_in = extra("swap_in_bytes")
+        cost_mb = ((extra_faults or 0) * PAGE_SIZE + (extra_swap_in or 0)) / _MB
+
+        def per_second(rates, key, scale=1, digits=1):
+            if rates is None or rates[key] is None:
+                return None
+            return round(rates[key] / scale, digits)
+
+        return {
+            "window": self.window,
+            "faults_per_s_before": per_second(before, "page_faults"),
+            "faults_per_s_after": per_second(after, "page_faults"),
+            "swap_in_mb_per_s_before": per_second(before, "swap_in_bytes", _MB, 3),
+            "swap_in_mb_per_s_after": per_second(after, "swap_in_bytes", _MB, 3),
+            "extra_faults": round(extra_faults) if extra_faults is not None else None,
+            "net_benefit_mb": round(freed_mb - cost_mb, 1)
+        }
+
+
+def format_cost_summary(summary):
+    """把 summary() 的结果格式化为多行文本"""
+    if not summary:
+        return "清理代价: 暂无数据"
+    lines = ["清理代价（每次平均净收益）:"]
+    for mode, stats in sorted(summary.items(), key=lambda item: str(item[0])):
+        lines.append(f"  {mode or '默认'}: {stats['mean_net_benefit_mb']:+} MB ({stats['count']} 次)")
+    return "\n".join(lines)
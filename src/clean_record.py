@@ -0,0 +1,228 @@
+"""
+清理日志记录
+
+logs/clean.log 的格式:
+
+    v2: {"version": 2, "records": [记录, ...]}
+    v1: [记录, ...]（旧版本的裸列表，没有 id / mode / trigger / duration_ms / processes）
+
+每条记录读入后转换为 CleanRecord，所有读取方都通过它的属性访问字段，
+不再直接索引字典。v1 文件在第一次读取时自动迁移为 v2，原文件保留为 clean.log.v1。
+"""
+
+from datetime import datetime
+
+SCHEMA_VERSION = 2
+
+# 已知的触发方式；其他字符串也会原样保存
+TRIGGER_LABELS = {
+    "manual": "手动",
+    "auto": "自动",
+    "rule": "规则",
+    "remote": "远程",
+    "unknown": "未记录"
+}
+
+# 已知字段之外的内容（例如旧版本或更新版本写入的字段）原样保存在 extra 中
+_FIELDS = ("id", "timestamp", "before_percent", "after_percent", "freed_gb",
+           "mode", "trigger", "duration_ms", "processes", "cost")
+
+
+class CleanRecord:
+    """一次清理的记录"""
+
+    __slots__ = _FIELDS + ("extra", "_time")
+
+    def __init__(self, id, timestamp, before_percent, after_percent, freed_gb, mode=None,
+                 trigger=None, duration_ms=None, processes=None, cost=None, extra=None):
+        self.id = id
+        self.timestamp = timestamp
+        self.before_percent = before_percent
+        self.after_percent = after_percent
+        self.freed_gb = freed_gb
+        self.mode = mode
+        self.trigger = trigger
+        self.duration_ms = duration_ms
+        self.processes = processes
+        self.cost = cost
+        self.extra = extra
+        self._time = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从文件中的字典创建，兼容 v1 记录
+
+        Raises:
+            ValueError: 缺少必需字段或字段类型无效
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"clean record must be an object, got {type(data).__name__}")
+        # StatusWindow once expected "freed"; accept it so hand-edited files still load
+        freed = data.get("freed_gb", data.get("freed"))
+        for name, value in (("before_percent", data.get("before_percent")),
+                            ("after_percent", data.get("after_percent")),
+                            ("freed_gb", freed)):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"clean record field {name} must be a number, got {value!r}")
+        timestamp = data.get("timestamp")
+        if not isinstance(timestamp, str):
+            raise ValueError(f"clean record field timestamp must be a string, got {timestamp!r}")
+        processes = data.get("processes")
+        extra = {k: v for k, v in data.items() if k not in _FIELDS and k != "freed"}
+        return cls(
+            id=data.get("id"),
+            timestamp=timestamp,
+            before_percent=data["before_percent"],
+            after_percent=data["after_percent"],
+            freed_gb=freed,
+            mode=data.get("mode"),
+            trigger=data.get("trigger"),
+            duration_ms=data.get("duration_ms"),
+            processes=tuple(processes) if isinstance(processes, list) else None,
+            cost=data.get("cost"),
+            extra=extra or None
+        )
+
+    def to_dict(self):
+        """写入文件的字典，省略值为 None 的可选字段"""
+        data = {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "before_percent": self.before_percent,
+            "after_percent": self.after_percent,
+            "freed_gb": self.freed_gb
+        }
+        for name in ("mode", "trigger", "duration_ms", "cost"):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.processes is not None:
+            data["processes"] = list(self.processes)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def update(self, fields):
+        """合并补充字段，例如 CleanCostTracker 算出的 cost"""
+        for name, value in fields.items():
+            if name in _FIELDS:
+                setattr(self, name, tuple(value) if name == "processes" and value is not None else value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[name] = value
+        if "timestamp" in fields:
+            self._time = None
+
+    @property
+    def time(self):
+        """清理时间，第一次访问时解析并缓存"""
+        if self._time is None:
+            self._time = datetime.fromisoformat(self.timestamp)
+        return self._time
+
+    @property
+    def net_benefit_mb(self):
+        """清理代价统计的净收益(MB)，尚未算出时为 None"""
+        return self.cost.get("net_benefit_mb") if isinstance(self.cost, dict) else None
+
+    @property
+    def trigger_label(self):
+        if self.trigger is None:
+            return None
+        return TRIGGER_LABELS.get(self.trigger, self.trigger)
+
+    def format_line(self):
+        """一行摘要，托盘状态和状态窗口共用"""
+        line = (f"[{self.timestamp[:19]}] {self.before_percent}% -> {self.after_percent}%, "
+                f"释放 {self.freed_gb}GB")
+        details = [d for d in (self.trigger_label, self.mode) if d]
+        if self.duration_ms is not None:
+            details.append(f"{self.duration_ms:.0f}ms")
+        if details:
+            line += f" ({', '.join(details)})"
+        if self.net_benefit_mb is not None:
+            line += f", 净收益 {self.net_benefit_mb:+} MB"
+        return line
+
+    def __eq__(self, other):
+        if not isinstance(other, CleanRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"CleanRecord(id={self.id!r}, timestamp={self.timestamp!r}, freed_gb={self.freed_gb!r})"
+
+
+def decode_log(data):
+    """
+    把日志文件内容转换为记录列表
+
+    Args:
+        data: json.load() 的结果
+
+    Returns:
+        tuple: (记录列表, 文件的 schema 版本)；无效记录被跳过
+
+    Raises:
+        ValueError: 文件结构无法识别
+    """
+    if isinstance(data, list):
+        version, items = 1, data
+    elif isinstance(data, dict) and isinstance(data.get("records"), list):
+        version, items = data.get("version", SCHEMA_VERSION), data["records"]
+        if not isinstance(version, int):
+            raise ValueError(f"clean log version must be an integer, got {version!r}")
+    else:
+        raise ValueError("clean log must be a list (v1) or an object with a records list")
+    records = []
+    for item in items:
+        try:
+            records.append(CleanRecord.from_dict(item))
+        except ValueError:
+            continue
+    return records, version
+
+
+def encode_log(records):
+    """记录列表转换为 v2 文件内容"""
+    return {"version": SCHEMA_VERSION, "records": [record.to_dict() for record in records]}
+
+
+def summarize_records(records):
+    """
+    按触发方式汇总清理次数、平均释放量和平均耗时
+
+    Returns:
+        dict: {trigger: {count, mean_freed_gb, mean_duration_ms}}，未记录触发方式的归为 "unknown"
+    """
+    groups = {}
+    for record in records:
+        stats = groups.setdefault(record.trigger or "unknown", [0, 0.0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += record.freed_gb
+        if record.duration_ms is not None:
+            stats[2] += record.duration_ms
+            stats[3] += 1
+    return {
+        trigger: {
+            "count": count,
+            "mean_freed_gb": round(freed / count, 2),
+            "mean_duration_ms": round(duration / timed, 1) if timed else None
+        }
+        for trigger, (count, freed, duration, timed) in sorted(groups.items())
+    }
+
+
+def format_records_summary(summary):
+    """把 summarize_records() 的结果格式化为一行"""
+    if not summary:
+        return "按触发方式: 暂无数据"
+    parts = []
+    for trigger, stats in summary.items():
+        part = f"{TRIGGER_LABELS.get(trigger, trigger)} {stats['count']} 次, 平均释放 {stats['mean_freed_gb']}GB"
+        if stats["mean_duration_ms"] is not None:
+            part += f", 平均耗时 {stats['mean_duration_ms']}ms"
+        parts.append(part)
+    return "按触发方式: " + "; ".join(parts)
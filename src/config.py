@@ -1,8 +1,13 @@
 # src/config.py
+import copy
 import json
 import os
 import logging
 
+from src.rules import compile_rules
+from src.alerts import parse_quiet_hours
+from src.memory_monitor import MemoryMonitor
+
 logger = logging.getLogger(__name__)
 
 class ConfigManager:
@@ -10,7 +15,40 @@ class ConfigManager:
         "warning_threshold": 85,
         "auto_clean": False,
         "auto_clean_threshold": 80,
-        "refresh_interval": 5
+        "refresh_interval": 5,
+        "swap_warning_threshold": 50,
+        "commit_warning_threshold": 90,
+        "swap_in_rate_threshold": 10,
+        "adaptive_sampling": True,
+        "sampling_min_interval": 1,
+        "sampling_max_interval": 60,
+        "instrumentation_enabled": True,
+        "self_rss_budget_mb": 150,
+        "self_watchdog_interval": 600,
+        "self_tracemalloc": False,
+        "log_durability": "flush",
+        "log_flush_interval": 2,
+        "log_max_pending": 20,
+        "idle_clean": True,
+        "idle_seconds": 120,
+        "idle_max_defer": 1800,
+        "clean_min_interval": 300,
+        "critical_threshold": 95,
+        "clean_cost_window": 60,
+        "auto_clean_trigger": "percent",
+        "psi_some_threshold": 10,
+        "psi_full_threshold": 5,
+        "psi_trigger": True,
+        "fleet_url": "",
+        "fleet_token": "",
+        "alerts_enabled": True,
+        "alert_quiet_hours": [],
+        "alert_rate_limit": 3,
+        "alert_repeat_interval": 1800,
+        "use_service": False,
+        "service_address": "",
+        "service_group": "",
+        "rules": []
     }
 
     def __init__(self, config_path="config.json"):
@@ -47,6 +85,145 @@ class ConfigManager:
     def refresh_interval(self):
         return self._config.get("refresh_interval", 5)
 
+    @property
+    def swap_warning_threshold(self):
+        return self._config.get("swap_warning_threshold", 50)
+
+    @property
+    def commit_warning_threshold(self):
+        return self._config.get("commit_warning_threshold", 90)
+
+    @property
+    def swap_in_rate_threshold(self):
+        return self._config.get("swap_in_rate_threshold", 10)
+
+    @property
+    def adaptive_sampling(self):
+        return self._config.get("adaptive_sampling", True)
+
+    @property
+    def sampling_min_interval(self):
+        return self._config.get("sampling_min_interval", 1)
+
+    @property
+    def sampling_max_interval(self):
+        return self._config.get("sampling_max_interval", 60)
+
+    @property
+    def instrumentation_enabled(self):
+        return self._config.get("instrumentation_enabled", True)
+
+    @property
+    def self_rss_budget_mb(self):
+        return self._config.get("self_rss_budget_mb", 150)
+
+    @property
+    def self_watchdog_interval(self):
+        return self._config.get("self_watchdog_interval", 600)
+
+    @property
+    def self_tracemalloc(self):
+        return self._config.get("self_tracemalloc", False)
+
+    @property
+    def log_durability(self):
+        return self._config.get("log_durability", "flush")
+
+    @property
+    def log_flush_interval(self):
+        return self._config.get("log_flush_interval", 2)
+
+    @property
+    def log_max_pending(self):
+        return self._config.get("log_max_pending", 20)
+
+    @property
+    def idle_clean(self):
+        return self._config.get("idle_clean", True)
+
+    @property
+    def idle_seconds(self):
+        return self._config.get("idle_seconds", 120)
+
+    @property
+    def idle_max_defer(self):
+        return self._config.get("idle_max_defer", 1800)
+
+    @property
+    def clean_min_interval(self):
+        return self._config.get("clean_min_interval", 300)
+
+    @property
+    def critical_threshold(self):
+        return self._config.get("critical_threshold", 95)
+
+    @property
+    def clean_cost_window(self):
+        return self._config.get("clean_cost_window", 60)
+
+    @property
+    def auto_clean_trigger(self):
+        return self._config.get("auto_clean_trigger", "percent")
+
+    @property
+    def psi_some_threshold(self):
+        return self._config.get("psi_some_threshold", 10)
+
+    @property
+    def psi_full_threshold(self):
+        return self._config.get("psi_full_threshold", 5)
+
+    @property
+    def psi_trigger(self):
+        return self._config.get("psi_trigger", True)
+
+    @property
+    def fleet_url(self):
+        """汇总服务地址，为空时不上报"""
+        return self._config.get("fleet_url", "")
+
+    @property
+    def fleet_token(self):
+        """汇总服务 /ingest 的共享令牌，上报端和汇总服务使用同一个值，为空时不校验"""
+        return self._config.get("fleet_token", "")
+
+    @property
+    def alerts_enabled(self):
+        return self._config.get("alerts_enabled", True)
+
+    @property
+    def alert_quiet_hours(self):
+        """免打扰时间窗口，例如 ["22:00-08:00"]"""
+        return list(self._config.get("alert_quiet_hours", []))
+
+    @property
+    def alert_rate_limit(self):
+        return self._config.get("alert_rate_limit", 3)
+
+    @property
+    def alert_repeat_interval(self):
+        return self._config.get("alert_repeat_interval", 1800)
+
+    @property
+    def use_service(self):
+        """托盘程序是否通过后台服务清理"""
+        return self._config.get("use_service", False)
+
+    @property
+    def service_address(self):
+        """后台服务的命令通道地址，为空时使用默认地址"""
+        return self._config.get("service_address", "")
+
+    @property
+    def service_group(self):
+        """POSIX 上可以连接后台服务的组，为空时只有服务账户自己"""
+        return self._config.get("service_group", "")
+
+    @property
+    def rules(self):
+        """清理策略规则列表，语法见 src/rules.py"""
+        return copy.deepcopy(self._config.get("rules", []))
+
     def save(self):
         """保存当前配置到文件"""
         try:
@@ -85,3 +262,239 @@ class ConfigManager:
         if value <= 0:
             raise ValueError("refresh_interval must be a positive integer")
         self._config["refresh_interval"] = value
+
+    @swap_warning_threshold.setter
+    def swap_warning_threshold(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("swap_warning_threshold must be a number")
+        if not 0 <= value <= 100:
+            raise ValueError("swap_warning_threshold must be between 0 and 100")
+        self._config["swap_warning_threshold"] = value
+
+    @commit_warning_threshold.setter
+    def commit_warning_threshold(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("commit_warning_threshold must be a number")
+        if not 0 <= value <= 100:
+            raise ValueError("commit_warning_threshold must be between 0 and 100")
+        self._config["commit_warning_threshold"] = value
+
+    @swap_in_rate_threshold.setter
+    def swap_in_rate_threshold(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("swap_in_rate_threshold must be a number")
+        if value < 0:
+            raise ValueError("swap_in_rate_threshold must be non-negative")
+        self._config["swap_in_rate_threshold"] = value
+
+    @adaptive_sampling.setter
+    def adaptive_sampling(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("adaptive_sampling must be a boolean")
+        self._config["adaptive_sampling"] = value
+
+    @sampling_min_interval.setter
+    def sampling_min_interval(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("sampling_min_interval must be a number")
+        if value <= 0:
+            raise ValueError("sampling_min_interval must be a positive number")
+        self._config["sampling_min_interval"] = value
+
+    @sampling_max_interval.setter
+    def sampling_max_interval(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("sampling_max_interval must be a number")
+        if value < self.sampling_min_interval:
+            raise ValueError("sampling_max_interval must be >= sampling_min_interval")
+        self._config["sampling_max_interval"] = value
+
+    @instrumentation_enabled.setter
+    def instrumentation_enabled(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("instrumentation_enabled must be a boolean")
+        self._config["instrumentation_enabled"] = value
+
+    @self_rss_budget_mb.setter
+    def self_rss_budget_mb(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("self_rss_budget_mb must be a number")
+        if value <= 0:
+            raise ValueError("self_rss_budget_mb must be a positive number")
+        self._config["self_rss_budget_mb"] = value
+
+    @self_watchdog_interval.setter
+    def self_watchdog_interval(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("self_watchdog_interval must be a number")
+        if value <= 0:
+            raise ValueError("self_watchdog_interval must be a positive number")
+        self._config["self_watchdog_interval"] = value
+
+    @self_tracemalloc.setter
+    def self_tracemalloc(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("self_tracemalloc must be a boolean")
+        self._config["self_tracemalloc"] = value
+
+    @log_durability.setter
+    def log_durability(self, value):
+        if value not in ("none", "flush", "fsync"):
+            raise ValueError("log_durability must be one of 'none', 'flush', 'fsync'")
+        self._config["log_durability"] = value
+
+    @log_flush_interval.setter
+    def log_flush_interval(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("log_flush_interval must be a number")
+        if value <= 0:
+            raise ValueError("log_flush_interval must be a positive number")
+        self._config["log_flush_interval"] = value
+
+    @log_max_pending.setter
+    def log_max_pending(self, value):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError("log_max_pending must be an integer")
+        if value < 1:
+            raise ValueError("log_max_pending must be a positive integer")
+        self._config["log_max_pending"] = value
+
+    @idle_clean.setter
+    def idle_clean(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("idle_clean must be a boolean")
+        self._config["idle_clean"] = value
+
+    @idle_seconds.setter
+    def idle_seconds(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("idle_seconds must be a number")
+        if value <= 0:
+            raise ValueError("idle_seconds must be a positive number")
+        self._config["idle_seconds"] = value
+
+    @idle_max_defer.setter
+    def idle_max_defer(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("idle_max_defer must be a number")
+        if value < 0:
+            raise ValueError("idle_max_defer must be non-negative")
+        self._config["idle_max_defer"] = value
+
+    @clean_min_interval.setter
+    def clean_min_interval(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("clean_min_interval must be a number")
+        if value < 0:
+            raise ValueError("clean_min_interval must be non-negative")
+        self._config["clean_min_interval"] = value
+
+    @critical_threshold.setter
+    def critical_threshold(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("critical_threshold must be a number")
+        if value <= 0 or value > 100:
+            raise ValueError("critical_threshold must be between 0 and 100")
+        self._config["critical_threshold"] = value
+
+    @clean_cost_window.setter
+    def clean_cost_window(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("clean_cost_window must be a number")
+        if value <= 0:
+            raise ValueError("clean_cost_window must be a positive number")
+        self._config["clean_cost_window"] = value
+
+    @auto_clean_trigger.setter
+    def auto_clean_trigger(self, value):
+        if value not in MemoryMonitor.AUTO_CLEAN_TRIGGERS:
+            raise ValueError("auto_clean_trigger must be one of 'percent', 'pressure', 'either'")
+        self._config["auto_clean_trigger"] = value
+
+    @psi_some_threshold.setter
+    def psi_some_threshold(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("psi_some_threshold must be a number")
+        if value <= 0 or value > 100:
+            raise ValueError("psi_some_threshold must be between 0 and 100")
+        self._config["psi_some_threshold"] = value
+
+    @psi_full_threshold.setter
+    def psi_full_threshold(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("psi_full_threshold must be a number")
+        if value <= 0 or value > 100:
+            raise ValueError("psi_full_threshold must be between 0 and 100")
+        self._config["psi_full_threshold"] = value
+
+    @psi_trigger.setter
+    def psi_trigger(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("psi_trigger must be a boolean")
+        self._config["psi_trigger"] = value
+
+    @fleet_url.setter
+    def fleet_url(self, value):
+        if not isinstance(value, str):
+            raise TypeError("fleet_url must be a string")
+        if value and not value.startswith(("http://", "https://")):
+            raise ValueError("fleet_url must start with http:// or https://")
+        self._config["fleet_url"] = value
+
+    @fleet_token.setter
+    def fleet_token(self, value):
+        if not isinstance(value, str):
+            raise TypeError("fleet_token must be a string")
+        self._config["fleet_token"] = value
+
+    @alerts_enabled.setter
+    def alerts_enabled(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("alerts_enabled must be a boolean")
+        self._config["alerts_enabled"] = value
+
+    @alert_quiet_hours.setter
+    def alert_quiet_hours(self, value):
+        # Raises ValueError naming the offending window
+        parse_quiet_hours(value)
+        self._config["alert_quiet_hours"] = list(value)
+
+    @alert_rate_limit.setter
+    def alert_rate_limit(self, value):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError("alert_rate_limit must be an integer")
+        if value < 1:
+            raise ValueError("alert_rate_limit must be a positive integer")
+        self._config["alert_rate_limit"] = value
+
+    @alert_repeat_interval.setter
+    def alert_repeat_interval(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("alert_repeat_interval must be a number")
+        if value < 0:
+            raise ValueError("alert_repeat_interval must be non-negative")
+        self._config["alert_repeat_interval"] = value
+
+    @use_service.setter
+    def use_service(self, value):
+        if not isinstance(value, bool):
+            raise TypeError("use_service must be a boolean")
+        self._config["use_service"] = value
+
+    @service_address.setter
+    def service_address(self, value):
+        if not isinstance(value, str):
+            raise TypeError("service_address must be a string")
+        self._config["service_address"] = value
+
+    @service_group.setter
+    def service_group(self, value):
+        if not isinstance(value, str):
+            raise TypeError("service_group must be a string")
+        self._config["service_group"] = value
+
+    @rules.setter
+    def rules(self, value):
+        # Raises RuleError (a ValueError) naming the offending rule and field
+        compile_rules(value, metric_names=MemoryMonitor.EXTENDED_METRICS)
+        self._config["rules"] = copy.deepcopy(value)
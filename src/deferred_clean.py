@@ -0,0 +1,219 @@
+"""
+空闲时延迟执行的清理
+
+自动清理在用户操作时收缩工作集，用户接下来访问被换出的页面就会产生硬缺页和卡顿。
+DeferredCleaner 把清理请求排队，等到系统空闲再执行；排队超过 max_defer 秒
+或内存使用率达到 critical_percent 时不再等待。触发条件在空闲前已经消失（短暂的峰值）时，
+调用方用 cancel() 撤回请求，避免几分钟后再做一次不必要的清理。
+
+每次清理后统计 fault_window 秒内的系统缺页次数，按触发方式分组：
+空闲时执行的清理与非空闲时执行的清理（超时、紧急、手动）之差，
+就是延迟到空闲时段避免的缺页次数估计。
+"""
+
+import logging
+import threading
+import time
+
+from src.clean_cost import FaultWindows
+from src.memory_sources import read_page_faults
+
+logger = logging.getLogger(__name__)
+
+# 非空闲时执行的触发方式
+BUSY_TRIGGERS = ("deadline", "critical", "immediate")
+
+
+class DeferredCleaner:
+    """排队等待空闲的清理请求"""
+
+    def __init__(self, clean_fn, idle_detector, max_defer=1800, critical_percent=95, min_interval=300,
+                 fault_source=read_page_faults, fault_window=60, fault_windows=None, clock=time.monotonic):
+        """
+        Args:
+            clean_fn: 执行清理的函数，接收 mode，返回 MemoryCleaner.clean() 风格的结果
+            idle_detector: IdleDetector 实例
+            max_defer: 请求最多等待的秒数，0 表示不等待空闲
+            critical_percent: 内存使用率达到该值时立即执行排队的请求
+            min_interval: 上次清理后该时间(秒)内的新请求被忽略，避免反复清理
+            fault_source: 返回系统累计缺页次数的函数，返回 None 表示不支持
+            fault_window: 清理后统计缺页的时长(秒)
+            fault_windows: 与 CleanCostTracker 共用的 FaultWindows；给出时忽略 fault_source / fault_window
+            clock: 单调时钟，测试时可替换
+        """
+        if max_defer < 0:
+            raise ValueError(f"max_defer must be non-negative, got {max_defer}")
+        if not 0 < critical_percent <= 100:
+            raise ValueError(f"critical_percent must be between 0 and 100, got {critical_percent}")
+        if min_interval < 0:
+            raise ValueError(f"min_interval must be non-negative, got {min_interval}")
+        if fault_window <= 0:
+            raise ValueError(f"fault_window must be positive, got {fault_window}")
+        self.max_defer = max_defer
+        self.critical_percent = critical_percent
+        self.min_interval = min_interval
+        if fault_windows is None:
+            def counters():
+                faults = fault_source()
+                return {"page_faults": faults} if faults is not None else None
+
+            fault_windows = FaultWindows(fault_window, counter_source=counters, clock=clock)
+        self.fault_window = fault_windows.window
+        self._fault_windows = fault_windows
+        self._clean_fn = clean_fn
+        self._idle_detector = idle_detector
+        self._clock = clock
+
+        self._pending = None
+        self._last_run = None
+        self._requests = 0
+        self._cancelled = 0
+        self._runs = {"idle": 0, "deadline": 0, "critical": 0}
+        self._wait_total = 0.0
+        # 已完成窗口按 idle/busy 分组的 [次数, 缺页总数]，在采样线程上更新
+        self._faults = {"idle": [0, 0.0], "busy": [0, 0.0]}
+        self._faults_lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """排队中的请求 {mode, reason, requested, deadline}，没有时为 None"""
+        return dict(self._pending) if self._pending is not None else None
+
+    def request(self, mode=None, reason="auto"):
+        """
+        排队一次清理
+
+        已有排队请求时合并为一个（保留原截止时间）；距上次清理不足 min_interval 时忽略。
+
+        Returns:
+            bool: 是否新建了请求
+        """
+        now = self._clock()
+        if self._pending is not None:
+            return False
+        if self._last_run is not None and now - self._last_run < self.min_interval:
+            return False
+        self._requests += 1
+        self._pending = {"mode": mode, "reason": reason, "requested": now, "deadline": now + self.max_defer}
+        logger.debug(f"Clean deferred until idle (reason={reason}, max {self.max_defer}s)")
+        return True
+
+    def cancel(self, reason=None):
+        """
+        取消排队中的请求
+
+        Args:
+            reason: 只取消该原因的请求（例如条件已不成立的 "auto_clean"），None 时取消任何请求
+
+        Returns:
+            bool: 是否取消了请求
+        """
+        if self._pending is None or (reason is not None and self._pending["reason"] != reason):
+            return False
+        logger.debug(f"Deferred clean cancelled (reason={self._pending['reason']})")
+        self._pending = None
+        self._cancelled += 1
+        return True
+
+    def poll(self, mem_info):
+        """
+        每个监控样本调用一次：结算缺页统计窗口，条件满足时执行排队的清理
+
+        Args:
+            mem_info: 监控样本，需要 percent
+
+        Returns:
+            tuple | None: 执行了清理时为 (触发方式, 清理结果)
+        """
+        self._fault_windows.poll()
+        now = self._clock()
+        if self._pending is None:
+            return None
+
+        if mem_info["percent"] >= self.critical_percent:
+            trigger = "critical"
+        elif now >= self._pending["deadline"]:
+            trigger = "deadline"
+        elif self._check_idle():
+            trigger = "idle"
+        else:
+            return None
+
+        pending, self._pending = self._pending, None
+        self._runs[trigger] += 1
+        self._wait_total += now - pending["requested"]
+        self._last_run = now
+        logger.info(f"Running deferred clean (trigger={trigger}, waited {now - pending['requested']:.0f}s)")
+        result = self._clean_fn(pending["mode"])
+        if result and result.get("success"):
+            self.track_clean(trigger)
+        return trigger, result
+
+    def track_clean(self, trigger="immediate"):
+        """为一次已完成的清理开始缺页统计；不经过队列的手动清理用 "immediate" """
+        group = self._faults["idle" if trigger == "idle" else "busy"]
+
+        def on_close(before, after):
+            if after["page_faults"] is None:
+                return
+            with self._faults_lock:
+                group[0] += 1
+                group[1] += after["page_faults"] * self.fault_window
+
+        self._fault_windows.open(on_close)
+
+    def _check_idle(self):
+        try:
+            return self._idle_detector.is_idle()
+        except Exception as e:
+            # Without a usable detector the request simply waits for its deadline
+            logger.debug(f"Idle detection failed: {e}")
+            return False
+
+    def report(self):
+        """
+        延迟清理统计
+
+        Returns:
+            dict: {requests, cancelled, runs, mean_wait_seconds, idle_faults_mean, busy_faults_mean,
+                   faults_avoided, pending}
+                *_faults_mean 为每次清理后 fault_window 秒内的平均缺页次数；
+                faults_avoided = (busy 均值 - idle 均值) x 空闲清理次数，任一组没有数据时为 None
+        """
+        runs = sum(self._runs.values())
+        with self._faults_lock:
+            idle_count, idle_total = self._faults["idle"]
+            busy_count, busy_total = self._faults["busy"]
+        idle_mean = idle_total / idle_count if idle_count else None
+        busy_mean = busy_total / busy_count if busy_count else None
+        avoided = None
+        if idle_mean is not None and busy_mean is not None:
+            avoided = round((busy_mean - idle_mean) * idle_count)
+        return {
+            "requests": self._requests,
+            "cancelled": self._cancelled,
+            "runs": dict(self._runs),
+            "mean_wait_seconds": round(self._wait_total / runs, 1) if runs else None,
+            "idle_faults_mean": round(idle_mean, 1) if idle_mean is not None else None,
+            "busy_faults_mean": round(busy_mean, 1) if busy_mean is not None else None,
+            "faults_avoided": avoided,
+            "pending": self._pending is not None
+        }
+
+
+def format_deferred_report(report):
+    """把 report() 的结果格式化为多行文本"""
+    runs = report["runs"]
+    lines = [f"延迟清理: 请求 {report['requests']} 次, 空闲时执行 {runs['idle']} 次, "
+             f"超时 {runs['deadline']} 次, 紧急 {runs['critical']} 次, 取消 {report['cancelled']} 次"]
+    if report["mean_wait_seconds"] is not None:
+        lines.append(f"  平均等待 {report['mean_wait_seconds']}s")
+    if report["idle_faults_mean"] is not None or report["busy_faults_mean"] is not None:
+        idle = report["idle_faults_mean"] if report["idle_faults_mean"] is not None else "-"
+        busy = report["busy_faults_mean"] if report["busy_faults_mean"] is not None else "-"
+        lines.append(f"  清理后缺页: 空闲 {idle} 次, 非空闲 {busy} 次")
+    if report["faults_avoided"] is not None:
+        lines.append(f"  估计避免缺页 {report['faults_avoided']} 次")
+    if report["pending"]:
+        lines.append("  有清理请求正在等待空闲")
+    return "\n".join(lines)
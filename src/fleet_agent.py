@@ -0,0 +1,188 @@
+"""
+向汇总服务上报的客户端
+
+监控样本和清理事件先放进内存缓冲，由后台线程每 flush_interval 秒或攒够 batch_size 条时
+以 JSON Lines 一次 POST 到汇总服务（见 src.fleet_aggregator）。服务不可达时保留缓冲，
+缓冲超过 max_buffer 条时丢弃最旧的记录，不影响本机的监控和清理。
+"""
+
+import atexit
+import functools
+import json
+import logging
+import socket
+import threading
+import time
+import urllib.request
+
+from src.fleet_aggregator import SAMPLE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+def post_lines(url, body, timeout=5, token=None):
+    """默认发送函数：POST JSON Lines，返回 HTTP 状态码；token 为汇总服务的共享令牌"""
+    headers = {"Content-Type": "application/x-ndjson"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(url, data=body, method="POST", headers=headers)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+class FleetAgent:
+    """缓冲本机的样本和清理事件，批量上报到汇总服务"""
+
+    def __init__(self, url, host=None, flush_interval=10, batch_size=500, max_buffer=5000,
+                 sender=None, clock=time.time, token=None):
+        """
+        Args:
+            url: 汇总服务地址，例如 http://aggregator:8765（自动补上 /ingest）
+            host: 上报的主机名，默认 socket.gethostname()
+            flush_interval: 最长上报间隔(秒)
+            batch_size: 缓冲达到该条数立即上报
+            max_buffer: 缓冲上限，服务不可达时超出部分丢弃最旧的记录
+            sender: sender(url, body) -> 状态码，测试时可替换
+            clock: 记录时间戳用的时钟
+            token: 汇总服务的共享令牌，由默认发送函数放在 Authorization 头中
+        """
+        if flush_interval <= 0:
+            raise ValueError(f"flush_interval must be positive, got {flush_interval}")
+        if batch_size < 1 or max_buffer < batch_size:
+            raise ValueError(f"need 1 <= batch_size <= max_buffer, got {batch_size} and {max_buffer}")
+        url = url.rstrip("/")
+        self.url = url if url.endswith("/ingest") else url + "/ingest"
+        self.host = host or socket.gethostname()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._sender = sender or functools.partial(post_lines, token=token or None)
+        self._clock = clock
+
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._writer = None
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.send_errors = 0
+
+    def record_sample(self, mem_info):
+        """记录一个监控样本，可以直接作为 MonitorScheduler 的监听器"""
+        record = {"host": self.host, "type": "sample", "ts": self._clock()}
+        for name in SAMPLE_FIELDS:
+            value = mem_info.get(name)
+            if value is not None:
+                record[name] = value
+        self._append(record)
+
+    def record_clean(self, result):
+        """记录一次 MemoryCleaner.clean() 的结果"""
+        self._append({
+            "host": self.host,
+            "type": "clean",
+            "ts": self._clock(),
+            "success": bool(result.get("success")),
+            "mode": result.get("mode"),
+            "freed_gb": result.get("freed", 0)
+        })
+
+    @property
+    def pending_count(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def _append(self, record):
+        with self._cond:
+            if self._closed:
+                return
+            self._start_writer()
+            self._buffer.append(record)
+            if len(self._buffer) > self.max_buffer:
+                overflow = len(self._buffer) - self.max_buffer
+                del self._buffer[:overflow]
+                self.dropped += overflow
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _start_writer(self):
+        """按需启动后台上报线程（调用方需持有 _cond）"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name="fleet-agent", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def flush(self):
+        """
+        立即上报缓冲中的全部记录
+
+        Returns:
+            bool: 成功上报（或没有需要上报的记录）
+        """
+        with self._send_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return True
+            body = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in batch).encode("utf-8")
+            try:
+                status = self._sender(self.url, body)
+                if status >= 300:
+                    raise OSError(f"aggregator answered HTTP {status}")
+            except Exception as e:
+                self.send_errors += 1
+                logger.warning(f"Failed to report {len(batch)} records to {self.url}: {e}")
+                with self._cond:
+                    # Put the batch back in front, keeping the newest max_buffer records
+                    self._buffer[:0] = batch
+                    overflow = len(self._buffer) - self.max_buffer
+                    if overflow > 0:
+                        del self._buffer[:overflow]
+                        self.dropped += overflow
+                return False
+            self.sent += len(batch)
+            return True
+
+    def _writer_loop(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._cond:
+                while not self._closed and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+            if not self.flush():
+                # Back off for a full interval instead of hammering an unreachable aggregator
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(self.flush_interval)
+            deadline = time.monotonic() + self.flush_interval
+
+    def close(self, timeout=2.0):
+        """
+        停止后台线程并尝试上报剩余记录，可重复调用
+
+        最多等待 timeout 秒，汇总服务不可达时不拖慢程序退出；来不及上报的记录丢弃。
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        writer = self._writer
+        if writer is not None and writer is not threading.current_thread():
+            writer.join(timeout)
+        if self.pending_count == 0:
+            return
+        # urlopen cannot be interrupted, so the final report runs on a daemon thread that quit does not wait for
+        final = threading.Thread(target=self.flush, name="fleet-agent-final", daemon=True)
+        final.start()
+        final.join(max(0.0, deadline - time.monotonic()))
+        if final.is_alive():
+            logger.warning(f"Final report to {self.url} did not finish within {timeout}s, giving up")
@@ -0,0 +1,480 @@
+"""
+多机汇总服务
+
+各台机器上的 FleetAgent 把监控样本和清理事件以 JSON Lines 批量 POST 到这里，
+服务为每台主机保留固定长度的环形缓冲，并提供全体机器的查询:
+
+    POST /ingest                    每行一条记录，见下文
+    GET  /hosts                     所有主机及最近一次样本
+    GET  /top?metric=psi_some_avg10&n=10&agg=latest|mean|max
+    GET  /percentiles?metric=percent&p=50,90,99&scope=latest|samples
+    GET  /cleans?n=10               清理成功率（全体、按模式、最差的 n 台主机）
+    GET  /health
+
+记录格式:
+    {"host": "ws-001", "type": "sample", "ts": 1700000000.0, "percent": 72.5, "psi_some_avg10": 3.1, ...}
+    {"host": "ws-001", "type": "clean", "ts": 1700000000.0, "success": true, "mode": "working_set", "freed_gb": 1.2}
+
+只依赖标准库：asyncio 上的最小 HTTP/1.1 实现（支持 keep-alive），单线程处理，
+解析和写入都在事件循环里完成，不需要锁。
+
+默认只监听 127.0.0.1；接收其他机器的上报需要显式给出监听地址，并建议设置共享令牌，
+设置后除 /health 外的所有请求（上报和查询）都要带 "Authorization: Bearer <令牌>":
+
+    python main.py --aggregator 0.0.0.0:8765
+"""
+
+import asyncio
+import collections
+import hmac
+import json
+import logging
+import math
+import time
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# 样本中保存的指标；其余字段丢弃，每个样本存为元组以控制内存
+SAMPLE_FIELDS = ("percent", "available", "swap_percent", "commit_percent", "psi_some_avg10", "psi_full_avg10")
+_FIELD_INDEX = {name: i + 1 for i, name in enumerate(SAMPLE_FIELDS)}
+AGGREGATES = ("latest", "mean", "max")
+
+_MB = 1024 ** 2
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class HostBuffer:
+    """一台主机的环形缓冲"""
+
+    __slots__ = ("samples", "cleans", "last_seen")
+
+    def __init__(self, sample_capacity, clean_capacity):
+        # (ts, *SAMPLE_FIELDS)
+        self.samples = collections.deque(maxlen=sample_capacity)
+        # (ts, success, mode, freed_gb)
+        self.cleans = collections.deque(maxlen=clean_capacity)
+        self.last_seen = None
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def _percentile(ordered, pct):
+    """最近秩法百分位数"""
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class FleetStore:
+    """按主机保存样本和清理事件，并回答全体机器的查询"""
+
+    def __init__(self, sample_capacity=360, clean_capacity=100, max_hosts=5000, clock=time.time):
+        """
+        Args:
+            sample_capacity: 每台主机保留的样本数（10 秒一次时为 1 小时）
+            clean_capacity: 每台主机保留的清理事件数
+            max_hosts: 最多跟踪的主机数，超出后新主机的记录被拒绝
+            clock: 记录没有 ts 时使用的时钟
+        """
+        if sample_capacity < 1 or clean_capacity < 1:
+            raise ValueError("sample_capacity and clean_capacity must be positive")
+        self.sample_capacity = sample_capacity
+        self.clean_capacity = clean_capacity
+        self.max_hosts = max_hosts
+        self._clock = clock
+        self._hosts = {}
+        self.accepted = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def _buffer(self, host):
+        buffer = self._hosts.get(host)
+        if buffer is None:
+            if len(self._hosts) >= self.max_hosts:
+                return None
+            buffer = self._hosts[host] = HostBuffer(self.sample_capacity, self.clean_capacity)
+        return buffer
+
+    def ingest(self, records):
+        """
+        写入一批记录
+
+        Returns:
+            tuple: (接受条数, 拒绝条数)
+        """
+        accepted = rejected = 0
+        now = self._clock()
+        for record in records:
+            if self._ingest_one(record, now):
+                accepted += 1
+            else:
+                rejected += 1
+        self.accepted += accepted
+        self.rejected += rejected
+        return accepted, rejected
+
+    def ingest_lines(self, data):
+        """
+        解析并写入 JSON Lines 数据
+
+        Returns:
+            tuple: (接受条数, 拒绝条数)，无法解析的行计入拒绝
+        """
+        records = []
+        bad = 0
+        loads = json.loads
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(loads(line))
+            except ValueError:
+                bad += 1
+        accepted, rejected = self.ingest(records)
+        self.rejected += bad
+        return accepted, rejected + bad
+
+    def _ingest_one(self, record, now):
+        if not isinstance(record, dict):
+            return False
+        host = record.get("host")
+        if not isinstance(host, str) or not host or len(host) > 255:
+            return False
+        kind = record.get("type")
+        if kind not in ("sample", "clean"):
+            return False
+        ts = _number(record.get("ts"))
+        if ts is None:
+            ts = now
+        buffer = self._buffer(host)
+        if buffer is None:
+            return False
+        if kind == "sample":
+            get = record.get
+            buffer.samples.append((ts,) + tuple(_number(get(name)) for name in SAMPLE_FIELDS))
+        else:
+            success = record.get("success")
+            if not isinstance(success, bool):
+                return False
+            mode = record.get("mode")
+            buffer.cleans.append((ts, success, mode if isinstance(mode, str) else None,
+                                  _number(record.get("freed_gb")) or 0.0))
+        if buffer.last_seen is None or ts > buffer.last_seen:
+            buffer.last_seen = ts
+        return True
+
+    @staticmethod
+    def _metric_index(metric):
+        index = _FIELD_INDEX.get(metric)
+        if index is None:
+            raise ValueError(f"unknown metric {metric!r}, expected one of {list(SAMPLE_FIELDS)}")
+        return index
+
+    def hosts(self):
+        """所有主机及最近一次样本"""
+        result = {}
+        for host, buffer in sorted(self._hosts.items()):
+            latest = buffer.samples[-1] if buffer.samples else None
+            result[host] = {
+                "last_seen": buffer.last_seen,
+                "samples": len(buffer.samples),
+                "cleans": len(buffer.cleans),
+                "latest": dict(zip(SAMPLE_FIELDS, latest[1:])) if latest else None
+            }
+        return result
+
+    def top_hosts(self, metric="psi_some_avg10", n=10, agg="latest"):
+        """
+        指标最高的 n 台主机
+
+        Args:
+            metric: SAMPLE_FIELDS 之一
+            agg: latest 最近一次 / mean 缓冲内均值 / max 缓冲内最大值
+
+        Returns:
+            list: [{host, value}]，按 value 从高到低；没有该指标的主机不参与
+        """
+        index = self._metric_index(metric)
+        if agg not in AGGREGATES:
+            raise ValueError(f"agg must be one of {list(AGGREGATES)}, got {agg!r}")
+        ranked = []
+        for host, buffer in self._hosts.items():
+            if agg == "latest":
+                value = None
+                for sample in reversed(buffer.samples):
+                    if sample[index] is not None:
+                        value = sample[index]
+                        break
+            else:
+                values = [s[index] for s in buffer.samples if s[index] is not None]
+                if not values:
+                    continue
+                value = sum(values) / len(values) if agg == "mean" else max(values)
+            if value is not None:
+                ranked.append((value, host))
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [{"host": host, "value": round(value, 2)} for value, host in ranked[:n]]
+
+    def percentiles(self, metric="percent", percentiles=(50, 90, 99), scope="latest"):
+        """
+        全体机器的指标百分位数
+
+        Args:
+            scope: latest 每台主机取最近一次 / samples 所有缓冲中的样本
+
+        Returns:
+            dict: {count, p50, p90, ...}，没有数据时各百分位为 None
+        """
+        index = self._metric_index(metric)
+        if scope not in ("latest", "samples"):
+            raise ValueError(f"scope must be 'latest' or 'samples', got {scope!r}")
+        values = []
+        for buffer in self._hosts.values():
+            if scope == "latest":
+                if buffer.samples and buffer.samples[-1][index] is not None:
+                    values.append(buffer.samples[-1][index])
+            else:
+                values.extend(s[index] for s in buffer.samples if s[index] is not None)
+        values.sort()
+        result = {"count": len(values)}
+        for pct in percentiles:
+            if not 0 < pct <= 100:
+                raise ValueError(f"percentile must be between 0 and 100, got {pct}")
+            key = f"p{pct:g}"
+            result[key] = round(_percentile(values, pct), 2) if values else None
+        return result
+
+    def clean_stats(self, n=10):
+        """
+        缓冲内的清理成功率
+
+        Returns:
+            dict: {total, success, rate, by_mode: {mode: {total, success, rate, mean_freed_gb}},
+                   worst_hosts: [{host, total, rate}]}
+        """
+        total = success = 0
+        modes = {}
+        per_host = []
+        for host, buffer in self._hosts.items():
+            if not buffer.cleans:
+                continue
+            host_success = 0
+            for _, ok, mode, freed in buffer.cleans:
+                stats = modes.setdefault(mode or "default", [0, 0, 0.0])
+                stats[0] += 1
+                if ok:
+                    stats[1] += 1
+                    stats[2] += freed
+                    host_success += 1
+            total += len(buffer.cleans)
+            success += host_success
+            per_host.append((host_success / len(buffer.cleans), host, len(buffer.cleans)))
+        per_host.sort()
+        return {
+            "total": total,
+            "success": success,
+            "rate": round(success / total, 3) if total else None,
+            "by_mode": {
+                mode: {
+                    "total": t,
+                    "success": s,
+                    "rate": round(s / t, 3),
+                    "mean_freed_gb": round(freed / s, 2) if s else None
+                }
+                for mode, (t, s, freed) in sorted(modes.items())
+            },
+            "worst_hosts": [{"host": host, "total": t, "rate": round(rate, 3)} for rate, host, t in per_host[:n]]
+        }
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class FleetAggregator:
+    """在 asyncio 上提供 FleetStore 的 HTTP 接口"""
+
+    def __init__(self, store=None, host=DEFAULT_HOST, port=DEFAULT_PORT, max_body=8 * _MB, idle_timeout=60,
+                 token=None):
+        """
+        Args:
+            store: FleetStore，默认新建
+            host / port: 监听地址，port=0 时由系统分配（见 self.port）；默认只接受本机连接
+            max_body: 单个请求体的最大字节数
+            idle_timeout: keep-alive 连接空闲多久后关闭(秒)
+            token: 共享令牌，设置后 /ingest 要求 "Authorization: Bearer <token>"
+        """
+        self.store = store if store is not None else FleetStore()
+        self.host = host
+        self.port = port
+        self.token = token or None
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Fleet aggregator listening on {self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 400, {"error": "request head too large"}, keep_alive=False)
+                    break
+                keep_alive = await self._handle_request(head, reader, writer)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(self, head, reader, writer):
+        """处理一个请求，返回连接是否保持"""
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            await self._respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+        body = b""
+        try:
+            if "transfer-encoding" in headers:
+                raise HTTPError(411, "chunked bodies are not supported, send Content-Length")
+            length = int(headers.get("content-length", "0") or 0)
+            if length > self.max_body:
+                raise HTTPError(413, f"body exceeds {self.max_body} bytes")
+            if length:
+                body = await reader.readexactly(length)
+            status, payload = self._route(method, target, body, headers)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+            # The unread body would be parsed as the next request
+            keep_alive = keep_alive and e.status not in (411, 413)
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except asyncio.IncompleteReadError:
+            return False
+        except Exception:
+            logger.exception(f"Fleet request {method} {target} failed")
+            status, payload = 500, {"error": "internal error"}
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    def _route(self, method, target, body, headers=None):
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip("/") or "/"
+        # Queries expose every host's memory data, so only the liveness probe is open
+        if path != "/health" and not self._authorized(headers or {}):
+            raise HTTPError(401, "missing or wrong token")
+        if path == "/ingest":
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            accepted, rejected = self.store.ingest_lines(body)
+            return 202, {"accepted": accepted, "rejected": rejected}
+        if method != "GET":
+            raise HTTPError(405, "use GET")
+        if path == "/health":
+            return 200, {"status": "ok", "hosts": len(self.store), "accepted": self.store.accepted,
+                         "rejected": self.store.rejected, "uptime": round(time.time() - self.started)}
+        if path == "/hosts":
+            return 200, self.store.hosts()
+        if path == "/top":
+            return 200, self.store.top_hosts(
+                query.get("metric", "psi_some_avg10"), int(query.get("n", 10)), query.get("agg", "latest"))
+        if path == "/percentiles":
+            pcts = tuple(float(p) for p in query.get("p", "50,90,99").split(","))
+            return 200, self.store.percentiles(query.get("metric", "percent"), pcts, query.get("scope", "latest"))
+        if path == "/cleans":
+            return 200, self.store.clean_stats(int(query.get("n", 10)))
+        raise HTTPError(404, f"no route for {path}")
+
+    def _authorized(self, headers):
+        if self.token is None:
+            return True
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode("utf-8"),
+                                                                  self.token.encode("utf-8"))
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def parse_address(address, default_port=DEFAULT_PORT):
+    """解析 "host:port"、"host" 或 ":port"，省略主机时只监听本机"""
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        return address or DEFAULT_HOST, default_port
+    return host or DEFAULT_HOST, int(port)
+
+
+def _is_loopback(host):
+    return host == "localhost" or host.startswith("127.") or host == "::1"
+
+
+def run_aggregator(address=f"{DEFAULT_HOST}:{DEFAULT_PORT}", token=None):
+    """在前台运行汇总服务，直到 Ctrl+C"""
+    host, port = parse_address(address)
+    aggregator = FleetAggregator(host=host, port=port, token=token)
+    if not _is_loopback(host) and aggregator.token is None:
+        logger.warning(f"Fleet aggregator exposed on {host}:{port} without a token; "
+                       f"any host that can reach it can submit records and read every host's memory data")
+    print(f"汇总服务监听 {host}:{port}，按 Ctrl+C 退出")
+    try:
+        asyncio.run(aggregator.serve_forever())
+    except KeyboardInterrupt:
+        pass
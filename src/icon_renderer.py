@@ -0,0 +1,55 @@
+import functools
+
+from PIL import Image, ImageDraw
+
+ICON_SIZE = (64, 64)
+
+ICON_COLORS = {
+    "green": (0, 200, 0),
+    "yellow": (255, 200, 0),
+    "red": (255, 0, 0)
+}
+
+# 填充区高度 28 像素，只有 3 种颜色 x 29 种高度，缓存全部组合也只有几十张小图
+_FILL_PIXELS = 28
+
+
+def render_blank_icon():
+    """绘制只有外框的内存条图标"""
+    image = Image.new('RGB', ICON_SIZE, color='white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([8, 16, 56, 48], outline=(100, 100, 100), width=2)
+    return image
+
+
+def render_memory_icon(color, percent):
+    """
+    绘制内存条图标
+
+    相同颜色和填充高度的图标会复用同一个 Image，调用方不应修改返回的图像。
+
+    Args:
+        color: 填充颜色 green/yellow/red，未知颜色按 green 处理
+        percent: 内存使用率(%)，决定填充高度
+
+    Returns:
+        PIL.Image.Image: 64x64 图标
+    """
+    if color not in ICON_COLORS:
+        color = "green"
+    fill_height = max(0, min(_FILL_PIXELS, int(_FILL_PIXELS * percent / 100)))
+    return _render_cached(color, fill_height)
+
+
+@functools.lru_cache(maxsize=len(ICON_COLORS) * (_FILL_PIXELS + 1))
+def _render_cached(color, fill_height):
+    image = render_blank_icon()
+    if fill_height > 0:
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([10, 47 - fill_height, 54, 46], fill=ICON_COLORS[color])
+    return image
+
+
+def clear_icon_cache():
+    """释放缓存的图标"""
+    _render_cached.cache_clear()
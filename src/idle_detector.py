@@ -0,0 +1,142 @@
+"""
+用户空闲检测
+
+延迟清理只在系统空闲时执行：用户不在操作时清理工作集，
+恢复工作时的硬缺页抖动就不会落在用户眼前。
+
+    detector = default_idle_detector(idle_seconds=120)
+    if detector.is_idle():
+        ...
+"""
+
+import ctypes
+import ctypes.wintypes
+import logging
+import os
+import sys
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class IdleDetector:
+    """空闲检测基类"""
+
+    name = "base"
+
+    def is_idle(self):
+        """当前是否空闲"""
+        raise NotImplementedError
+
+
+class _LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [("cbSize", ctypes.wintypes.UINT), ("dwTime", ctypes.wintypes.DWORD)]
+
+
+class WindowsInputIdleDetector(IdleDetector):
+    """Windows：距最后一次键盘/鼠标输入超过 idle_seconds 即视为空闲"""
+
+    name = "windows_input"
+
+    def __init__(self, idle_seconds=120, user32=None, kernel32=None):
+        if idle_seconds <= 0:
+            raise ValueError(f"idle_seconds must be positive, got {idle_seconds}")
+        self.idle_seconds = idle_seconds
+        self._user32 = user32 if user32 is not None else ctypes.windll.user32
+        self._kernel32 = kernel32 if kernel32 is not None else ctypes.windll.kernel32
+
+    def input_idle_seconds(self):
+        """距最后一次输入的秒数"""
+        info = _LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if not self._user32.GetLastInputInfo(ctypes.byref(info)):
+            raise ctypes.WinError()
+        # Both tick counts are 32-bit milliseconds and wrap after ~49.7 days
+        elapsed = (self._kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+        return elapsed / 1000
+
+    def is_idle(self):
+        return self.input_idle_seconds() >= self.idle_seconds
+
+
+class LoadIdleDetector(IdleDetector):
+    """
+    Linux/其他平台：没有统一的输入空闲接口，改用系统负载判断
+
+    每核 1 分钟平均负载低于 load_threshold 且 CPU 使用率低于 cpu_threshold，
+    并且从第一次低负载检查起连续 idle_seconds 秒都是如此时视为空闲。
+    """
+
+    name = "load"
+
+    def __init__(self, idle_seconds=120, load_threshold=0.3, cpu_threshold=10.0, load_source=None,
+                 cpu_source=None, cpu_count=None, clock=time.monotonic):
+        """
+        Args:
+            idle_seconds: 低负载需要持续的秒数
+            load_threshold: 每核 1 分钟平均负载上限
+            cpu_threshold: CPU 使用率上限(%)
+            load_source / cpu_source / cpu_count / clock: 测试时可替换
+        """
+        if idle_seconds <= 0:
+            raise ValueError(f"idle_seconds must be positive, got {idle_seconds}")
+        if load_threshold <= 0:
+            raise ValueError(f"load_threshold must be positive, got {load_threshold}")
+        if not 0 < cpu_threshold <= 100:
+            raise ValueError(f"cpu_threshold must be between 0 and 100, got {cpu_threshold}")
+        self.idle_seconds = idle_seconds
+        self.load_threshold = load_threshold
+        self.cpu_threshold = cpu_threshold
+        self._load_source = load_source or self._read_load
+        # interval=None compares against the previous call, so it never blocks the sampling thread
+        self._cpu_source = cpu_source or (lambda: psutil.cpu_percent(interval=None))
+        self._cpu_count = cpu_count or os.cpu_count() or 1
+        self._clock = clock
+        self._quiet_since = None
+        # The first interval=None call has nothing to compare against and returns 0.0
+        self._cpu_source()
+
+    @staticmethod
+    def _read_load():
+        try:
+            return os.getloadavg()[0]
+        except (AttributeError, OSError):
+            return None
+
+    def _quiet(self):
+        load = self._load_source()
+        if load is not None and load / self._cpu_count >= self.load_threshold:
+            return False
+        return self._cpu_source() < self.cpu_threshold
+
+    def is_idle(self):
+        now = self._clock()
+        if not self._quiet():
+            self._quiet_since = None
+            return False
+        if self._quiet_since is None:
+            self._quiet_since = now
+        return now - self._quiet_since >= self.idle_seconds
+
+
+class FakeIdleDetector(IdleDetector):
+    """测试用：返回 idle 属性的值"""
+
+    name = "fake"
+
+    def __init__(self, idle=False):
+        self.idle = idle
+        self.calls = 0
+
+    def is_idle(self):
+        self.calls += 1
+        return self.idle
+
+
+def default_idle_detector(idle_seconds=120):
+    """按当前平台创建空闲检测器"""
+    if sys.platform == "win32":
+        return WindowsInputIdleDetector(idle_seconds)
+    return LoadIdleDetector(idle_seconds)
@@ -0,0 +1,244 @@
+"""
+热路径计时与性能分析
+
+模块级的 metrics 记录计数器和耗时直方图，用 @timed(name) 装饰需要计时的函数。
+关闭时装饰器只多两次属性检查；开启时每次调用额外两次 perf_counter、
+一次字典查找和几次整数运算（约 1us）。为了不在热路径上加锁，直方图更新
+不做同步，多线程同时命中同一指标时计数可能偶尔少记一次。
+计数器（例如错误次数）不受 enabled 影响，始终计数。
+
+性能分析（start_profiling）与计时开关无关，但代价高：cProfile 同一时间只能挂在一个线程上，
+分析期间所有 @timed 调用在 _profile_lock 上排队执行（采样线程和 UI 线程互相等待），
+被分析的调用本身也会因 cProfile 的逐函数钩子慢数倍。只应用于短时间的诊断。
+
+    from src.instrumentation import metrics, timed
+
+    @timed("monitor.get_memory_info")
+    def get_memory_info(self): ...
+
+    metrics.start_profiling()
+    ...
+    metrics.stop_profiling("logs/profile.pstats")
+"""
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界(微秒)：1us, 2us, 4us ... 约 67s，最后一个桶收纳更慢的调用
+HISTOGRAM_BUCKETS_US = tuple(2 ** i for i in range(27))
+_LAST_BUCKET = len(HISTOGRAM_BUCKETS_US)
+
+
+class Histogram:
+    """以 2 的幂为桶边界的耗时直方图，记录一次是 O(1)"""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_US) + 1)
+
+    def record(self, seconds):
+        # Bucket i holds [2**(i-1), 2**i) microseconds; bucket 0 is < 1us
+        index = int(seconds * 1e6).bit_length()
+        self.buckets[index if index < _LAST_BUCKET else _LAST_BUCKET] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct):
+        """按桶估算百分位数，返回桶上界(微秒)；超出最后一个桶时返回最大值"""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                if i < len(HISTOGRAM_BUCKETS_US):
+                    return HISTOGRAM_BUCKETS_US[i]
+                break
+        return round(self.max * 1e6, 1)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else None,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "max_us": round(self.max * 1e6, 1)
+        }
+
+
+class Instrumentation:
+    """计数器、耗时直方图和按需开启的 cProfile"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._started = time.time()
+        self._profiler = None
+        self._profile_lock = threading.RLock()
+        self._profile_depth = threading.local()
+
+    def incr(self, name, n=1):
+        """计数器加 n；计数器很少更新，关闭计时时同样计数"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        """记录一次耗时"""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        histogram.record(seconds)
+
+    def reset(self):
+        """清空所有计数器和直方图"""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self._started = time.time()
+
+    def snapshot(self):
+        """
+        获取当前指标
+
+        Returns:
+            dict: {since, counters, timings: {name: {count, mean_us, p50_us, p99_us, max_us}}}
+        """
+        with self._lock:
+            return {
+                "since": self._started,
+                "enabled": self.enabled,
+                "counters": dict(self._counters),
+                "timings": {name: h.to_dict() for name, h in sorted(self._histograms.items())}
+            }
+
+    def dump(self, path):
+        """把当前指标写入 JSON 文件"""
+        try:
+            dump_dir = os.path.dirname(path)
+            if dump_dir and not os.path.exists(dump_dir):
+                os.makedirs(dump_dir)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+        except IOError as e:
+            logger.error(f"Failed to write metrics file {path}: {e}")
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def start_profiling(self):
+        """
+        开始对 @timed 标记的热路径调用做 cProfile 分析
+
+        关闭计时时同样生效。分析期间各线程的 @timed 调用串行执行，见模块说明。
+        """
+        with self._profile_lock:
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+
+    def stop_profiling(self, path):
+        """
+        停止分析并把结果写成 pstats 文件
+
+        Returns:
+            pstats.Stats | None: 分析结果，没有记录到任何调用时为 None
+        """
+        with self._profile_lock:
+            profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return None
+        try:
+            stats = pstats.Stats(profiler)
+        except TypeError:
+            # pstats refuses a profile that never ran
+            return None
+        dump_dir = os.path.dirname(path)
+        if dump_dir and not os.path.exists(dump_dir):
+            os.makedirs(dump_dir)
+        stats.dump_stats(path)
+        return stats
+
+    def _call_profiled(self, fn, args, kwargs):
+        """在分析器下执行一次调用；嵌套的热路径只在最外层启停分析器"""
+        depth = getattr(self._profile_depth, "value", 0)
+        if depth:
+            return fn(*args, **kwargs)
+        # cProfile hooks one thread at a time, so profiled hot-path calls are serialised
+        with self._profile_lock:
+            profiler = self._profiler
+            if profiler is None:
+                return fn(*args, **kwargs)
+            self._profile_depth.value = 1
+            profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                self._profile_depth.value = 0
+
+
+metrics = Instrumentation()
+
+
+def timed(name, registry=None):
+    """装饰器：把函数每次调用的耗时记录到名为 name 的直方图"""
+    reg = registry if registry is not None else metrics
+    perf_counter = time.perf_counter
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not reg.enabled:
+                if reg._profiler is not None:
+                    return reg._call_profiled(fn, args, kwargs)
+                return fn(*args, **kwargs)
+            start = perf_counter()
+            try:
+                if reg._profiler is not None:
+                    return reg._call_profiled(fn, args, kwargs)
+                return fn(*args, **kwargs)
+            finally:
+                reg.observe(name, perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def format_metrics(snapshot):
+    """把 snapshot() 的结果格式化为表格文本"""
+    lines = [f"{'name':<34}{'count':>8}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}  (us)"]
+    for name, t in snapshot["timings"].items():
+        mean = t["mean_us"] if t["mean_us"] is not None else "-"
+        lines.append(f"{name:<34}{t['count']:>8}{mean:>10}{t['p50_us'] or '-':>10}"
+                     f"{t['p99_us'] or '-':>10}{t['max_us']:>10}")
+    if snapshot["counters"]:
+        lines.append("")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name:<34}{value:>8}")
+    return "\n".join(lines)
+
+
+def format_top_functions(stats, limit=15):
+    """累计耗时最多的 limit 个函数，pstats 表格文本"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return stream.getvalue()
@@ -1,16 +1,75 @@
 # src/log_manager.py
+import atexit
 import json
 import logging
 import os
+import shutil
+import threading
+import time
+import uuid
 from datetime import datetime
 
+from src.instrumentation import timed
+from src.clean_record import CleanRecord, SCHEMA_VERSION, decode_log, encode_log
+
 logger = logging.getLogger(__name__)
 
+
+def _fsync_dir(path):
+    """把目录项（例如 os.replace 的结果）写到磁盘；Windows 不能打开目录，替换本身已由系统保证"""
+    if os.name != "posix":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
 class LogManager:
     MAX_LOGS = 100  # 最多保留100条日志
+    DURABILITY_POLICIES = ("none", "flush", "fsync")
+
+    def __init__(self, log_file="logs/clean.log", write_behind=False, durability="flush",
+                 flush_interval=2.0, max_pending=20):
+        """
+        Args:
+            log_file: 日志文件路径
+            write_behind: 为 True 时日志先进入内存队列，由后台线程批量写盘，
+                调用方（托盘 UI 回调）不再承担文件读写
+            durability: 落盘策略，见 _save_logs()
+                none   直接覆盖日志文件，最快；进程崩溃时可能留下半个文件
+                flush  写临时文件后原子替换，进程崩溃不会损坏日志
+                fsync  另外在替换前后 fsync 文件和目录，断电也不会丢失已写入的日志
+            flush_interval: 队列中最旧条目的最长等待时间(秒)，超过即写盘
+            max_pending: 队列达到该条数即写盘；这也是进程崩溃时最多丢失的条数
+        """
+        if durability not in self.DURABILITY_POLICIES:
+            raise ValueError(f"durability must be one of {self.DURABILITY_POLICIES}, got {durability!r}")
+        if not isinstance(flush_interval, (int, float)) or flush_interval <= 0:
+            raise ValueError(f"flush_interval must be a positive number, got {flush_interval!r}")
+        if not isinstance(max_pending, int) or max_pending < 1:
+            raise ValueError(f"max_pending must be a positive integer, got {max_pending!r}")
 
-    def __init__(self, log_file="logs/clean.log"):
         self.log_file = log_file
+        self.write_behind = write_behind
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._oldest_pending = None  # monotonic time of the oldest queued entry
+        self._cond = threading.Condition()
+        # Serialises read-modify-write cycles on the log file. Always taken before _cond.
+        self._io_lock = threading.Lock()
+        self._writer = None
+        self._closed = False
+        self.dropped = 0
+        self.write_errors = 0
+        # Parsed records of the log file, keyed by its (mtime, size) so repeated reads skip JSON parsing
+        self._cache = None
+        self._cache_key = None
+
         self._ensure_dir()
 
     def _ensure_dir(self):
@@ -19,7 +78,9 @@ class LogManager:
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir)
 
-    def add_clean_log(self, before_percent, after_percent, freed_gb):
+    @timed("log.add_clean_log")
+    def add_clean_log(self, before_percent, after_percent, freed_gb, mode=None, trigger=None,
+                      duration_ms=None, processes=None):
         """
         添加一条清理日志
 
@@ -27,6 +88,13 @@ class LogManager:
             before_percent: 清理前内存使用率
             after_percent: 清理后内存使用率
             freed_gb: 释放的内存大小(GB)
+            mode: 清理模式，可选
+            trigger: 触发方式，例如 manual / auto / rule，可选
+            duration_ms: 清理耗时(毫秒)，可选
+            processes: 清理针对的进程名列表，可选；None 表示整个系统
+
+        Returns:
+            str: 日志条目 id，用于之后 annotate() 补充字段
 
         Raises:
             ValueError: 如果参数值无效
@@ -39,6 +107,12 @@ class LogManager:
             raise TypeError(f"after_percent must be a number, got {type(after_percent).__name__}")
         if not isinstance(freed_gb, (int, float)):
             raise TypeError(f"freed_gb must be a number, got {type(freed_gb).__name__}")
+        if trigger is not None and not isinstance(trigger, str):
+            raise TypeError(f"trigger must be a string, got {type(trigger).__name__}")
+        if duration_ms is not None and not isinstance(duration_ms, (int, float)):
+            raise TypeError(f"duration_ms must be a number, got {type(duration_ms).__name__}")
+        if processes is not None and not all(isinstance(p, str) for p in processes):
+            raise TypeError("processes must be a list of process names")
 
         if not (0 <= before_percent <= 100):
             raise ValueError(f"before_percent must be between 0 and 100, got {before_percent}")
@@ -46,49 +120,278 @@ class LogManager:
             raise ValueError(f"after_percent must be between 0 and 100, got {after_percent}")
         if freed_gb < 0:
             raise ValueError(f"freed_gb must be non-negative, got {freed_gb}")
+        if duration_ms is not None and duration_ms < 0:
+            raise ValueError(f"duration_ms must be non-negative, got {duration_ms}")
+
+        record = CleanRecord(
+            id=uuid.uuid4().hex,
+            timestamp=datetime.now().isoformat(),
+            before_percent=before_percent,
+            after_percent=after_percent,
+            freed_gb=round(freed_gb, 2),
+            mode=mode,
+            trigger=trigger,
+            duration_ms=round(duration_ms, 1) if duration_ms is not None else None,
+            processes=tuple(processes) if processes is not None else None
+        )
+
+        if self.write_behind:
+            self._enqueue(record)
+        else:
+            with self._io_lock:
+                self._write_batch([record])
+        return record.id
+
+    def annotate(self, entry_id, fields):
+        """
+        给已添加的日志补充字段，例如清理一段时间后才能算出的代价
+
+        Args:
+            entry_id: add_clean_log() 返回的 id
+            fields: 要合并进条目的字段
+
+        Returns:
+            bool: 找到并更新了该条目；条目已被轮转掉或写文件失败时为 False
+        """
+        with self._io_lock:
+            # Holding _io_lock keeps the writer from moving entries between queue and file meanwhile
+            with self._cond:
+                for record in self._pending:
+                    if record.id == entry_id:
+                        record.update(fields)
+                        return True
+            logs = self._load_logs()
+            for record in reversed(logs):
+                if record.id == entry_id:
+                    record.update(fields)
+                    try:
+                        self._save_logs(logs)
+                    except IOError:
+                        return False
+                    return True
+        return False
+
+    def get_recent_logs(self, limit=10):
+        """
+        获取最近的日志（包含尚未落盘的条目）
+
+        Returns:
+            list: CleanRecord 列表，从旧到新；记录与内部缓存共享，调用方不应修改
+        """
+        with self._io_lock:
+            logs = self._load_logs()
+            with self._cond:
+                logs.extend(self._pending)
+        return logs[-limit:] if logs else []
+
+    def flush(self):
+        """在调用线程上立即写出所有排队中的日志
+
+        Raises:
+            IOError: 写文件失败（条目会被放回队列）
+        """
+        with self._io_lock:
+            batch = self._take_pending()
+            if batch:
+                self._write_batch(batch)
+
+    def close(self):
+        """停止后台写线程并写出剩余日志，可重复调用"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        writer = self._writer
+        if writer is not None and writer is not threading.current_thread():
+            writer.join()
+        try:
+            self.flush()
+        except IOError:
+            # Already reported by _save_logs; nothing more can be done at shutdown
+            with self._cond:
+                lost, self._pending = self._pending, []
+                if lost:
+                    self._drop(len(lost), "could not be written at shutdown")
+
+    @property
+    def pending_count(self):
+        """尚未落盘的日志条数"""
+        with self._cond:
+            return len(self._pending)
 
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "before_percent": before_percent,
-            "after_percent": after_percent,
-            "freed_gb": round(freed_gb, 2)
-        }
+    def _enqueue(self, record):
+        """把日志放入写队列，必要时唤醒后台写线程"""
+        with self._cond:
+            if self._closed:
+                # After close() there is no writer left; fall back to a direct write
+                enqueue_directly = False
+            else:
+                enqueue_directly = True
+                self._start_writer()
+                # The queue is the loss window; when the writer cannot keep up, drop the oldest
+                # entry instead of blocking the caller (the tray's UI callback)
+                if len(self._pending) >= self.max_pending:
+                    overflow = len(self._pending) - self.max_pending + 1
+                    del self._pending[:overflow]
+                    self._drop(overflow, "queue is full")
+                if not self._pending:
+                    self._oldest_pending = time.monotonic()
+                self._pending.append(record)
+                if len(self._pending) >= self.max_pending:
+                    self._cond.notify_all()
+        if not enqueue_directly:
+            with self._io_lock:
+                self._write_batch([record], requeue=False)
 
-        # 读取现有日志
+    def _drop(self, count, reason):
+        """记录丢弃的条目（调用方需持有 _cond）"""
+        self.dropped += count
+        logger.warning(f"Dropped {count} clean log entries for {self.log_file}: {reason}")
+
+    def _start_writer(self):
+        """按需启动后台写线程（调用方需持有 _cond）"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name="clean-log-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _flush_due(self):
+        """是否满足写盘条件：数量或时间触发（调用方需持有 _cond）"""
+        if not self._pending:
+            return False
+        if self._closed or len(self._pending) >= self.max_pending:
+            return True
+        return time.monotonic() - self._oldest_pending >= self.flush_interval
+
+    def _writer_loop(self):
+        """后台写线程：合并队列中的条目，按数量/时间触发批量写盘"""
+        while True:
+            with self._cond:
+                while not self._flush_due():
+                    if self._closed:
+                        return
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self._oldest_pending + self.flush_interval - time.monotonic())
+                    self._cond.wait(timeout)
+            try:
+                self.flush()
+            except IOError:
+                self.write_errors += 1
+                # Entries were re-queued by _write_batch; back off until the next interval
+                with self._cond:
+                    self._oldest_pending = time.monotonic()
+                    if self._closed:
+                        # close() makes the last attempt and accounts for what is left
+                        return
+                    self._cond.wait(self.flush_interval)
+
+    def _take_pending(self):
+        """取出当前队列中的全部条目"""
+        with self._cond:
+            batch = self._pending
+            self._pending = []
+            self._oldest_pending = None
+            self._cond.notify_all()
+        return batch
+
+    def _write_batch(self, batch, requeue=True):
+        """
+        把一批条目追加到日志文件（调用方需持有 _io_lock）
+
+        Args:
+            requeue: 写入失败时把队列中取出的条目放回队列，超出 max_pending 的部分计入 dropped
+        """
         logs = self._load_logs()
-        logs.append(log_entry)
+        logs.extend(batch)
 
         # 限制日志数量
         if len(logs) > self.MAX_LOGS:
             logs = logs[-self.MAX_LOGS:]
 
-        # 保存日志
-        self._save_logs(logs)
-
-    def get_recent_logs(self, limit=10):
-        """获取最近的日志"""
-        logs = self._load_logs()
-        return logs[-limit:] if logs else []
+        try:
+            self._save_logs(logs)
+        except IOError:
+            if self.write_behind and requeue:
+                with self._cond:
+                    self._pending[:0] = batch
+                    overflow = len(self._pending) - self.max_pending
+                    if overflow > 0:
+                        del self._pending[:overflow]
+                        self._drop(overflow, "write failed and the queue is full")
+                    if self._oldest_pending is None:
+                        self._oldest_pending = time.monotonic()
+            raise
 
     def _load_logs(self):
-        """加载日志文件"""
-        if os.path.exists(self.log_file):
-            try:
-                with open(self.log_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to decode JSON from log file {self.log_file}: {e}")
-                return []
-            except IOError as e:
-                logger.warning(f"Failed to read log file {self.log_file}: {e}")
-                return []
-        return []
-
-    def _save_logs(self, logs):
-        """保存日志到文件"""
+        """
+        加载日志文件为 CleanRecord 列表（调用方需持有 _io_lock）
+
+        文件没有变化时直接返回缓存的记录；v1 文件在这里迁移为当前版本。
+        """
+        try:
+            stat = os.stat(self.log_file)
+        except OSError:
+            return []
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self._cache_key:
+            return list(self._cache)
+
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                records, version = decode_log(json.load(f))
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to decode JSON from log file {self.log_file}: {e}")
+            return []
+        except ValueError as e:
+            logger.warning(f"Unrecognized log file {self.log_file}: {e}")
+            return []
+        except IOError as e:
+            logger.warning(f"Failed to read log file {self.log_file}: {e}")
+            return []
+
+        if version < SCHEMA_VERSION:
+            self._migrate(records, version)
+        else:
+            if version > SCHEMA_VERSION:
+                logger.warning(f"Log file {self.log_file} has schema version {version}, newer than "
+                               f"{SCHEMA_VERSION}; unknown fields are kept as they are")
+            self._cache, self._cache_key = records, key
+        return list(records)
+
+    def _migrate(self, records, version):
+        """把旧版本的日志文件改写为当前版本，原文件保留为 <log_file>.v<版本>"""
+        backup = f"{self.log_file}.v{version}"
+        try:
+            if not os.path.exists(backup):
+                shutil.copyfile(self.log_file, backup)
+            self._save_logs(records)
+        except IOError as e:
+            # Still usable in memory; the migration is retried on the next load
+            logger.warning(f"Failed to migrate log file {self.log_file} from v{version}: {e}")
+            return
+        logger.info(f"Migrated log file {self.log_file} from v{version} to v{SCHEMA_VERSION}, backup at {backup}")
+
+    def _save_logs(self, records):
+        """保存日志到文件
+
+        durability 为 none 时直接覆盖日志文件；flush 时先写临时文件再用 os.replace 原子替换，
+        进程在写入中途崩溃时旧文件保持完整；fsync 时还在替换前 fsync 临时文件、替换后 fsync 目录，
+        保证断电后替换已经落盘。
+        """
+        target = self.log_file if self.durability == "none" else self.log_file + ".tmp"
+        self._cache = self._cache_key = None
         try:
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, indent=2, ensure_ascii=False)
+            with open(target, 'w', encoding='utf-8') as f:
+                json.dump(encode_log(records), f, indent=2, ensure_ascii=False)
+                if self.durability == "fsync":
+                    f.flush()
+                    os.fsync(f.fileno())
+            if target != self.log_file:
+                os.replace(target, self.log_file)
+                if self.durability == "fsync":
+                    _fsync_dir(os.path.dirname(self.log_file))
         except IOError as e:
             logger.error(f"Failed to write log file {self.log_file}: {e}")
             raise
+        stat = os.stat(self.log_file)
+        self._cache, self._cache_key = list(records), (stat.st_mtime_ns, stat.st_size)
@@ -1,41 +1,81 @@
 # src/memory_cleaner.py
 import sys
+import time
 import ctypes
 from src.memory_monitor import MemoryMonitor
+from src.clean_backends import WindowsBackend, CgroupReclaimBackend
+from src.cgroup import limited_cgroup
+from src.instrumentation import timed
 
 
 class MemoryCleaner:
-    def __init__(self, monitor=None):
-        # Platform guard - only Windows is supported
-        if sys.platform != 'win32':
-            raise RuntimeError("MemoryCleaner only supports Windows platform")
+    def __init__(self, monitor=None, backend=None):
+        """
+        Args:
+            monitor: MemoryMonitor 实例，不提供时按需创建
+            backend: 清理后端（见 src.clean_backends），默认在 Windows 上使用 WindowsBackend，
+                在提供 memory.reclaim 的 cgroup v2 中使用 CgroupReclaimBackend
+        """
+        if backend is None:
+            if sys.platform == 'win32':
+                self._kernel32 = ctypes.windll.kernel32
+                backend = WindowsBackend(self._kernel32)
+            else:
+                # Same scope as MemoryMonitor, so freed memory is measured where it is reclaimed
+                cgroup = limited_cgroup()
+                # Platform guard - elsewhere there is no default backend
+                if cgroup is None or not cgroup.supports_reclaim:
+                    raise RuntimeError("MemoryCleaner only supports Windows platform and "
+                                       "memory-limited cgroup v2 with memory.reclaim")
+                backend = CgroupReclaimBackend(cgroup)
 
         # Accept monitor as parameter for loose coupling, create lazily if not provided
         self._monitor = monitor
-        self._kernel32 = ctypes.windll.kernel32
+        self.backend = backend
 
     @property
     def monitor(self):
         """Lazy initialization of monitor"""
         if self._monitor is None:
             from src.memory_monitor import MemoryMonitor
-            self._monitor = MemoryMonitor()
+            # Measure freed memory in the same cgroup the backend reclaims from
+            self._monitor = MemoryMonitor(cgroup=getattr(self.backend, "cgroup", None))
         return self._monitor
 
-    def clean(self):
+    @property
+    def modes(self):
+        """当前后端支持的清理模式"""
+        return self.backend.modes
+
+    @timed("cleaner.clean")
+    def clean(self, mode=None):
         """
         执行系统内存清理
 
+        Args:
+            mode: 清理模式，默认使用后端的第一个模式
+
         Returns:
-            dict: 清理结果 {before, after, freed, success}
+            dict: 清理结果 {before, after, freed, success, mode, duration_ms}，
+                后端的 clean() 返回进程名列表时另有 processes
+
+        Raises:
+            ValueError: 后端不支持该模式
         """
+        if mode is None:
+            mode = self.backend.default_mode
+        if not self.backend.supports(mode):
+            raise ValueError(f"Clean mode {mode!r} is not supported by backend {self.backend.name!r}")
+
         # 获取清理前的内存状态
         before = self.monitor.get_memory_info()
 
+        start = time.perf_counter()
         try:
-            # 调用 Windows API 清理系统缓存
+            # 由后端调用系统接口，例如 Windows 上的
             # SetProcessWorkingSetSize(-1, -1, -1) 会触发系统整理所有进程的工作集
-            self._kernel32.SetProcessWorkingSetSize(-1, -1, -1)
+            targets = self.backend.clean(mode)
+            duration_ms = round((time.perf_counter() - start) * 1000, 1)
 
             # 获取清理后的内存状态
             after = self.monitor.get_memory_info()
@@ -43,12 +83,17 @@ class MemoryCleaner:
             # 计算释放的内存
             freed = round(before["used"] - after["used"], 2)
 
-            return {
+            result = {
                 "before": before,
                 "after": after,
                 "freed": max(0, freed),  # 确保不为负数
-                "success": True
+                "success": True,
+                "mode": mode,
+                "duration_ms": duration_ms
             }
+            if targets is not None:
+                result["processes"] = list(targets)
+            return result
 
         except Exception as e:
             return {
@@ -56,5 +101,7 @@ class MemoryCleaner:
                 "after": before,
                 "freed": 0,
                 "success": False,
+                "mode": mode,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
                 "error": str(e)
             }
@@ -1,9 +1,55 @@
-# src/memory_monitor.py
 import psutil
 
+from src.memory_sources import collect_raw_snapshot
+from src.cgroup import limited_cgroup
+from src.instrumentation import timed
+
+_GB = 1024 ** 3
+_MB = 1024 ** 2
+
+
 class MemoryMonitor:
-    def __init__(self):
+    # get_extended_info() 中可以单独设置阈值的指标及默认值
+    DEFAULT_METRIC_THRESHOLDS = {
+        "swap_percent": 50,      # 交换区/页面文件使用率(%)
+        "commit_percent": 90,    # 提交量占提交上限比例(%)
+        "swap_in_rate": 10,      # 换入速率(MB/s)
+        "psi_some_avg10": 10,    # 至少一个任务因内存停顿的时间占比(%)，10 秒均值
+        "psi_full_avg10": 5      # 所有任务同时因内存停顿的时间占比(%)，10 秒均值
+    }
+
+    # 自动清理的触发依据: 使用率 / PSI 压力 / 任一满足
+    AUTO_CLEAN_TRIGGERS = ("percent", "pressure", "either")
+
+    # get_extended_info() 返回的字段，规则条件可以引用这些指标
+    EXTENDED_METRICS = (
+        "total", "used", "percent", "available", "cached",
+        "swap_total", "swap_used", "swap_percent", "swap_in_rate", "swap_out_rate",
+        "commit_total", "commit_limit", "commit_percent",
+        "psi_some_avg10", "psi_full_avg10"
+    )
+
+    def __init__(self, snapshot_source=None, cgroup=None):
+        """
+        Args:
+            snapshot_source: 返回原始内存快照的函数，默认按平台采集，测试时可替换
+            cgroup: 限定监控范围的 src.cgroup.Cgroup；两个参数都不提供时，
+                在 Linux 上自动检测设置了内存上限的 cgroup（容器）
+        """
         self._threshold = 85
+        self._metric_thresholds = dict(self.DEFAULT_METRIC_THRESHOLDS)
+        if snapshot_source is None and cgroup is None:
+            cgroup = limited_cgroup()
+        self.cgroup = cgroup
+        if snapshot_source is None:
+            snapshot_source = cgroup.collect if cgroup is not None else collect_raw_snapshot
+        self._snapshot_source = snapshot_source
+        self._last_raw = None
+
+    @property
+    def scope(self):
+        """监控范围: "cgroup" 或 "host" """
+        return "cgroup" if self.cgroup is not None else "host"
 
     def set_threshold(self, percent):
         """设置警告阈值"""
@@ -11,11 +57,76 @@ class MemoryMonitor:
             raise ValueError("阈值必须在 0-100 之间")
         self._threshold = percent
 
+    def set_metric_threshold(self, metric, value):
+        """设置扩展指标的警告阈值"""
+        if metric not in self._metric_thresholds:
+            raise ValueError(f"未知指标: {metric}")
+        if value < 0:
+            raise ValueError("阈值不能为负数")
+        if metric.endswith("_percent") and value > 100:
+            raise ValueError("阈值必须在 0-100 之间")
+        self._metric_thresholds[metric] = value
+
     def is_over_threshold(self):
         """检查当前内存是否超过阈值"""
         info = self.get_memory_info()
         return info["percent"] >= self._threshold
 
+    def check_thresholds(self, info):
+        """
+        检查扩展快照中超过阈值的指标
+
+        Args:
+            info: get_extended_info() 的结果
+
+        Returns:
+            list: 超过阈值的指标名，平台不提供的指标会被跳过
+        """
+        over = []
+        if info.get("percent") is not None and info["percent"] >= self._threshold:
+            over.append("percent")
+        for metric, limit in self._metric_thresholds.items():
+            value = info.get(metric)
+            if value is not None and value >= limit:
+                over.append(metric)
+        return over
+
+    def is_under_pressure(self, info):
+        """
+        PSI 压力是否超过阈值
+
+        Returns:
+            bool | None: 平台不提供 PSI 时为 None
+        """
+        some = info.get("psi_some_avg10")
+        full = info.get("psi_full_avg10")
+        if some is None and full is None:
+            return None
+        return ((some is not None and some >= self._metric_thresholds["psi_some_avg10"])
+                or (full is not None and full >= self._metric_thresholds["psi_full_avg10"]))
+
+    def should_auto_clean(self, info, trigger="percent", percent_threshold=80):
+        """
+        按触发依据判断是否需要自动清理
+
+        Args:
+            info: get_extended_info() 的结果
+            trigger: AUTO_CLEAN_TRIGGERS 之一
+            percent_threshold: 使用率阈值(%)
+
+        pressure 依据在平台不提供 PSI 时退回使用率，避免自动清理被悄悄关闭。
+        """
+        if trigger not in self.AUTO_CLEAN_TRIGGERS:
+            raise ValueError(f"trigger must be one of {self.AUTO_CLEAN_TRIGGERS}, got {trigger!r}")
+        by_percent = info["percent"] >= percent_threshold
+        pressure = self.is_under_pressure(info)
+        if trigger == "percent" or pressure is None:
+            return by_percent
+        if trigger == "pressure":
+            return pressure
+        return by_percent or pressure
+
+    @timed("monitor.get_memory_info")
     def get_memory_info(self):
         """
         获取系统内存信息
@@ -23,6 +134,17 @@ class MemoryMonitor:
         Returns:
             dict: 包含 total(GB), used(GB), percent(%), available(GB)
         """
+        if self.cgroup is not None:
+            # Host-wide psutil figures are meaningless inside a memory-limited container
+            raw = self._snapshot_source()
+            total = raw["total"]
+            return {
+                "total": round(total / _GB, 2),
+                "used": round(raw["used"] / _GB, 2),
+                "percent": round(raw["used"] / total * 100, 1) if total else 0.0,
+                "available": round(raw["available"] / _GB, 2)
+            }
+
         mem = psutil.virtual_memory()
 
         return {
@@ -31,3 +153,73 @@ class MemoryMonitor:
             "percent": round(mem.percent, 1),
             "available": round(mem.available / (1024**3), 2)
         }
+
+    @timed("monitor.get_extended_info")
+    def get_extended_info(self, track=True):
+        """
+        获取扩展内存信息（一次采集）
+
+        Args:
+            track: 是否把本次快照作为下次计算速率的基准；采样线程之外的调用方
+                （如状态显示）应传 False，否则会缩短采样线程的速率窗口
+
+        Returns:
+            dict: get_memory_info() 的字段，外加
+                cached(GB), swap_total(GB), swap_used(GB), swap_percent(%),
+                swap_in_rate(MB/s), swap_out_rate(MB/s),
+                commit_total(GB), commit_limit(GB), commit_percent(%),
+                psi_some_avg10(%), psi_full_avg10(%)（PSI 内存压力的 10 秒均值）。
+                平台不提供的字段为 None；速率需要两次采样，首次为 None。
+        """
+        raw = self._snapshot_source()
+        last = self._last_raw
+        if track:
+            self._last_raw = raw
+
+        total = raw["total"]
+        swap_total = raw["swap_total"]
+        commit_total = raw["commit_total"]
+        commit_limit = raw["commit_limit"]
+
+        return {
+            "total": round(total / _GB, 2),
+            "used": round(raw["used"] / _GB, 2),
+            "percent": round((total - raw["available"]) / total * 100, 1) if total else 0.0,
+            "available": round(raw["available"] / _GB, 2),
+            "cached": self._gb(raw["cached"]),
+            "swap_total": round(swap_total / _GB, 2),
+            "swap_used": round(raw["swap_used"] / _GB, 2),
+            "swap_percent": round(raw["swap_used"] / swap_total * 100, 1) if swap_total else 0.0,
+            "swap_in_rate": self._rate(last, raw, "swap_in_bytes"),
+            "swap_out_rate": self._rate(last, raw, "swap_out_bytes"),
+            "commit_total": self._gb(commit_total),
+            "commit_limit": self._gb(commit_limit),
+            "commit_percent": (
+                round(commit_total / commit_limit * 100, 1)
+                if commit_total is not None and commit_limit else None
+            ),
+            "psi_some_avg10": self._psi(raw, "some"),
+            "psi_full_avg10": self._psi(raw, "full")
+        }
+
+    @staticmethod
+    def _psi(raw, kind):
+        psi = raw.get("psi")
+        if not psi or kind not in psi:
+            return None
+        return psi[kind].get("avg10")
+
+    @staticmethod
+    def _gb(value):
+        return round(value / _GB, 2) if value is not None else None
+
+    @staticmethod
+    def _rate(last, current, key):
+        """根据相邻两次采样计算 MB/s 速率"""
+        if last is None or current[key] is None or last[key] is None:
+            return None
+        elapsed = current["time"] - last["time"]
+        if elapsed <= 0:
+            return None
+        # Counters reset (e.g. after hibernate) would give a negative rate
+        return round(max(0, current[key] - last[key]) / elapsed / _MB, 2)
@@ -0,0 +1,359 @@
+"""
+平台相关的内存数据源
+
+每个采集函数一次读取即返回物理内存、交换区/页面文件、提交量和缓存的原始字节数
+以及 PSI 内存压力 (psi)，
+MemoryMonitor 在此基础上换算单位并计算速率。平台不提供的字段为 None。
+"""
+
+import ctypes
+import logging
+import os
+import sys
+import threading
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# /proc/vmstat 中的换入/换出计数单位是页
+_LINUX_PAGE_SIZE = 4096
+# Windows 的分页计数器单位也是页，x86/x64/ARM64 上固定为 4 KiB
+_WINDOWS_PAGE_SIZE = 4096
+
+
+def _linux_page_size():
+    try:
+        return os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return _LINUX_PAGE_SIZE
+
+
+def read_linux_meminfo(path="/proc/meminfo"):
+    """
+    解析 /proc/meminfo
+
+    Returns:
+        dict: 字段名 -> 字节数（kB 字段已换算）
+    """
+    values = {}
+    with open(path, 'r', encoding='ascii') as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            parts = rest.split()
+            if not parts:
+                continue
+            try:
+                value = int(parts[0])
+            except ValueError:
+                continue
+            if len(parts) > 1 and parts[1] == "kB":
+                value *= 1024
+            values[name] = value
+    return values
+
+
+def read_linux_vmstat(path="/proc/vmstat", keys=("pswpin", "pswpout")):
+    """
+    读取 /proc/vmstat 中指定的计数器
+
+    Returns:
+        dict: 计数器名 -> 数值，缺失的计数器不出现在结果中
+    """
+    wanted = set(keys)
+    values = {}
+    with open(path, 'r', encoding='ascii') as f:
+        for line in f:
+            name, _, value = line.partition(" ")
+            if name in wanted:
+                values[name] = int(value)
+                if len(values) == len(wanted):
+                    break
+    return values
+
+
+def collect_linux(meminfo_path="/proc/meminfo", vmstat_path="/proc/vmstat", pressure_path="/proc/pressure/memory"):
+    """Linux: 一次读取 /proc/meminfo、/proc/vmstat 和 PSI，按 psutil 的口径计算各字段"""
+    info = read_linux_meminfo(meminfo_path)
+    total = info["MemTotal"]
+    free = info.get("MemFree", 0)
+    buffers = info.get("Buffers", 0)
+    cached = info.get("Cached", 0) + info.get("SReclaimable", 0)
+    available = info.get("MemAvailable", free + buffers + cached)
+    used = total - available
+    swap_total = info.get("SwapTotal", 0)
+
+    try:
+        vmstat = read_linux_vmstat(vmstat_path)
+    except (IOError, OSError, ValueError):
+        vmstat = {}
+    page_size = _linux_page_size()
+
+    return {
+        "total": total,
+        "available": available,
+        "used": used,
+        "cached": cached,
+        "swap_total": swap_total,
+        "swap_used": swap_total - info.get("SwapFree", 0),
+        "swap_in_bytes": vmstat["pswpin"] * page_size if "pswpin" in vmstat else None,
+        "swap_out_bytes": vmstat["pswpout"] * page_size if "pswpout" in vmstat else None,
+        "commit_total": info.get("Committed_AS"),
+        "commit_limit": info.get("CommitLimit"),
+        "psi": read_pressure(pressure_path)
+    }
+
+
+def read_pressure(path="/proc/pressure/memory"):
+    """
+    解析 PSI 压力文件（/proc/pressure/memory 或 cgroup v2 的 memory.pressure）
+
+    Returns:
+        dict: {"some": {avg10, avg60, avg300, total}, "full": {...}}，avg 为百分比，
+            total 为累计停顿微秒数；文件不存在（内核未启用 PSI）时为 None
+    """
+    try:
+        with open(path, 'r', encoding='ascii') as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return None
+    pressure = {}
+    for line in lines:
+        kind, _, rest = line.partition(" ")
+        values = {}
+        for field in rest.split():
+            name, _, value = field.partition("=")
+            values[name] = int(value) if name == "total" else float(value)
+        pressure[kind] = values
+    return pressure
+
+
+class PERFORMANCE_INFORMATION(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("CommitTotal", ctypes.c_size_t),
+        ("CommitLimit", ctypes.c_size_t),
+        ("CommitPeak", ctypes.c_size_t),
+        ("PhysicalTotal", ctypes.c_size_t),
+        ("PhysicalAvailable", ctypes.c_size_t),
+        ("SystemCache", ctypes.c_size_t),
+        ("KernelTotal", ctypes.c_size_t),
+        ("KernelPaged", ctypes.c_size_t),
+        ("KernelNonpaged", ctypes.c_size_t),
+        ("PageSize", ctypes.c_size_t),
+        ("HandleCount", ctypes.c_ulong),
+        ("ProcessCount", ctypes.c_ulong),
+        ("ThreadCount", ctypes.c_ulong),
+    ]
+
+
+class _PDH_RAW_COUNTER(ctypes.Structure):
+    _fields_ = [
+        ("CStatus", ctypes.c_ulong),
+        ("TimeStampLow", ctypes.c_ulong),
+        ("TimeStampHigh", ctypes.c_ulong),
+        ("FirstValue", ctypes.c_longlong),
+        ("SecondValue", ctypes.c_longlong),
+        ("MultiCount", ctypes.c_ulong),
+    ]
+
+
+# PDH_CSTATUS_VALID_DATA / PDH_CSTATUS_NEW_DATA
+_PDH_VALID_STATUS = (0, 1)
+
+
+class WindowsPagingCounters:
+    """
+    通过 PDH 读取系统级分页计数器的原始累计值
+
+    "每秒"计数器的原始值 FirstValue 是开机以来的累计数，两次读取相减即得区间增量，
+    不需要 PDH 自己的两次采样换算。一次读取是几次系统调用，与进程数无关。
+    计数器用英文路径添加，不受系统语言影响。
+    """
+
+    COUNTERS = {
+        # 硬缺页时从磁盘读页的次数，对应 Linux 的 pgmajfault
+        "page_reads": r"\Memory\Page Reads/sec",
+        # 硬缺页读入的页数（含页面文件和映射文件）
+        "pages_input": r"\Memory\Pages Input/sec",
+        # 写出到磁盘的页数（含页面文件和映射文件）
+        "pages_output": r"\Memory\Pages Output/sec",
+    }
+
+    def __init__(self, pdh=None):
+        """
+        Args:
+            pdh: pdh.dll，测试时可替换
+        """
+        self._pdh = pdh if pdh is not None else ctypes.WinDLL("pdh")
+        self._lock = threading.Lock()
+        self._query = ctypes.c_void_p()
+        self._check(self._pdh.PdhOpenQueryW(None, 0, ctypes.byref(self._query)), "PdhOpenQueryW")
+        self._counters = {}
+        for name, path in self.COUNTERS.items():
+            handle = ctypes.c_void_p()
+            self._check(self._pdh.PdhAddEnglishCounterW(self._query, path, 0, ctypes.byref(handle)),
+                        f"PdhAddEnglishCounterW({path})")
+            self._counters[name] = handle
+
+    @staticmethod
+    def _check(status, call):
+        if status != 0:
+            raise OSError(f"{call} failed with PDH status 0x{status & 0xFFFFFFFF:08X}")
+
+    def read(self):
+        """
+        Returns:
+            dict: 计数器名 -> 累计值，单个计数器无效时为 None
+        """
+        with self._lock:
+            self._check(self._pdh.PdhCollectQueryData(self._query), "PdhCollectQueryData")
+            values = {}
+            for name, handle in self._counters.items():
+                raw = _PDH_RAW_COUNTER()
+                counter_type = ctypes.c_ulong()
+                status = self._pdh.PdhGetRawCounterValue(handle, ctypes.byref(counter_type), ctypes.byref(raw))
+                valid = status == 0 and raw.CStatus in _PDH_VALID_STATUS
+                values[name] = raw.FirstValue if valid else None
+            return values
+
+
+_paging_counters = None
+_paging_counters_lock = threading.Lock()
+
+
+def windows_paging_counters():
+    """进程内共用的 WindowsPagingCounters，首次调用时创建；PDH 不可用时为 None，且不再重试"""
+    global _paging_counters
+    with _paging_counters_lock:
+        if _paging_counters is None:
+            try:
+                _paging_counters = WindowsPagingCounters()
+            except (OSError, AttributeError) as e:
+                logger.debug(f"PDH paging counters unavailable: {e}")
+                _paging_counters = False
+        return _paging_counters or None
+
+
+def collect_windows():
+    """
+    Windows: 一次 GetPerformanceInfo 调用得到物理内存、提交量和系统缓存
+
+    Windows 没有直接的页面文件用量：swap_used 按提交量超出已用物理内存的部分估算，
+    swap_total 按提交上限超出物理内存的部分估算，都是近似值。
+    换入 / 换出字节数取自 PDH 的 Pages Input / Pages Output，其中也包含映射文件的读写，
+    会略高于真正的页面文件流量；PDH 不可用时为 None。
+    """
+    perf = PERFORMANCE_INFORMATION()
+    perf.cb = ctypes.sizeof(perf)
+    if not ctypes.windll.psapi.GetPerformanceInfo(ctypes.byref(perf), perf.cb):
+        raise ctypes.WinError()
+
+    page = perf.PageSize
+    total = perf.PhysicalTotal * page
+    available = perf.PhysicalAvailable * page
+    commit_total = perf.CommitTotal * page
+    commit_limit = perf.CommitLimit * page
+    used = total - available
+    # 页面文件 = 提交上限中超出物理内存的部分，已用部分同理
+    swap_total = max(0, commit_limit - total)
+    swap_used = min(swap_total, max(0, commit_total - used))
+
+    counters = windows_paging_counters()
+    try:
+        paging = counters.read() if counters is not None else {}
+    except OSError as e:
+        logger.debug(f"PDH paging counters unreadable: {e}")
+        paging = {}
+    pages_input = paging.get("pages_input")
+    pages_output = paging.get("pages_output")
+
+    return {
+        "total": total,
+        "available": available,
+        "used": used,
+        "cached": perf.SystemCache * page,
+        "swap_total": swap_total,
+        "swap_used": swap_used,
+        "swap_in_bytes": pages_input * _WINDOWS_PAGE_SIZE if pages_input is not None else None,
+        "swap_out_bytes": pages_output * _WINDOWS_PAGE_SIZE if pages_output is not None else None,
+        "commit_total": commit_total,
+        "commit_limit": commit_limit,
+        # Windows has no pressure-stall accounting
+        "psi": None
+    }
+
+
+def collect_generic():
+    """其他平台：使用 psutil，提交量不可用"""
+    mem = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+    return {
+        "total": mem.total,
+        "available": mem.available,
+        "used": mem.used,
+        "cached": getattr(mem, "cached", None),
+        "swap_total": swap.total,
+        "swap_used": swap.used,
+        "swap_in_bytes": swap.sin,
+        "swap_out_bytes": swap.sout,
+        "commit_total": None,
+        "commit_limit": None,
+        "psi": None
+    }
+
+
+def collect_raw_snapshot():
+    """
+    按当前平台采集一次原始内存快照
+
+    Returns:
+        dict: 原始字节数，外加 monotonic 采集时间 "time"
+    """
+    if sys.platform == "win32":
+        raw = collect_windows()
+    elif sys.platform.startswith("linux"):
+        raw = collect_linux()
+    else:
+        raw = collect_generic()
+    raw["time"] = time.monotonic()
+    return raw
+
+
+def read_fault_counters(vmstat_path="/proc/vmstat"):
+    """
+    读取系统累计缺页次数和换入字节数，用于衡量清理后的代价
+
+    Linux 上一次读取 /proc/vmstat 的 pgmajfault（需要读磁盘的硬缺页）和 pswpin；
+    Windows 上读取 PDH 的 Page Reads（硬缺页次数）和 Pages Input（硬缺页读入的页数，
+    含映射文件，作为换入量的近似）；其他平台只有 psutil 的换入字节数。
+    不会遍历进程，可以在清理线程和界面线程上调用。
+
+    Returns:
+        dict: {page_faults, swap_in_bytes}，平台不支持的字段为 None
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            vmstat = read_linux_vmstat(vmstat_path, keys=("pgmajfault", "pswpin"))
+        except (IOError, OSError, ValueError):
+            vmstat = {}
+        swap_in = vmstat.get("pswpin")
+        return {
+            "page_faults": vmstat.get("pgmajfault"),
+            "swap_in_bytes": swap_in * _linux_page_size() if swap_in is not None else None
+        }
+    if sys.platform == "win32":
+        counters = windows_paging_counters()
+        values = counters.read() if counters is not None else {}
+        pages_input = values.get("pages_input")
+        return {
+            "page_faults": values.get("page_reads"),
+            "swap_in_bytes": pages_input * _WINDOWS_PAGE_SIZE if pages_input is not None else None
+        }
+    return {"page_faults": None, "swap_in_bytes": psutil.swap_memory().sin}
+
+
+def read_page_faults(vmstat_path="/proc/vmstat"):
+    """系统累计缺页次数，口径见 read_fault_counters()，平台不支持时为 None"""
+    return read_fault_counters(vmstat_path)["page_faults"]
@@ -0,0 +1,163 @@
+"""
+Linux PSI 触发器
+
+向 /proc/pressure/memory（或 cgroup v2 的 memory.pressure）写入 "<some|full> <停顿微秒> <窗口微秒>" 后，
+任意 window 内内存停顿累计超过阈值时内核会让该文件描述符产生 POLLPRI 事件。
+采样线程在 poll() 上睡眠，压力出现时立即醒来，而不是按定时器反复检查。
+
+需要 Linux 5.2+；非特权进程需要 6.5+ 且窗口为 2 秒的整数倍，因此默认窗口为 2 秒。
+"""
+
+import logging
+import os
+import select
+
+logger = logging.getLogger(__name__)
+
+HOST_PRESSURE_PATH = "/proc/pressure/memory"
+
+
+class PsiTrigger:
+    """压力超过阈值时唤醒 wait()；也可以被 interrupt() 提前唤醒"""
+
+    def __init__(self, kind="some", stall_ms=200, window_ms=2000, path=HOST_PRESSURE_PATH):
+        """
+        Args:
+            kind: "some"（至少一个任务停顿）或 "full"（所有任务同时停顿）
+            stall_ms: 窗口内累计停顿超过该毫秒数即触发
+            window_ms: 统计窗口(毫秒)，内核要求 500ms-10s
+            path: PSI 文件，cgroup v2 中可以用该 cgroup 的 memory.pressure
+        """
+        if kind not in ("some", "full"):
+            raise ValueError(f"kind must be 'some' or 'full', got {kind!r}")
+        if not 500 <= window_ms <= 10000:
+            raise ValueError(f"window_ms must be between 500 and 10000, got {window_ms}")
+        if not 0 < stall_ms <= window_ms:
+            raise ValueError(f"stall_ms must be between 0 and window_ms, got {stall_ms}")
+        self.kind = kind
+        self.stall_ms = stall_ms
+        self.window_ms = window_ms
+        self.path = path
+        self.events = 0
+        self._fd = None
+        self._wake_r = None
+        self._wake_w = None
+        self._poller = None
+
+    @classmethod
+    def from_percent(cls, percent, kind="some", window_ms=2000, **kwargs):
+        """按停顿时间占比(%)创建，与 psi_*_avg10 阈值的含义一致"""
+        return cls(kind=kind, stall_ms=max(1, int(window_ms * percent / 100)), window_ms=window_ms, **kwargs)
+
+    def open(self):
+        """
+        注册触发器
+
+        Raises:
+            OSError: 内核不支持 PSI 或没有权限
+        """
+        if self._fd is not None:
+            return self
+        fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            # The kernel parses the trigger from a NUL-terminated string
+            os.write(fd, f"{self.kind} {self.stall_ms * 1000} {self.window_ms * 1000}\0".encode("ascii"))
+        except OSError:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._poller = select.poll()
+        self._poller.register(self._fd, select.POLLPRI)
+        self._poller.register(self._wake_r, select.POLLIN)
+        return self
+
+    def wait(self, timeout=None):
+        """
+        睡眠直到压力触发、超时或被 interrupt()
+
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            bool: 因压力触发而醒来时为 True
+        """
+        if self._poller is None:
+            raise RuntimeError("PsiTrigger is not open")
+        timeout_ms = None if timeout is None else max(0, int(timeout * 1000))
+        triggered = False
+        for fd, event in self._poller.poll(timeout_ms):
+            if fd == self._wake_r:
+                try:
+                    while os.read(self._wake_r, 64):
+                        pass
+                except BlockingIOError:
+                    pass
+            elif event & select.POLLERR:
+                # The pressure file went away (e.g. the cgroup was removed)
+                raise OSError(f"PSI trigger on {self.path} was invalidated")
+            elif event & select.POLLPRI:
+                triggered = True
+        if triggered:
+            self.events += 1
+        return triggered
+
+    def interrupt(self):
+        """从其他线程唤醒正在 wait() 的线程"""
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b"x")
+            except BlockingIOError:
+                # The pipe is already full of wake-ups; one is enough
+                pass
+
+    def close(self):
+        """注销触发器，可重复调用"""
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._wake_r = self._wake_w = self._poller = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def pressure_path(cgroup=None):
+    """
+    监控范围对应的 PSI 文件
+
+    Args:
+        cgroup: MemoryMonitor.cgroup；为 None 时监控整个宿主机
+
+    Returns:
+        str | None: cgroup v2 为其 memory.pressure，宿主机为 /proc/pressure/memory；
+            cgroup v1 没有 PSI，返回 None（宿主机的压力不代表 cgroup 内的压力）
+    """
+    if cgroup is None:
+        return HOST_PRESSURE_PATH
+    return cgroup.pressure_path
+
+
+def open_psi_trigger(percent, kind="some", cgroup=None, **kwargs):
+    """
+    尽力创建并注册触发器，监听与监控范围一致的 PSI 文件（见 pressure_path()）
+
+    Returns:
+        PsiTrigger | None: 平台不支持或没有权限时为 None
+    """
+    if not hasattr(select, "poll"):
+        return None
+    kwargs.setdefault("path", pressure_path(cgroup))
+    if kwargs["path"] is None:
+        logger.info("PSI trigger unavailable for a cgroup v1 scope, falling back to timed sampling")
+        return None
+    try:
+        return PsiTrigger.from_percent(percent, kind=kind, **kwargs).open()
+    except OSError as e:
+        logger.info(f"PSI trigger unavailable, falling back to timed sampling: {e}")
+        return None
@@ -0,0 +1,357 @@
+"""
+清理策略规则
+
+config.json 中的 "rules" 是一组声明式规则，例如:
+
+    {
+      "name": "purge-standby",
+      "when": {"all": [
+        {"metric": "available", "op": "<", "value": 2},
+        {"process": "msbuild*", "running": false}
+      ]},
+      "blackout": ["09:00-10:00"],
+      "cooldown": 600,
+      "action": {"type": "clean", "mode": "standby_list"}
+    }
+
+条件:
+    {"metric": 名称, "op": "<"|"<="|">"|">="|"=="|"!=", "value": 数值}
+        名称为 MemoryMonitor.get_extended_info() 的字段；平台不提供的指标视为不满足
+    {"process": 通配符, "running": true|false}   进程名匹配（支持 * 和 ?），不区分大小写
+    {"time": "HH:MM-HH:MM"}                      本地时间窗口，可跨午夜
+    {"all": [...]} / {"any": [...]} / {"not": 条件}
+规则字段:
+    blackout: 时间窗口列表，窗口内不触发
+    cooldown: 两次触发的最短间隔(秒)
+    action:   {"type": "clean", "mode": 可选模式} 或 {"type": "notify", "message": 文本}
+
+规则在加载时编译为闭包，每个样本只需调用一次 RuleEngine.evaluate()。
+"""
+
+import logging
+import operator
+import re
+import time
+from datetime import datetime
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+
+ACTION_TYPES = ("clean", "notify")
+
+# all/any 内部按代价排序，短路时尽量不扫描进程列表
+_COST_CHEAP = 0
+_COST_PROCESS = 1
+
+
+class RuleError(ValueError):
+    """规则配置无效，path 指出出错的位置，例如 rules[0].when.all[1].op"""
+
+    def __init__(self, path, message):
+        self.path = path
+        super().__init__(f"{path}: {message}")
+
+
+class EvaluationContext:
+    """一次评估的输入；进程名列表在第一次需要时才读取，同一次评估内共享"""
+
+    __slots__ = ("sample", "minute_of_day", "_process_source", "_process_text", "_process_matches")
+
+    def __init__(self, sample, now, process_source):
+        self.sample = sample
+        self.minute_of_day = now.hour * 60 + now.minute
+        self._process_source = process_source
+        self._process_text = None
+        self._process_matches = {}
+
+    def process_running(self, search):
+        """用编译好的多行正则搜索进程名，同一模式在一次评估内只搜索一次"""
+        found = self._process_matches.get(search)
+        if found is None:
+            if self._process_text is None:
+                # One string holding "\nname" per process lets a single regex call scan every name
+                self._process_text = "".join("\n" + name for name in self._process_source())
+            found = self._process_matches[search] = search(self._process_text) is not None
+        return found
+
+
+class Action:
+    """规则触发的动作"""
+
+    __slots__ = ("rule", "type", "params")
+
+    def __init__(self, rule, action_type, params):
+        self.rule = rule
+        self.type = action_type
+        self.params = params
+
+    def __repr__(self):
+        return f"Action(rule={self.rule!r}, type={self.type!r}, params={self.params!r})"
+
+
+class _CompiledRule:
+    __slots__ = ("name", "predicate", "blackouts", "cooldown", "action", "last_fired")
+
+    def __init__(self, name, predicate, blackouts, cooldown, action):
+        self.name = name
+        self.predicate = predicate
+        self.blackouts = blackouts
+        self.cooldown = cooldown
+        self.action = action
+        self.last_fired = None
+
+
+def running_process_names():
+    """当前运行的进程名（小写）"""
+    names = set()
+    for proc in psutil.process_iter(["name"]):
+        name = proc.info.get("name")
+        if name:
+            names.add(name.lower())
+    return names
+
+
+def _compile_process_pattern(pattern):
+    """把 * / ? 通配符编译为匹配整个进程名的正则 search 方法"""
+    parts = []
+    for ch in pattern.lower():
+        if ch == "*":
+            parts.append("[^\\n]*")
+        elif ch == "?":
+            parts.append("[^\\n]")
+        else:
+            parts.append(re.escape(ch))
+    # A literal "\n" prefix instead of "^" keeps the engine's fast literal-prefix scan
+    return re.compile("\n" + "".join(parts) + "$", re.MULTILINE).search
+
+
+def parse_time_window(path, text):
+    """
+    解析 "HH:MM-HH:MM"，返回 (开始分钟, 结束分钟)；告警的免打扰时段也用它
+
+    Raises:
+        RuleError: 格式无效，path 指出出错的位置
+    """
+    if not isinstance(text, str):
+        raise RuleError(path, f"time window must be a string like '09:00-10:00', got {text!r}")
+    match = re.fullmatch(r"\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*", text)
+    if not match:
+        raise RuleError(path, f"time window must look like '09:00-10:00', got {text!r}")
+    h1, m1, h2, m2 = (int(g) for g in match.groups())
+    if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59 or (h2 == 24 and m2):
+        raise RuleError(path, f"invalid time in window {text!r}")
+    return h1 * 60 + m1, h2 * 60 + m2
+
+
+def in_time_window(window, minute):
+    """minute（一天中的第几分钟）是否在 parse_time_window() 返回的窗口内"""
+    start, end = window
+    if start <= end:
+        return start <= minute < end
+    # Window wraps past midnight, e.g. 22:00-06:00
+    return minute >= start or minute < end
+
+
+def _compile_condition(cond, path, metric_names):
+    """编译一个条件，返回 (predicate(ctx) -> bool, 代价)"""
+    if not isinstance(cond, dict) or len(cond) == 0:
+        raise RuleError(path, f"condition must be a non-empty object, got {cond!r}")
+
+    if "all" in cond or "any" in cond:
+        key = "all" if "all" in cond else "any"
+        if len(cond) != 1:
+            raise RuleError(path, f"'{key}' cannot be combined with other keys")
+        items = cond[key]
+        if not isinstance(items, list) or not items:
+            raise RuleError(f"{path}.{key}", "must be a non-empty list of conditions")
+        compiled = [_compile_condition(c, f"{path}.{key}[{i}]", metric_names) for i, c in enumerate(items)]
+        # Stable sort: cheap checks first so short-circuiting skips the process scan
+        compiled.sort(key=lambda pc: pc[1])
+        predicates = tuple(p for p, _ in compiled)
+        cost = max(c for _, c in compiled)
+        if key == "all":
+            return (lambda ctx: all(p(ctx) for p in predicates)), cost
+        return (lambda ctx: any(p(ctx) for p in predicates)), cost
+
+    if "not" in cond:
+        if len(cond) != 1:
+            raise RuleError(path, "'not' cannot be combined with other keys")
+        inner, cost = _compile_condition(cond["not"], f"{path}.not", metric_names)
+        return (lambda ctx: not inner(ctx)), cost
+
+    if "metric" in cond:
+        unknown = set(cond) - {"metric", "op", "value"}
+        if unknown:
+            raise RuleError(path, f"unknown keys {sorted(unknown)}")
+        metric = cond["metric"]
+        if metric_names is not None and metric not in metric_names:
+            raise RuleError(f"{path}.metric", f"unknown metric {metric!r}, expected one of {sorted(metric_names)}")
+        op_name = cond.get("op")
+        if op_name not in OPERATORS:
+            raise RuleError(f"{path}.op", f"unknown operator {op_name!r}, expected one of {list(OPERATORS)}")
+        value = cond.get("value")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise RuleError(f"{path}.value", f"must be a number, got {value!r}")
+        op = OPERATORS[op_name]
+
+        def metric_predicate(ctx):
+            current = ctx.sample.get(metric)
+            return current is not None and op(current, value)
+        return metric_predicate, _COST_CHEAP
+
+    if "process" in cond:
+        unknown = set(cond) - {"process", "running"}
+        if unknown:
+            raise RuleError(path, f"unknown keys {sorted(unknown)}")
+        pattern = cond["process"]
+        if not isinstance(pattern, str) or not pattern:
+            raise RuleError(f"{path}.process", f"must be a non-empty name pattern, got {pattern!r}")
+        running = cond.get("running", True)
+        if not isinstance(running, bool):
+            raise RuleError(f"{path}.running", f"must be a boolean, got {running!r}")
+        search = _compile_process_pattern(pattern)
+
+        def process_predicate(ctx):
+            return ctx.process_running(search) == running
+        return process_predicate, _COST_PROCESS
+
+    if "time" in cond:
+        if len(cond) != 1:
+            raise RuleError(path, "'time' cannot be combined with other keys")
+        window = parse_time_window(f"{path}.time", cond["time"])
+        return (lambda ctx: in_time_window(window, ctx.minute_of_day)), _COST_CHEAP
+
+    raise RuleError(path, f"unknown condition {sorted(cond)}, expected metric/process/time/all/any/not")
+
+
+def _compile_action(action, path, clean_modes):
+    if not isinstance(action, dict):
+        raise RuleError(path, f"must be an object, got {action!r}")
+    action_type = action.get("type")
+    if action_type not in ACTION_TYPES:
+        raise RuleError(f"{path}.type", f"unknown action {action_type!r}, expected one of {list(ACTION_TYPES)}")
+    params = {k: v for k, v in action.items() if k != "type"}
+    if action_type == "clean":
+        unknown = set(params) - {"mode"}
+        if unknown:
+            raise RuleError(path, f"unknown keys {sorted(unknown)}")
+        mode = params.get("mode")
+        if mode is not None and clean_modes is not None and mode not in clean_modes:
+            raise RuleError(f"{path}.mode", f"unsupported clean mode {mode!r}, expected one of {list(clean_modes)}")
+    else:
+        unknown = set(params) - {"message"}
+        if unknown:
+            raise RuleError(path, f"unknown keys {sorted(unknown)}")
+        if not isinstance(params.get("message"), str):
+            raise RuleError(f"{path}.message", "must be a string")
+    return action_type, params
+
+
+def compile_rules(rules, metric_names=None, clean_modes=None):
+    """
+    校验并编译规则列表
+
+    Args:
+        rules: config.json 中的 "rules" 列表
+        metric_names: 允许的指标名，None 表示不检查
+        clean_modes: 允许的清理模式，None 表示不检查
+
+    Returns:
+        list: 编译后的规则
+
+    Raises:
+        RuleError: 规则无效
+    """
+    if not isinstance(rules, list):
+        raise RuleError("rules", f"must be a list, got {type(rules).__name__}")
+    compiled = []
+    seen = set()
+    for i, rule in enumerate(rules):
+        path = f"rules[{i}]"
+        if not isinstance(rule, dict):
+            raise RuleError(path, f"must be an object, got {rule!r}")
+        unknown = set(rule) - {"name", "when", "action", "cooldown", "blackout"}
+        if unknown:
+            raise RuleError(path, f"unknown keys {sorted(unknown)}")
+        name = rule.get("name", f"rule-{i}")
+        if not isinstance(name, str) or not name:
+            raise RuleError(f"{path}.name", "must be a non-empty string")
+        if name in seen:
+            raise RuleError(f"{path}.name", f"duplicate rule name {name!r}")
+        seen.add(name)
+        if "when" not in rule:
+            raise RuleError(path, "missing 'when'")
+        if "action" not in rule:
+            raise RuleError(path, "missing 'action'")
+        predicate, _ = _compile_condition(rule["when"], f"{path}.when", metric_names)
+        cooldown = rule.get("cooldown", 0)
+        if isinstance(cooldown, bool) or not isinstance(cooldown, (int, float)) or cooldown < 0:
+            raise RuleError(f"{path}.cooldown", f"must be a non-negative number of seconds, got {cooldown!r}")
+        blackout = rule.get("blackout", [])
+        if not isinstance(blackout, list):
+            raise RuleError(f"{path}.blackout", "must be a list of time windows")
+        blackouts = tuple(parse_time_window(f"{path}.blackout[{j}]", w) for j, w in enumerate(blackout))
+        action = _compile_action(rule["action"], f"{path}.action", clean_modes)
+        compiled.append(_CompiledRule(name, predicate, blackouts, cooldown, action))
+    return compiled
+
+
+class RuleEngine:
+    """对每个样本评估编译后的规则，返回需要执行的动作"""
+
+    def __init__(self, rules, metric_names=None, clean_modes=None, process_source=None, clock=time.monotonic):
+        """
+        Args:
+            rules: config.json 中的规则列表
+            metric_names / clean_modes: 见 compile_rules
+            process_source: 返回进程名集合（小写）的函数，默认扫描系统进程
+            clock: 计算冷却时间用的单调时钟
+        """
+        self._rules = compile_rules(rules, metric_names, clean_modes)
+        self._process_source = process_source or running_process_names
+        self._clock = clock
+
+    def __len__(self):
+        return len(self._rules)
+
+    @property
+    def rule_names(self):
+        return [rule.name for rule in self._rules]
+
+    def evaluate(self, sample, now=None):
+        """
+        评估所有规则
+
+        Args:
+            sample: 监控样本（get_extended_info() 的结果）
+            now: 当前本地时间，默认 datetime.now()
+
+        Returns:
+            list: 触发的 Action，规则的冷却时间从此刻开始计算
+        """
+        if not self._rules:
+            return []
+        ctx = EvaluationContext(sample, now or datetime.now(), self._process_source)
+        mono = self._clock()
+        fired = []
+        for rule in self._rules:
+            if rule.last_fired is not None and mono - rule.last_fired < rule.cooldown:
+                continue
+            if any(in_time_window(w, ctx.minute_of_day) for w in rule.blackouts):
+                continue
+            if not rule.predicate(ctx):
+                continue
+            rule.last_fired = mono
+            action_type, params = rule.action
+            fired.append(Action(rule.name, action_type, dict(params)))
+        return fired
@@ -0,0 +1,103 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorScheduler:
+    """定时采样内存状态，并把每个样本分发给注册的监听器"""
+
+    def __init__(self, monitor, interval=5, sampler=None, extended=False, waker=None):
+        """
+        Args:
+            monitor: MemoryMonitor 实例
+            interval: 固定采样间隔(秒)
+            sampler: 可选的 AdaptiveSampler，提供时由它决定每次采样后的等待时间
+            extended: 为 True 时采集 get_extended_info()（含交换区和提交量）
+            waker: 可选的唤醒源（如 PsiTrigger），提供 wait(timeout) 和 interrupt()；
+                两次采样之间在它上面睡眠，事件发生时立即采样
+        """
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise ValueError(f"interval must be a positive number, got {interval!r}")
+        self.monitor = monitor
+        self.interval = interval
+        self.sampler = sampler
+        self.extended = extended
+        self.waker = waker
+        self.wakeups = 0
+        self.last_sample = None
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """注册样本监听器，callback(mem_info) 在采样线程上调用"""
+        self._listeners.append(callback)
+
+    def tick(self):
+        """采样一次并通知所有监听器
+
+        Returns:
+            dict: 本次采样的内存信息
+        """
+        if self.extended:
+            mem_info = self.monitor.get_extended_info()
+        else:
+            mem_info = self.monitor.get_memory_info()
+        self.last_sample = mem_info
+        for callback in self._listeners:
+            try:
+                callback(mem_info)
+            except Exception:
+                # One faulty listener must not stop sampling for the others
+                logger.exception(f"Sample listener {callback!r} failed")
+        return mem_info
+
+    def start(self):
+        """在后台线程中启动定时采样"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止采样线程"""
+        self._stop_event.set()
+        if self.waker is not None:
+            self.waker.interrupt()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _next_delay(self, mem_info):
+        """本次采样后到下一次采样的等待时间"""
+        if self.sampler is None or mem_info is None:
+            return self.interval
+        return self.sampler.next_interval(mem_info)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            mem_info = None
+            try:
+                mem_info = self.tick()
+            except Exception:
+                logger.exception("Memory sampling failed")
+            self._sleep(self._next_delay(mem_info))
+
+    def _sleep(self, delay):
+        """等待 delay 秒；有唤醒源时在它上面等待，事件发生时提前返回"""
+        if self.waker is None:
+            self._stop_event.wait(delay)
+            return
+        try:
+            if self.waker.wait(delay):
+                self.wakeups += 1
+        except OSError:
+            logger.exception("Sampling waker failed, falling back to timed sampling")
+            self.waker = None
+            self._stop_event.wait(delay)
@@ -0,0 +1,198 @@
+"""
+本进程的内存看门狗
+
+托盘程序会连续运行数周，这里定期记录自身 RSS 和 Python 对象数，
+可选地用 tracemalloc 对比快照找出增长最多的分配位置；
+RSS 超出预算时调用注册的缓存清理函数并收缩自身工作集。
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 ** 2
+
+
+def _load_kernel32():
+    """本模块私有的 kernel32 实例，声明原型不会影响共享的 ctypes.windll.kernel32"""
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+    kernel32.GetCurrentProcess.argtypes = ()
+    kernel32.SetProcessWorkingSetSize.restype = ctypes.c_int
+    kernel32.SetProcessWorkingSetSize.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t)
+    return kernel32
+
+
+def trim_process_memory():
+    """
+    把本进程空闲的内存还给系统
+
+    Windows 上收缩工作集，Linux (glibc) 上调用 malloc_trim。
+
+    Returns:
+        bool: 平台支持并调用成功
+    """
+    try:
+        if sys.platform == "win32":
+            kernel32 = _load_kernel32()
+            handle = kernel32.GetCurrentProcess()
+            return bool(kernel32.SetProcessWorkingSetSize(handle, ctypes.c_size_t(-1), ctypes.c_size_t(-1)))
+        if sys.platform.startswith("linux"):
+            libc_name = ctypes.util.find_library("c")
+            if libc_name:
+                libc = ctypes.CDLL(libc_name)
+                if hasattr(libc, "malloc_trim"):
+                    return bool(libc.malloc_trim(0))
+    except (OSError, AttributeError) as e:
+        logger.debug(f"Process memory trim unavailable: {e}")
+    return False
+
+
+def _current_rss():
+    return psutil.Process().memory_info().rss
+
+
+class SelfWatchdog:
+    """定期检查本进程内存，超预算时清理缓存"""
+
+    def __init__(self, rss_budget_mb=150, interval=600, use_tracemalloc=False, top_n=10,
+                 history_size=144, rss_source=None, object_counter=None, process_trimmer=None,
+                 clock=time.monotonic):
+        """
+        Args:
+            rss_budget_mb: RSS 预算(MB)，超出即清理
+            interval: maybe_check() 的最短检查间隔(秒)
+            use_tracemalloc: 是否启用 tracemalloc 以报告增长最多的分配位置（有额外内存开销）
+            top_n: 报告的分配位置数量
+            history_size: 保留的检查记录条数
+            rss_source / object_counter / process_trimmer / clock: 测试时可替换
+        """
+        if rss_budget_mb <= 0:
+            raise ValueError(f"rss_budget_mb must be positive, got {rss_budget_mb}")
+        if interval <= 0:
+            raise ValueError(f"interval must be positive, got {interval}")
+        self.rss_budget_mb = rss_budget_mb
+        self.interval = interval
+        self.use_tracemalloc = use_tracemalloc
+        self.top_n = top_n
+        self.history = collections.deque(maxlen=history_size)
+        self.trim_count = 0
+        self.last_report = None
+        self._rss_source = rss_source or _current_rss
+        self._object_counter = object_counter or (lambda: len(gc.get_objects()))
+        self._process_trimmer = process_trimmer or trim_process_memory
+        self._clock = clock
+        self._trim_callbacks = {}
+        self._baseline_snapshot = None
+        self._started_tracemalloc = False
+        self._last_check = None
+
+    def add_trim_callback(self, name, callback):
+        """注册一个超预算时调用的缓存清理函数"""
+        self._trim_callbacks[name] = callback
+
+    def start(self):
+        """按配置启动 tracemalloc 并记录基线快照"""
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if tracemalloc.is_tracing():
+            self._baseline_snapshot = self._take_snapshot()
+
+    def stop(self):
+        """停止由本看门狗启动的 tracemalloc"""
+        self._baseline_snapshot = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def maybe_check(self):
+        """距上次检查超过 interval 时执行 check()，否则返回 None"""
+        now = self._clock()
+        if self._last_check is not None and now - self._last_check < self.interval:
+            return None
+        return self.check()
+
+    def check(self):
+        """
+        检查一次本进程内存
+
+        Returns:
+            dict: {rss_mb, objects, rss_growth_mb, over_budget, trimmed, rss_after_trim_mb, top_growth}
+                rss_growth_mb 相对第一次检查；top_growth 为 [(位置, 增长KB, 增加块数)]，
+                未启用 tracemalloc 时为空列表
+        """
+        self._last_check = self._clock()
+        rss = self._rss_source()
+        objects = self._object_counter()
+        self.history.append((self._last_check, rss, objects))
+
+        report = {
+            "rss_mb": round(rss / _MB, 1),
+            "objects": objects,
+            "rss_growth_mb": round((rss - self.history[0][1]) / _MB, 1),
+            "over_budget": rss > self.rss_budget_mb * _MB,
+            "trimmed": False,
+            "rss_after_trim_mb": None,
+            "top_growth": self.top_growth()
+        }
+        if report["over_budget"]:
+            logger.warning(f"Process RSS {report['rss_mb']} MB exceeds budget {self.rss_budget_mb} MB, trimming")
+            self.trim()
+            report["trimmed"] = True
+            report["rss_after_trim_mb"] = round(self._rss_source() / _MB, 1)
+        self.last_report = report
+        return report
+
+    def trim(self):
+        """清理注册的缓存、回收垃圾并收缩进程工作集"""
+        for name, callback in self._trim_callbacks.items():
+            try:
+                callback()
+            except Exception:
+                logger.exception(f"Trim callback {name!r} failed")
+        gc.collect()
+        self._process_trimmer()
+        self.trim_count += 1
+
+    def top_growth(self):
+        """对比基线快照，返回增长最多的分配位置"""
+        if self._baseline_snapshot is None or not tracemalloc.is_tracing():
+            return []
+        stats = self._take_snapshot().compare_to(self._baseline_snapshot, "lineno")
+        growth = []
+        for stat in stats:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            growth.append((f"{frame.filename}:{frame.lineno}", round(stat.size_diff / 1024, 1), stat.count_diff))
+            if len(growth) >= self.top_n:
+                break
+        return growth
+
+    @staticmethod
+    def _take_snapshot():
+        # Exclude tracemalloc's own bookkeeping from the comparison
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+
+def format_report(report):
+    """把 check() 的结果格式化为多行文本"""
+    lines = [f"自身内存: RSS {report['rss_mb']} MB (较启动 {report['rss_growth_mb']:+} MB), 对象 {report['objects']}"]
+    if report["trimmed"]:
+        lines.append(f"  超出预算，已清理，清理后 RSS {report['rss_after_trim_mb']} MB")
+    for site, size_kb, count in report["top_growth"]:
+        lines.append(f"  +{size_kb} KB ({count:+} 块) {site}")
+    return "\n".join(lines)
@@ -0,0 +1,798 @@
+"""
+后台服务模式
+
+MemoryService 在没有托盘界面的进程中运行监控、清理、自动清理和日志写入，
+以便在 Windows 上以 SYSTEM 身份运行（清空备用列表需要提升的权限），托盘程序则作为普通用户的客户端。
+进程如何托管（前台、POSIX 守护进程、Windows 服务、计划任务）见 src.service_host。
+
+命令通道基于 multiprocessing.connection（Windows 命名管道 / POSIX Unix 套接字），
+连接时用共享密钥做 HMAC 握手。服务以 SYSTEM / root 运行、托盘以普通用户运行时:
+    - Windows 上命名管道和密钥文件带显式的 DACL：SYSTEM、管理员和服务账户完全控制，
+      交互式用户可以连接管道、读取密钥；管道拒绝远程客户端
+    - POSIX 上使用与用户无关的固定目录（/run/windows-memory-cleaner），目录必须属于服务账户，
+      配置 service_group 后该组成员可以进入目录、连接套接字并读取密钥
+通道的边界:
+    - 消息是 JSON（send_bytes / recv_bytes），从不反序列化 pickle，客户端无法让服务执行任意代码
+    - 只接受 COMMANDS 中列出的命令，参数逐个校验
+    - 客户端请求的清理受 clean_min_interval 限制，不能用特权进程反复清空系统缓存；
+      触发方式只能是 CLIENT_TRIGGERS（manual / rule），客户端无法伪造自动清理的日志
+
+    {"cmd": "clean", "args": {"mode": "standby_list"}}  ->  {"ok": true, "result": {...}}
+                                                       或  {"ok": false, "error": "..."}
+"""
+
+import collections
+import json
+import logging
+import os
+import secrets
+import stat
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, answer_challenge, deliver_challenge
+
+from src.alerts import AlertManager, CallbackNotifier
+from src.deferred_clean import DeferredCleaner
+from src.idle_detector import LoadIdleDetector
+
+try:
+    import pywintypes
+    import win32api
+    import win32event
+    import win32file
+    import win32pipe
+    import win32security
+    import winerror
+except ImportError:
+    # pywin32 is only needed for the named pipe and file ACLs on Windows
+    win32security = None
+
+logger = logging.getLogger(__name__)
+
+APP_ID = "windows-memory-cleaner"
+MAX_MESSAGE_BYTES = 64 * 1024
+
+# 命令 -> 允许的参数
+COMMANDS = {
+    "ping": (),
+    "health": (),
+    "status": (),
+    "clean": ("mode", "trigger"),
+    "recent_logs": ("limit",),
+    "events": ("since",),
+}
+
+# 客户端可以记录的清理触发方式；auto 只由服务自己的自动清理写入
+CLIENT_TRIGGERS = ("manual", "rule")
+
+
+class ServiceError(RuntimeError):
+    """服务返回错误或无法连接"""
+
+
+def runtime_dir():
+    """
+    服务的运行时目录（密钥、套接字、pid 文件）
+
+    与运行服务或客户端的用户无关，root 服务和普通用户的托盘得到同一个路径。
+    非 root 运行服务时需要预先创建该目录并交给服务账户（例如 systemd 的 RuntimeDirectory=），
+    或者用 service_address 指定其他位置。
+    """
+    if sys.platform == "win32":
+        return os.path.join(os.environ.get("PROGRAMDATA", r"C:\ProgramData"), "WindowsMemoryCleaner")
+    return os.path.join("/run" if os.path.isdir("/run") else "/var/run", APP_ID)
+
+
+def default_address():
+    """命令通道的默认地址"""
+    if sys.platform == "win32":
+        return rf"\\.\pipe\{APP_ID}"
+    return os.path.join(runtime_dir(), "service.sock")
+
+
+def default_key_file(address=None):
+    """命令通道的密钥文件；POSIX 上与套接字放在同一目录"""
+    address = address or default_address()
+    if _family(address) == "AF_UNIX":
+        return os.path.join(os.path.dirname(os.path.abspath(address)), "service.key")
+    return os.path.join(runtime_dir(), "service.key")
+
+
+def _group_id(group):
+    """service_group 配置转换为 gid，未配置时为 None"""
+    if group is None or group == "":
+        return None
+    if isinstance(group, int):
+        return group
+    import grp
+    try:
+        return grp.getgrnam(group).gr_gid
+    except KeyError:
+        raise ServiceError(f"service group {group!r} does not exist")
+
+
+def _check_owner(path, directory):
+    """路径必须属于当前用户且其他用户不可写，否则拒绝使用（可能是其他用户预先放置的）"""
+    info = os.lstat(path)
+    kind_ok = stat.S_ISDIR(info.st_mode) if directory else stat.S_ISREG(info.st_mode)
+    if not kind_ok or info.st_uid != os.geteuid():
+        kind = "directory" if directory else "file"
+        raise ServiceError(f"{path} is not a {kind} owned by this user, refusing to use it")
+    if info.st_mode & 0o022:
+        raise ServiceError(f"{path} is writable by other users, refusing to use it")
+
+
+def _restrict(path, mode, gid):
+    """设置权限；指定 gid 时把组权限交给该组，否则去掉组权限"""
+    if gid is not None:
+        os.chown(path, -1, gid)
+        os.chmod(path, mode)
+    else:
+        os.chmod(path, mode & 0o700)
+
+
+def secure_runtime_dir(path, group=None):
+    """
+    创建或检查运行时目录
+
+    新建的目录只有所有者可访问；已存在的目录必须属于当前用户且其他用户不可写。
+    指定 group（POSIX）时该组可以进入目录，Windows 上设置显式的 DACL。
+
+    Raises:
+        ServiceError: 目录无法创建、属于其他用户或其他用户可写
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    try:
+        os.mkdir(path, 0o700)
+        created = True
+    except FileExistsError:
+        created = False
+    except OSError as e:
+        raise ServiceError(f"cannot create runtime directory {path}: {e}") from e
+    if sys.platform == "win32":
+        _secure_windows_path(path, directory=True)
+        return path
+    _check_owner(path, directory=True)
+    gid = _group_id(group)
+    if created or gid is not None:
+        _restrict(path, 0o750, gid)
+    return path
+
+
+def load_or_create_authkey(path=None, create=True, group=None):
+    """
+    读取命令通道的共享密钥，不存在时创建
+
+    create=True（服务一侧）时先检查所在目录和已有的密钥文件都属于服务账户，
+    文件只对所有者可读；指定 group（POSIX）时该组可读，Windows 上交互式用户可读。
+
+    Raises:
+        ServiceError: 密钥不存在且 create=False、没有读取权限，或目录 / 文件属于其他用户
+    """
+    path = path or default_key_file()
+    if create:
+        secure_runtime_dir(os.path.dirname(os.path.abspath(path)), group)
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+    except FileNotFoundError:
+        if not create:
+            raise ServiceError(f"service key {path} not found, is the service running?")
+    except PermissionError:
+        raise ServiceError(f"no permission to read service key {path}; "
+                           "the service must grant this user read access (service_group on POSIX)")
+    else:
+        if create:
+            _secure_key_file(path, group)
+        return key
+    key = secrets.token_hex(32).encode("ascii")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    _secure_key_file(path, group)
+    return key
+
+
+def _secure_key_file(path, group):
+    if sys.platform == "win32":
+        _secure_windows_path(path, directory=False)
+        return
+    _check_owner(path, directory=False)
+    _restrict(path, 0o640, _group_id(group))
+
+
+# SYSTEM, administrators and the service account get full control; interactive users (the tray)
+# get the rights in the last ACE. P protects the DACL from the inherited ProgramData entries.
+_WINDOWS_SDDL = "D:P(A;{inherit};GA;;;SY)(A;{inherit};GA;;;BA)(A;{inherit};GA;;;{owner})(A;{inherit};{users};;;IU)"
+_TRUSTED_OWNER_SIDS = ("S-1-5-18", "S-1-5-32-544")  # SYSTEM, Administrators
+_FILE_FLAG_FIRST_PIPE_INSTANCE = 0x00080000
+_PIPE_REJECT_REMOTE_CLIENTS = 0x00000008
+
+
+def _current_user_sid():
+    token = win32security.OpenProcessToken(win32api.GetCurrentProcess(), win32security.TOKEN_QUERY)
+    return win32security.GetTokenInformation(token, win32security.TokenUser)[0]
+
+
+def _windows_security_descriptor(users, inherit=""):
+    owner = win32security.ConvertSidToStringSid(_current_user_sid())
+    sddl = _WINDOWS_SDDL.format(inherit=inherit, owner=owner, users=users)
+    return win32security.ConvertStringSecurityDescriptorToSecurityDescriptor(sddl, win32security.SDDL_REVISION_1)
+
+
+def _secure_windows_path(path, directory):
+    """检查所有者并设置显式 DACL；没有 pywin32 时保留继承的权限"""
+    if win32security is None:
+        logger.warning(f"pywin32 is not installed, {path} keeps its inherited permissions")
+        return
+    owner = win32security.GetFileSecurity(
+        path, win32security.OWNER_SECURITY_INFORMATION).GetSecurityDescriptorOwner()
+    trusted = [_current_user_sid()] + [win32security.ConvertStringSidToSid(s) for s in _TRUSTED_OWNER_SIDS]
+    if not any(owner == sid for sid in trusted):
+        kind = "directory" if directory else "file"
+        raise ServiceError(f"{path} is a {kind} owned by another user, refusing to use it")
+    descriptor = _windows_security_descriptor("GR", inherit="OICI" if directory else "")
+    win32security.SetNamedSecurityInfo(
+        path, win32security.SE_FILE_OBJECT,
+        win32security.DACL_SECURITY_INFORMATION | win32security.PROTECTED_DACL_SECURITY_INFORMATION,
+        None, None, descriptor.GetSecurityDescriptorDacl(), None)
+
+
+def _family(address):
+    return "AF_PIPE" if address.startswith("\\\\") else "AF_UNIX"
+
+
+class MemoryService:
+    """托管监控、清理和日志的服务引擎，生命周期为 start() / stop() / health()"""
+
+    def __init__(self, config=None, monitor=None, cleaner=None, log_manager=None, address=None,
+                 authkey=None, clean_min_interval=30, max_events=100, clock=time.monotonic):
+        """
+        Args:
+            config: ConfigManager，默认读取 config.json
+            monitor / cleaner / log_manager: 默认按配置创建，测试时可替换
+            address: 命令通道地址，默认为配置的 service_address 或 default_address()；
+                为空字符串时不开启命令通道
+            authkey: 命令通道密钥，默认 load_or_create_authkey()
+            clean_min_interval: 两次客户端请求的清理之间的最短间隔(秒)
+            max_events: 保留的事件（告警、清理）条数，客户端用 events 命令拉取
+            clock: 单调时钟
+        """
+        if config is None:
+            from src.config import ConfigManager
+            config = ConfigManager()
+        self.config = config
+        self._monitor = monitor
+        self._cleaner = cleaner
+        self._log_manager = log_manager
+        if address is None:
+            address = config.service_address or default_address()
+        self.address = address
+        self._authkey = authkey
+        self.clean_min_interval = clean_min_interval
+        self._clock = clock
+
+        self.state = "stopped"
+        self.scheduler = None
+        self.deferred = None
+        self.alerts = None
+        self._server = None
+        self._started_at = None
+        self._last_sample = None
+        self._last_sample_at = None
+        self._last_remote_clean = None
+        self._clean_lock = threading.Lock()
+        self._events = collections.deque(maxlen=max_events)
+        self._event_seq = 0
+        self._events_lock = threading.Lock()
+        self.samples = 0
+        self.cleans = 0
+        self.clean_errors = 0
+
+    # -- lifecycle --
+
+    def start(self):
+        """创建组件，启动采样线程和命令通道"""
+        if self.state != "stopped":
+            raise RuntimeError(f"cannot start service in state {self.state!r}")
+        self.state = "starting"
+        try:
+            self._build()
+            self.scheduler.start()
+            if self.address:
+                group = self.config.service_group or None
+                authkey = self._authkey or load_or_create_authkey(default_key_file(self.address), group=group)
+                self._server = CommandServer(self, self.address, authkey, group=group)
+                self._server.start()
+        except Exception:
+            self.stop()
+            raise
+        self._started_at = self._clock()
+        self.state = "running"
+        logger.info(f"Memory service started (backend={self._cleaner.backend.name}, channel={self.address or 'off'})")
+
+    def stop(self):
+        """停止命令通道和采样线程，写出排队中的日志；可重复调用"""
+        if self.state in ("stopped", "stopping"):
+            return
+        self.state = "stopping"
+        server, self._server = self._server, None
+        # Tear down every component even if an earlier one fails (e.g. after a failed start)
+        for name, close in (("command channel", server.close if server is not None else None),
+                            ("sampler", self.scheduler.stop if self.scheduler is not None else None),
+                            ("log writer", self._log_manager.close if self._log_manager is not None else None)):
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception:
+                logger.exception(f"Failed to stop {name}")
+        self.state = "stopped"
+        logger.info("Memory service stopped")
+
+    def health(self):
+        """
+        健康状态
+
+        Returns:
+            dict: {healthy, state, pid, uptime, samples, last_sample_age, scheduler_running,
+                   channel_running, cleans, clean_errors, clients, backend}
+        """
+        now = self._clock()
+        age = round(now - self._last_sample_at, 1) if self._last_sample_at is not None else None
+        scheduler_running = self.scheduler is not None and self.scheduler.running
+        channel_running = self._server is not None and self._server.running
+        # A sampler that has not produced anything for three intervals is stuck
+        stale_after = 3 * self.config.refresh_interval
+        if age is not None:
+            sampling_ok = age <= stale_after
+        else:
+            sampling_ok = self._started_at is not None and now - self._started_at <= stale_after
+        return {
+            "healthy": (self.state == "running" and scheduler_running and sampling_ok
+                        and (channel_running or not self.address)),
+            "state": self.state,
+            "pid": os.getpid(),
+            "uptime": round(now - self._started_at, 1) if self._started_at is not None else None,
+            "samples": self.samples,
+            "last_sample_age": age,
+            "scheduler_running": scheduler_running,
+            "channel_running": channel_running,
+            "cleans": self.cleans,
+            "clean_errors": self.clean_errors,
+            "clients": self._server.clients if self._server is not None else 0,
+            "backend": self._cleaner.backend.name if self._cleaner is not None else None
+        }
+
+    def _build(self):
+        from src.memory_monitor import MemoryMonitor
+        from src.memory_cleaner import MemoryCleaner
+        from src.log_manager import LogManager
+        from src.scheduler import MonitorScheduler
+
+        config = self.config
+        if self._monitor is None:
+            self._monitor = MemoryMonitor()
+        self._monitor.set_threshold(config.warning_threshold)
+        if self._cleaner is None:
+            self._cleaner = MemoryCleaner(monitor=self._monitor)
+        if self._log_manager is None:
+            self._log_manager = LogManager(
+                write_behind=True,
+                durability=config.log_durability,
+                flush_interval=config.log_flush_interval,
+                max_pending=config.log_max_pending
+            )
+        self.scheduler = MonitorScheduler(self._monitor, interval=config.refresh_interval, extended=True)
+        self.scheduler.add_listener(self._on_sample)
+        # A service has no interactive session to watch for input, so idleness is judged by load
+        self.deferred = DeferredCleaner(
+            lambda mode: self.clean(mode, trigger="auto"),
+            LoadIdleDetector(config.idle_seconds),
+            max_defer=config.idle_max_defer if config.idle_clean else 0,
+            critical_percent=config.critical_threshold,
+            min_interval=config.clean_min_interval
+        )
+        if config.alerts_enabled:
+            # The tray shows these through ServiceAlertRelay, so the thresholds match its own alerts
+            self.alerts = AlertManager(
+                [CallbackNotifier(lambda alert: self._add_event("alert", alert.to_dict()))],
+                warning_threshold=config.warning_threshold,
+                critical_threshold=max(config.critical_threshold, config.warning_threshold),
+                metric_thresholds={
+                    "swap_percent": config.swap_warning_threshold,
+                    "commit_percent": config.commit_warning_threshold,
+                    "swap_in_rate": config.swap_in_rate_threshold,
+                    "psi_some_avg10": config.psi_some_threshold,
+                    "psi_full_avg10": config.psi_full_threshold
+                },
+                repeat_interval=config.alert_repeat_interval,
+                quiet_hours=config.alert_quiet_hours,
+                rate_limit=config.alert_rate_limit
+            )
+
+    # -- engine --
+
+    def _on_sample(self, mem_info):
+        self._last_sample = mem_info
+        self._last_sample_at = self._clock()
+        self.samples += 1
+        if self.alerts is not None:
+            self.alerts.evaluate(mem_info)
+        if self.config.auto_clean and self._monitor.should_auto_clean(
+                mem_info, self.config.auto_clean_trigger, self.config.auto_clean_threshold):
+            self.deferred.request(reason="auto_clean")
+        else:
+            # The spike cleared before the system went idle; a clean now would only cost page faults
+            self.deferred.cancel(reason="auto_clean")
+        self.deferred.poll(mem_info)
+
+    def clean(self, mode=None, trigger="manual"):
+        """执行一次清理并写入日志，返回 MemoryCleaner.clean() 的结果（另含 log_id）"""
+        with self._clean_lock:
+            result = self._cleaner.clean(mode)
+        if result["success"]:
+            self.cleans += 1
+            result["log_id"] = self._log_manager.add_clean_log(
+                before_percent=result["before"]["percent"],
+                after_percent=result["after"]["percent"],
+                freed_gb=result["freed"],
+                mode=result["mode"],
+                trigger=trigger,
+                duration_ms=result.get("duration_ms"),
+                processes=result.get("processes")
+            )
+        else:
+            self.clean_errors += 1
+            logger.warning(f"Clean failed: {result.get('error')}")
+        self._add_event("clean", {"success": result["success"], "mode": result["mode"],
+                                  "freed_gb": result["freed"], "trigger": trigger})
+        return result
+
+    def _add_event(self, kind, data):
+        with self._events_lock:
+            self._event_seq += 1
+            self._events.append({"seq": self._event_seq, "type": kind, "time": time.time(), "data": data})
+
+    # -- commands --
+
+    def handle(self, request):
+        """
+        处理一条命令
+
+        Args:
+            request: {"cmd": 名称, "args": {...}}
+
+        Returns:
+            dict: {"ok": True, "result": ...} 或 {"ok": False, "error": 消息}
+        """
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("request must be an object")
+            cmd = request.get("cmd")
+            args = request.get("args") or {}
+            if cmd not in COMMANDS:
+                raise ValueError(f"unknown command {cmd!r}")
+            if not isinstance(args, dict):
+                raise ValueError("args must be an object")
+            unexpected = set(args) - set(COMMANDS[cmd])
+            if unexpected:
+                raise ValueError(f"unexpected arguments for {cmd}: {sorted(unexpected)}")
+            return {"ok": True, "result": getattr(self, f"_cmd_{cmd}")(**args)}
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            logger.exception(f"Service command {request!r} failed")
+            return {"ok": False, "error": f"internal error: {e}"}
+
+    def _cmd_ping(self):
+        return "pong"
+
+    def _cmd_health(self):
+        return self.health()
+
+    def _cmd_status(self):
+        return self._last_sample if self._last_sample is not None else self._monitor.get_memory_info()
+
+    def _cmd_clean(self, mode=None, trigger="manual"):
+        if mode is not None and mode not in self._cleaner.modes:
+            raise ValueError(f"mode must be one of {list(self._cleaner.modes)}, got {mode!r}")
+        if trigger not in CLIENT_TRIGGERS:
+            raise ValueError(f"trigger must be one of {list(CLIENT_TRIGGERS)}, got {trigger!r}")
+        now = self._clock()
+        if self._last_remote_clean is not None and now - self._last_remote_clean < self.clean_min_interval:
+            wait = self.clean_min_interval - (now - self._last_remote_clean)
+            raise ValueError(f"clean requested too soon, retry in {wait:.0f}s")
+        self._last_remote_clean = now
+        return self.clean(mode, trigger=trigger)
+
+    def _cmd_recent_logs(self, limit=10):
+        if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= 100:
+            raise ValueError("limit must be an integer between 1 and 100")
+        return [record.to_dict() for record in self._log_manager.get_recent_logs(limit)]
+
+    def _cmd_events(self, since=0):
+        if not isinstance(since, int) or isinstance(since, bool):
+            raise ValueError("since must be an integer")
+        with self._events_lock:
+            if since > self._event_seq:
+                # The client saw a previous run of the service; everything queued now is new to it
+                since = 0
+            return [event for event in self._events if event["seq"] > since]
+
+
+class _PipeListener:
+    """
+    Windows 命名管道监听器
+
+    与 multiprocessing 的 PipeListener 相同（重叠 I/O、消息模式），但管道带有显式的安全描述符：
+    默认 DACL 只给 Everyone 读权限，以 SYSTEM 运行时普通用户无法以读写方式打开管道。
+    """
+
+    BUFSIZE = 8192
+
+    def __init__(self, address):
+        self.address = address
+        self._security = win32security.SECURITY_ATTRIBUTES()
+        self._security.SECURITY_DESCRIPTOR = _windows_security_descriptor("GRGW")
+        # The first instance fails if another process already owns the name
+        self._handle = self._new_instance(_FILE_FLAG_FIRST_PIPE_INSTANCE)
+
+    def _new_instance(self, flags=0):
+        return win32pipe.CreateNamedPipe(
+            self.address,
+            win32pipe.PIPE_ACCESS_DUPLEX | win32file.FILE_FLAG_OVERLAPPED | flags,
+            win32pipe.PIPE_TYPE_MESSAGE | win32pipe.PIPE_READMODE_MESSAGE | win32pipe.PIPE_WAIT
+            | _PIPE_REJECT_REMOTE_CLIENTS,
+            win32pipe.PIPE_UNLIMITED_INSTANCES, self.BUFSIZE, self.BUFSIZE, 0, self._security)
+
+    def accept(self):
+        from multiprocessing.connection import PipeConnection
+
+        # Keep a free instance open so a connecting client never finds the pipe missing
+        handle, self._handle = self._handle, self._new_instance()
+        overlapped = pywintypes.OVERLAPPED()
+        overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
+        try:
+            if win32pipe.ConnectNamedPipe(handle, overlapped) == winerror.ERROR_IO_PENDING:
+                win32event.WaitForSingleObject(overlapped.hEvent, win32event.INFINITE)
+                win32file.GetOverlappedResult(handle, overlapped, True)
+        except pywintypes.error as e:
+            handle.Close()
+            raise OSError(e.winerror, e.strerror) from e
+        return PipeConnection(handle.Detach())
+
+    def close(self):
+        self._handle.Close()
+
+
+class CommandServer:
+    """在后台线程上接受客户端连接，把 JSON 请求交给 MemoryService.handle()"""
+
+    def __init__(self, service, address, authkey, group=None, handshake_timeout=5):
+        """
+        Args:
+            group: POSIX 上可以连接套接字的组（名称或 gid），默认只有服务账户
+            handshake_timeout: 客户端完成 HMAC 握手的最长时间(秒)，超时的连接被关闭
+        """
+        self.service = service
+        self.address = address
+        self.group = group
+        self.handshake_timeout = handshake_timeout
+        self._authkey = authkey
+        self._listener = None
+        self._thread = None
+        self._closed = threading.Event()
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    @property
+    def clients(self):
+        with self._lock:
+            return len(self._connections)
+
+    @property
+    def running(self):
+        """接受连接的线程是否仍在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        family = _family(self.address)
+        if family == "AF_PIPE" and win32security is not None:
+            self._listener = _PipeListener(self.address)
+        else:
+            if family == "AF_UNIX":
+                secure_runtime_dir(os.path.dirname(os.path.abspath(self.address)), self.group)
+                if os.path.exists(self.address):
+                    # Left behind by a crashed service; a live one would still be accepting
+                    os.unlink(self.address)
+            else:
+                logger.warning("pywin32 is not installed; the command pipe keeps the default DACL "
+                               "and only the service account can connect")
+            # The handshake runs on the per-connection thread (see _serve), so the listener itself
+            # only accepts; a silent or misbehaving peer then cannot hold up other clients
+            self._listener = Listener(self.address, family=family)
+            if family == "AF_UNIX":
+                # The directory keeps everyone else out until the mode is set
+                _restrict(self.address, 0o660, _group_id(self.group))
+        self._thread = threading.Thread(target=self._accept_loop, name="service-commands", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+        if self._listener is None:
+            # start() failed before listening; there is nothing to poke or close
+            return
+        # accept() does not return when the listener is closed from another thread; poke it instead
+        try:
+            Client(self.address, family=_family(self.address)).close()
+        except (OSError, EOFError):
+            pass
+        if self._thread is not None:
+            self._thread.join(5)
+        self._listener.close()
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.close()
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError as e:
+                if self._closed.is_set():
+                    break
+                # A peer that reset or aborted its connect; keep serving everyone else
+                logger.warning(f"Failed to accept service connection: {e!r}")
+                self._closed.wait(0.1)
+                continue
+            if self._closed.is_set():
+                conn.close()
+                break
+            threading.Thread(target=self._serve, args=(conn,), name="service-client", daemon=True).start()
+
+    def _handshake(self, conn):
+        """双向 HMAC 握手，失败或超时返回 False"""
+        channel = _TimedConnection(conn, self.handshake_timeout)
+        try:
+            deliver_challenge(channel, self._authkey)
+            answer_challenge(channel, self._authkey)
+        except (AuthenticationError, AssertionError, EOFError, OSError) as e:
+            # Wrong key, a peer that hung up or stayed silent, or garbage instead of a challenge reply
+            logger.warning(f"Rejected service connection: {e!r}")
+            return False
+        return True
+
+    def _serve(self, conn):
+        try:
+            if not self._handshake(conn):
+                return
+            with self._lock:
+                self._connections.add(conn)
+            while not self._closed.is_set():
+                try:
+                    data = conn.recv_bytes(MAX_MESSAGE_BYTES)
+                except (EOFError, OSError):
+                    break
+                try:
+                    request = json.loads(data)
+                except ValueError:
+                    response = {"ok": False, "error": "request must be JSON"}
+                else:
+                    response = self.service.handle(request)
+                conn.send_bytes(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+
+class _TimedConnection:
+    """握手期间包装连接，每次读取最多等待 timeout 秒"""
+
+    def __init__(self, conn, timeout):
+        self._conn = conn
+        self._timeout = timeout
+
+    def send_bytes(self, data):
+        self._conn.send_bytes(data)
+
+    def recv_bytes(self, maxlength=None):
+        if not self._conn.poll(self._timeout):
+            raise TimeoutError(f"no handshake reply within {self._timeout}s")
+        return self._conn.recv_bytes(maxlength)
+
+
+class ServiceClient:
+    """托盘程序一侧的命令通道客户端，连接断开时自动重连一次"""
+
+    def __init__(self, address=None, authkey=None, key_file=None, timeout=30):
+        """
+        Args:
+            address: 服务地址，默认 default_address()
+            authkey: 共享密钥，默认从 key_file 读取
+            key_file: 密钥文件，默认 default_key_file(address)
+            timeout: 等待回复的秒数（清理可能需要数秒）
+        """
+        self.address = address or default_address()
+        self._authkey = authkey
+        self._key_file = key_file
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def call(self, cmd, **args):
+        """
+        发送命令并返回结果
+
+        Raises:
+            ServiceError: 无法连接、超时或服务返回错误
+        """
+        payload = json.dumps({"cmd": cmd, "args": args}).encode("utf-8")
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    conn = self._connect()
+                    conn.send_bytes(payload)
+                    if not conn.poll(self.timeout):
+                        self._disconnect()
+                        raise ServiceError(f"service did not answer {cmd!r} within {self.timeout}s")
+                    response = json.loads(conn.recv_bytes(MAX_MESSAGE_BYTES * 16))
+                    break
+                except AuthenticationError as e:
+                    self._disconnect()
+                    raise ServiceError(f"service at {self.address} rejected the key") from e
+                except (OSError, EOFError) as e:
+                    self._disconnect()
+                    if attempt == 2:
+                        raise ServiceError(f"cannot reach service at {self.address}: {e}") from e
+        if not response.get("ok"):
+            raise ServiceError(response.get("error", "unknown error"))
+        return response["result"]
+
+    def ping(self):
+        """服务是否可用"""
+        try:
+            return self.call("ping") == "pong"
+        except ServiceError:
+            return False
+
+    def health(self):
+        return self.call("health")
+
+    def events(self, since=0):
+        """序号大于 since 的事件（告警、清理），按序号排列"""
+        return self.call("events", since=since)
+
+    def clean(self, mode=None, trigger="manual"):
+        """请求服务执行清理，返回 MemoryCleaner.clean() 风格的结果；trigger 只能是 CLIENT_TRIGGERS 之一"""
+        args = {"trigger": trigger}
+        if mode is not None:
+            args["mode"] = mode
+        return self.call("clean", **args)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _connect(self):
+        if self._conn is None:
+            if self._authkey is None:
+                key_file = self._key_file or default_key_file(self.address)
+                self._authkey = load_or_create_authkey(key_file, create=False)
+            self._conn = Client(self.address, family=_family(self.address), authkey=self._authkey)
+        return self._conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
@@ -0,0 +1,220 @@
+"""
+服务进程的托管方式
+
+MemoryService 只负责 start() / stop()，进程如何运行由这里的宿主决定:
+
+    ForegroundHost   前台运行直到收到 SIGINT / SIGTERM / SIGBREAK；
+                     供 Windows 计划任务（以 SYSTEM 身份开机启动）和 systemd 使用
+    PosixDaemonHost  POSIX 上两次 fork 脱离终端并写 pid 文件，测试中也用它驱动完整的生命周期
+    MemoryCleanerWindowsService
+                     通过 pywin32 注册为 Windows 服务（python main.py --service install）
+"""
+
+import logging
+import os
+import signal
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "WindowsMemoryCleaner"
+SERVICE_DISPLAY_NAME = "Windows 内存清理服务"
+
+try:
+    import servicemanager
+    import win32service
+    import win32serviceutil
+except ImportError:
+    # pywin32 is only needed to register as a Windows service
+    win32serviceutil = None
+
+
+class ServiceHost:
+    """宿主基类：run() 阻塞直到 stop() 被调用"""
+
+    def __init__(self):
+        self._stop_event = threading.Event()
+
+    def run(self, service):
+        """启动服务，等待停止请求，然后停止服务"""
+        self._stop_event.clear()
+        service.start()
+        try:
+            self._stop_event.wait()
+        finally:
+            service.stop()
+
+    def stop(self):
+        """请求停止，可在任意线程或信号处理函数中调用"""
+        self._stop_event.set()
+
+    @property
+    def stopping(self):
+        return self._stop_event.is_set()
+
+
+class ForegroundHost(ServiceHost):
+    """在前台运行，收到终止信号时停止"""
+
+    def __init__(self, install_signals=True):
+        """
+        Args:
+            install_signals: 是否注册信号处理（只能在主线程注册，测试中在其他线程运行时关闭）
+        """
+        super().__init__()
+        self.install_signals = install_signals
+
+    def run(self, service):
+        if self.install_signals:
+            self._install_signal_handlers()
+        super().run(service)
+
+    def _install_signal_handlers(self):
+        def handle_signal(signum, frame):
+            logger.info(f"Received signal {signum}, stopping service")
+            self.stop()
+
+        for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                try:
+                    signal.signal(signum, handle_signal)
+                except (ValueError, OSError):
+                    # Not on the main thread or not supported by this platform
+                    pass
+
+
+class PosixDaemonHost(ForegroundHost):
+    """POSIX 守护进程：可选两次 fork 脱离终端，运行期间持有 pid 文件"""
+
+    def __init__(self, pidfile=None, detach=True, install_signals=True):
+        """
+        Args:
+            pidfile: pid 文件路径，可选；文件中的进程仍在运行时拒绝启动
+            detach: 是否 fork 到后台；为 False 时在当前进程运行（测试用）
+        """
+        if not hasattr(os, "fork") and detach:
+            raise RuntimeError("PosixDaemonHost needs os.fork(); use ForegroundHost on this platform")
+        super().__init__(install_signals)
+        self.pidfile = pidfile
+        self.detach = detach
+
+    def run(self, service):
+        if self.pidfile is not None:
+            running = read_pidfile(self.pidfile)
+            if running is not None:
+                raise RuntimeError(f"service already running with pid {running} ({self.pidfile})")
+        if self.detach:
+            self._daemonize()
+        if self.pidfile is not None:
+            with open(self.pidfile, 'w', encoding='ascii') as f:
+                f.write(f"{os.getpid()}\n")
+        try:
+            super().run(service)
+        finally:
+            if self.pidfile is not None:
+                try:
+                    os.unlink(self.pidfile)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _daemonize():
+        """两次 fork 并重定向标准流，父进程直接退出"""
+        if os.fork() > 0:
+            os._exit(0)
+        os.setsid()
+        if os.fork() > 0:
+            os._exit(0)
+        os.umask(0o022)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        os.close(devnull)
+
+
+def read_pidfile(path):
+    """
+    读取 pid 文件
+
+    Returns:
+        int | None: 文件中的进程仍在运行时为其 pid；文件不存在、无效或进程已退出时为 None
+    """
+    try:
+        with open(path, 'r', encoding='ascii') as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        # Exists but belongs to another user
+        pass
+    return pid
+
+
+def scheduled_task_command(python=None, script=None):
+    """
+    计划任务模式：以 SYSTEM 身份开机启动 --service 的 schtasks 命令行
+
+    没有安装 pywin32 或不希望注册服务时使用。
+    """
+    python = python or sys.executable
+    script = script or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    return [
+        "schtasks", "/Create", "/F",
+        "/TN", SERVICE_NAME,
+        "/SC", "ONSTART",
+        "/RU", "SYSTEM",
+        "/RL", "HIGHEST",
+        "/TR", f'"{python}" "{script}" --service run'
+    ]
+
+
+if win32serviceutil is not None:
+    class MemoryCleanerWindowsService(win32serviceutil.ServiceFramework):
+        """由服务控制管理器启动的 Windows 服务"""
+
+        _svc_name_ = SERVICE_NAME
+        _svc_display_name_ = SERVICE_DISPLAY_NAME
+        _svc_description_ = "监控内存并按配置清理，托盘程序通过命名管道与其通信"
+
+        def __init__(self, args):
+            super().__init__(args)
+            self._host = ServiceHost()
+
+        def SvcStop(self):
+            self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
+            self._host.stop()
+
+        def SvcDoRun(self):
+            from src.service import MemoryService
+
+            # Services start in System32; config.json and logs/ live next to main.py
+            os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            servicemanager.LogInfoMsg(f"{SERVICE_NAME} starting")
+            self._host.run(MemoryService())
+
+
+def handle_windows_service(argv):
+    """
+    注册、删除、启动或停止 Windows 服务，参数与 win32serviceutil.HandleCommandLine 相同
+
+    Raises:
+        RuntimeError: 没有安装 pywin32
+    """
+    if win32serviceutil is None:
+        raise RuntimeError("pywin32 is required to run as a Windows service; "
+                           "use the scheduled task mode instead")
+    if len(argv) == 1:
+        # Started by the service control manager
+        servicemanager.Initialize()
+        servicemanager.PrepareToHostSingle(MemoryCleanerWindowsService)
+        servicemanager.StartServiceCtrlDispatcher()
+    else:
+        win32serviceutil.HandleCommandLine(MemoryCleanerWindowsService, argv=argv)
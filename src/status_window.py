@@ -5,17 +5,24 @@ import os
 # Add parent directory to path for imports to work when run directly
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import logging
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 from src.memory_monitor import MemoryMonitor
 from src.memory_cleaner import MemoryCleaner
 from src.log_manager import LogManager
+from src.clean_analytics import CleanAnalytics
+from src.instrumentation import metrics, timed
+
+logger = logging.getLogger(__name__)
 
 class StatusWindow:
-    def __init__(self, on_clean_callback):
+    def __init__(self, on_clean_callback, log_manager=None, analytics=None):
         self.on_clean_callback = on_clean_callback
         self.monitor = MemoryMonitor()
-        self.logger = LogManager()
+        # Share the tray's LogManager so entries still queued for writing are visible
+        self.logger = log_manager if log_manager is not None else LogManager()
+        self.analytics = analytics if analytics is not None else CleanAnalytics()
         self.window = None
         self.updating = False
         self.timer_id = None  # Track timer for cancellation
@@ -65,7 +72,8 @@ class StatusWindow:
 
         if self.window:
             try:
-                self.window.withdraw()
+                # 销毁而不是隐藏：下次 show() 会新建 Tk 实例，只隐藏会让旧实例一直留在内存中
+                self.window.destroy()
             except Exception:
                 # Window may already be destroyed
                 pass
@@ -105,6 +113,15 @@ class StatusWindow:
         )
         self.info_label.pack(pady=5)
 
+        # 清理效果摘要
+        self.effect_label = tk.Label(
+            info_frame,
+            text="",
+            font=("Microsoft YaHei", 9),
+            fg="#555555"
+        )
+        self.effect_label.pack(pady=2)
+
         # 按钮框架
         btn_frame = tk.Frame(self.window)
         btn_frame.pack(pady=10)
@@ -138,6 +155,7 @@ class StatusWindow:
         )
         self.log_text.pack(fill="both", expand=True)
 
+    @timed("status_window.update_display")
     def _update_display(self):
         """更新显示内容"""
         try:
@@ -152,26 +170,39 @@ class StatusWindow:
                 text=f"已用: {mem_info['used']} GB / {mem_info['total']} GB ({mem_info['percent']}%)"
             )
 
+            # 更新清理效果
+            self._update_effect()
+
             # 更新日志
             self._update_logs()
-        except Exception as e:
+        except Exception:
             # Log error but don't crash the GUI
-            print(f"Error updating display: {e}")
-            pass
+            metrics.incr("errors.status_window.update_display")
+            logger.exception("Error updating display")
+
+    def _update_effect(self):
+        """更新清理效果摘要"""
+        overall = self.analytics.summary()["overall"]
+        if not overall["cleans"]:
+            self.effect_label.config(text="清理效果: 暂无数据")
+            return
+        text = f"清理效果: 平均释放 {overall['mean_freed_gb']}GB"
+        if overall["median_regrow_seconds"] is not None:
+            text += f", 回涨中位数 ≤{overall['median_regrow_seconds']}s"
+        if overall["effective_rate"] is not None:
+            text += f", 有效率 {overall['effective_rate'] * 100:.0f}%"
+        self.effect_label.config(text=text)
 
     def _update_logs(self):
         """更新日志显示"""
         self.log_text.config(state='normal')
         self.log_text.delete(1.0, tk.END)
 
-        logs = self.logger.get_recent_logs(limit=10)
-        if not logs:
+        records = self.logger.get_recent_logs(limit=10)
+        if not records:
             self.log_text.insert(tk.END, "暂无清理记录")
         else:
-            for log in reversed(logs):
-                timestamp = log['timestamp'][:19]  # 去掉毫秒
-                line = f"[{timestamp}] {log['before_percent']}% -> {log['after_percent']}%, 释放 {log['freed']}GB\n"
-                self.log_text.insert(tk.END, line)
+            self.log_text.insert(tk.END, "".join(record.format_line() + "\n" for record in reversed(records)))
 
         self.log_text.config(state='disabled')
 
@@ -180,9 +211,10 @@ class StatusWindow:
         try:
             result = self.on_clean_callback()
             self._update_display()
-        except Exception as e:
+        except Exception:
             # Log error but don't crash the GUI
-            print(f"Error during clean operation: {e}")
+            metrics.incr("errors.status_window.clean")
+            logger.exception("Error during clean operation")
             # Still update display even if clean failed
             try:
                 self._update_display()
@@ -1,16 +1,40 @@
 # src/tray_app.py
 import sys
 import os
+import signal
+import logging
+import time
+from datetime import datetime
 
 # Add parent directory to path for imports to work when run directly
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pystray
-from PIL import Image, ImageDraw
 from src.memory_monitor import MemoryMonitor
 from src.memory_cleaner import MemoryCleaner
 from src.config import ConfigManager
 from src.log_manager import LogManager
+from src.icon_renderer import render_memory_icon, render_blank_icon, clear_icon_cache
+from src.scheduler import MonitorScheduler
+from src.adaptive_sampler import AdaptiveSampler
+from src.clean_analytics import CleanAnalytics, format_summary
+from src.instrumentation import metrics, timed, format_top_functions
+from src.self_watchdog import SelfWatchdog, format_report
+from src.rules import RuleEngine, RuleError
+from src.idle_detector import default_idle_detector
+from src.deferred_clean import DeferredCleaner, format_deferred_report
+from src.clean_cost import CleanCostTracker, FaultWindows, format_cost_summary
+from src.psi_trigger import open_psi_trigger
+from src.fleet_agent import FleetAgent
+from src.alerts import AlertManager, ServiceAlertRelay, TrayNotifier
+from src.clean_record import CleanRecord, summarize_records, format_records_summary
+from src.service import ServiceClient, ServiceError
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = "logs/metrics.json"
+# 运行期间定期把计时指标写到 METRICS_FILE，供 main.py --metrics 查看
+METRICS_DUMP_INTERVAL = 60
 
 
 class MemoryTrayApp:
@@ -20,12 +44,131 @@ class MemoryTrayApp:
             raise RuntimeError("MemoryTrayApp only supports Windows platform")
 
         self.config = ConfigManager()
+        metrics.enabled = self.config.instrumentation_enabled
         self.monitor = MemoryMonitor()
+        self.monitor.set_threshold(self.config.warning_threshold)
+        self.monitor.set_metric_threshold("swap_percent", self.config.swap_warning_threshold)
+        self.monitor.set_metric_threshold("commit_percent", self.config.commit_warning_threshold)
+        self.monitor.set_metric_threshold("swap_in_rate", self.config.swap_in_rate_threshold)
+        self.monitor.set_metric_threshold("psi_some_avg10", self.config.psi_some_threshold)
+        self.monitor.set_metric_threshold("psi_full_avg10", self.config.psi_full_threshold)
         self.cleaner = MemoryCleaner()
-        self.logger = LogManager()
+        # 服务模式：清理由以 SYSTEM 身份运行的后台服务执行，托盘只负责显示和发送命令
+        self.service_client = ServiceClient(self.config.service_address or None) if self.config.use_service else None
+        self.logger = LogManager(
+            write_behind=True,
+            durability=self.config.log_durability,
+            flush_interval=self.config.log_flush_interval,
+            max_pending=self.config.log_max_pending
+        )
+        self.analytics = CleanAnalytics()
+        # 清理后 clean_cost_window 秒算出净收益，补写到对应的清理日志；
+        # 同一组缺页统计窗口也用于延迟清理的空闲 / 非空闲对比
+        self.fault_windows = FaultWindows(window=self.config.clean_cost_window)
+        self.cost_tracker = CleanCostTracker(on_complete=self.logger.annotate, fault_windows=self.fault_windows)
+        self.sampler = self._create_sampler()
+        # 内存压力出现时由内核唤醒采样线程（仅 Linux 5.2+，其他平台为 None）；
+        # 监控限定在 cgroup 时监听该 cgroup 的压力
+        self.psi_trigger = (open_psi_trigger(self.config.psi_some_threshold, cgroup=self.monitor.cgroup)
+                            if self.config.psi_trigger else None)
+        self.scheduler = MonitorScheduler(
+            self.monitor,
+            interval=self.config.refresh_interval,
+            sampler=self.sampler,
+            extended=True,
+            waker=self.psi_trigger
+        )
+        self.scheduler.add_listener(self._on_sample)
+        # 自动清理排队等待空闲；关闭 idle_clean 时不等待，但仍受最短间隔限制
+        self.deferred = DeferredCleaner(
+            lambda mode: self._clean(mode, trigger="auto"),
+            default_idle_detector(self.config.idle_seconds),
+            max_defer=self.config.idle_max_defer if self.config.idle_clean else 0,
+            critical_percent=self.config.critical_threshold,
+            min_interval=self.config.clean_min_interval,
+            fault_windows=self.fault_windows
+        )
+        # 配置了汇总服务时上报样本和清理结果
+        self.fleet_agent = (
+            FleetAgent(self.config.fleet_url, token=self.config.fleet_token) if self.config.fleet_url else None
+        )
+        if self.fleet_agent is not None:
+            self.scheduler.add_listener(self.fleet_agent.record_sample)
+        # 服务模式下告警由服务评估，托盘只显示服务事件队列中的告警
+        self.alerts = self._create_alerts() if self.service_client is None else None
+        self.alert_relay = (ServiceAlertRelay(self.service_client.events, [TrayNotifier(lambda: self.icon)])
+                            if self.service_client is not None and self.config.alerts_enabled else None)
+        self.rule_engine = self._create_rule_engine()
+        if self.rule_engine is not None:
+            self.scheduler.add_listener(self._apply_rules)
+        self.watchdog = SelfWatchdog(
+            rss_budget_mb=self.config.self_rss_budget_mb,
+            interval=self.config.self_watchdog_interval,
+            use_tracemalloc=self.config.self_tracemalloc
+        )
+        self.watchdog.add_trim_callback("icon_cache", clear_icon_cache)
+        self._last_metrics_dump = time.monotonic()
         self.running = False
         self.icon = None
 
+    def _create_sampler(self):
+        """按配置创建自适应采样器，关闭或配置无效时使用固定间隔"""
+        if not self.config.adaptive_sampling:
+            return None
+        min_interval = self.config.sampling_min_interval
+        max_interval = self.config.sampling_max_interval
+        try:
+            return AdaptiveSampler(
+                base_interval=min(max(self.config.refresh_interval, min_interval), max_interval),
+                min_interval=min_interval,
+                max_interval=max_interval,
+                warning_threshold=self.config.warning_threshold
+            )
+        except ValueError as e:
+            logger.warning(f"Invalid adaptive sampling settings, using a fixed interval: {e}")
+            return None
+
+    def _create_alerts(self):
+        """按配置创建阈值告警，通知通过托盘气泡发送"""
+        if not self.config.alerts_enabled:
+            return None
+        metric_thresholds = {
+            "swap_percent": self.config.swap_warning_threshold,
+            "commit_percent": self.config.commit_warning_threshold,
+            "swap_in_rate": self.config.swap_in_rate_threshold,
+            "psi_some_avg10": self.config.psi_some_threshold,
+            "psi_full_avg10": self.config.psi_full_threshold
+        }
+        try:
+            return AlertManager(
+                [TrayNotifier(lambda: self.icon)],
+                warning_threshold=self.config.warning_threshold,
+                critical_threshold=max(self.config.critical_threshold, self.config.warning_threshold),
+                metric_thresholds=metric_thresholds,
+                repeat_interval=self.config.alert_repeat_interval,
+                quiet_hours=self.config.alert_quiet_hours,
+                rate_limit=self.config.alert_rate_limit
+            )
+        except ValueError as e:
+            logger.warning(f"Invalid alert settings, alerts disabled: {e}")
+            return None
+
+    def _create_rule_engine(self):
+        """编译配置中的清理规则，规则无效时输出错误并禁用规则"""
+        rules = self.config.rules
+        if not rules:
+            return None
+        try:
+            return RuleEngine(
+                rules,
+                metric_names=MemoryMonitor.EXTENDED_METRICS,
+                clean_modes=self.cleaner.modes
+            )
+        except RuleError as e:
+            logger.error(f"Invalid clean rules, all rules ignored: {e}")
+            return None
+
+    @timed("tray.create_icon")
     def create_icon(self, color="green", mem_info=None):
         """创建托盘图标
 
@@ -35,37 +178,12 @@ class MemoryTrayApp:
                      If None, will fetch from monitor.
         """
         try:
-            # 创建一个简单的内存条图标
-            width, height = 64, 64
-            image = Image.new('RGB', (width, height), color='white')
-            draw = ImageDraw.Draw(image)
-
-            # 绘制内存条
-            colors = {
-                "green": (0, 200, 0),
-                "yellow": (255, 200, 0),
-                "red": (255, 0, 0)
-            }
-            fill_color = colors.get(color, (0, 200, 0))
-
-            # 绘制外框
-            draw.rectangle([8, 16, 56, 48], outline=(100, 100, 100), width=2)
-
-            # 绘制内存填充
             if mem_info is None:
                 mem_info = self.monitor.get_memory_info()
-            fill_height = int(28 * mem_info["percent"] / 100)
-            if fill_height > 0:
-                draw.rectangle([10, 47 - fill_height, 54, 46], fill=fill_color)
-
-            return image
+            return render_memory_icon(color, mem_info["percent"])
         except Exception as e:
             # Return a basic icon on error
-            width, height = 64, 64
-            image = Image.new('RGB', (width, height), color='white')
-            draw = ImageDraw.Draw(image)
-            draw.rectangle([8, 16, 56, 48], outline=(100, 100, 100), width=2)
-            return image
+            return render_blank_icon()
 
     def get_icon_color(self, percent):
         """根据内存使用率返回图标颜色"""
@@ -76,51 +194,194 @@ class MemoryTrayApp:
         else:
             return "red"
 
-    def update_tooltip(self):
+    def update_tooltip(self, mem_info=None):
         """更新托盘图标的悬浮提示"""
-        mem_info = self.monitor.get_memory_info()
-        return f"内存: {mem_info['used']}/{mem_info['total']}GB ({mem_info['percent']}%)"
+        if mem_info is None:
+            mem_info = self.monitor.get_memory_info()
+        tooltip = f"内存: {mem_info['used']}/{mem_info['total']}GB ({mem_info['percent']}%)"
+        if mem_info.get("commit_percent") is not None:
+            tooltip += f"\n提交: {mem_info['commit_total']}/{mem_info['commit_limit']}GB ({mem_info['commit_percent']}%)"
+        return tooltip
 
     def on_clean(self, icon=None, item=None):
         """清理内存回调"""
-        result = self.cleaner.clean()
+        self._clean_now()
+
+    def _clean_now(self, mode=None, trigger="manual"):
+        """立即清理（手动或规则触发），并统计清理后的缺页"""
+        result = self._clean(mode, trigger)
+        if result["success"]:
+            self.deferred.track_clean("immediate")
+
+    def _clean(self, mode=None, trigger="manual"):
+        """执行一次清理并记录结果"""
+        if self.service_client is not None:
+            result = self._clean_via_service(mode, trigger)
+        else:
+            result = self.cleaner.clean(mode)
+        if self.fleet_agent is not None:
+            self.fleet_agent.record_clean(result)
+        if result["success"] and self.service_client is None:
+            entry_id = self.logger.add_clean_log(
+                before_percent=result["before"]["percent"],
+                after_percent=result["after"]["percent"],
+                freed_gb=result["freed"],
+                mode=result["mode"],
+                trigger=trigger,
+                duration_ms=result.get("duration_ms"),
+                processes=result.get("processes")
+            )
+            self.cost_tracker.begin(entry_id, result["freed"], result["mode"])
         if result["success"]:
-            self.logger.add_clean_log(
+            self.analytics.record_clean(
                 before_percent=result["before"]["percent"],
                 after_percent=result["after"]["percent"],
-                freed_gb=result["freed"]
+                freed_gb=result["freed"],
+                mode=result["mode"]
             )
-            print(f"清理成功: 释放 {result['freed']}GB")
+            logger.info(f"Clean succeeded ({trigger}): freed {result['freed']}GB")
         else:
-            print(f"清理失败: {result.get('error', '未知错误')}")
+            logger.warning(f"Clean failed ({trigger}): {result.get('error', 'unknown error')}")
         self.update_icon_state()
+        return result
+
+    def _clean_via_service(self, mode, trigger):
+        """请求后台服务清理；服务写清理日志，失败时返回与 MemoryCleaner.clean() 相同格式的结果"""
+        try:
+            return self.service_client.clean(mode, trigger)
+        except ServiceError as e:
+            return {"success": False, "freed": 0, "mode": mode, "error": f"后台服务: {e}"}
+
+    def _recent_records(self, limit):
+        """最近的清理记录；服务模式下从服务读取"""
+        if self.service_client is None:
+            return self.logger.get_recent_logs(limit=limit)
+        try:
+            return [CleanRecord.from_dict(r) for r in self.service_client.call("recent_logs", limit=limit)]
+        except (ServiceError, ValueError) as e:
+            logger.warning(f"Cannot read clean records from the service: {e}")
+            return []
 
     def on_quit(self, icon=None, item=None):
         """退出回调"""
         self.running = False
-        icon.stop()
+        self.scheduler.stop()
+        if self.psi_trigger is not None:
+            self.psi_trigger.close()
+        if self.fleet_agent is not None:
+            self.fleet_agent.close()
+        if self.service_client is not None:
+            self.service_client.close()
+        self.watchdog.stop()
+        self.analytics.close()
+        self.logger.close()
+        if metrics.profiling:
+            self.on_toggle_profiling()
+        metrics.dump(METRICS_FILE)
+        if icon is not None:
+            icon.stop()
+
+    def _on_sample(self, mem_info):
+        """定时采样回调：刷新图标并更新清理效果统计"""
+        self.update_icon_state(mem_info)
+        self.analytics.record_sample(mem_info["percent"])
+        # 服务模式下自动清理由服务自己执行
+        if self.config.auto_clean and self.service_client is None and self.monitor.should_auto_clean(
+                mem_info, self.config.auto_clean_trigger, self.config.auto_clean_threshold):
+            self.deferred.request(reason="auto_clean")
+        else:
+            # The spike cleared before the system went idle; a clean now would only cost page faults
+            self.deferred.cancel(reason="auto_clean")
+        if self.alerts is not None:
+            self.alerts.evaluate(mem_info)
+        if self.alert_relay is not None:
+            try:
+                self.alert_relay.poll()
+            except ServiceError as e:
+                logger.debug(f"Cannot read service alerts: {e}")
+        self.deferred.poll(mem_info)
+        self.cost_tracker.poll()
+        self.watchdog.maybe_check()
+        now = time.monotonic()
+        if metrics.enabled and now - self._last_metrics_dump >= METRICS_DUMP_INTERVAL:
+            self._last_metrics_dump = now
+            metrics.dump(METRICS_FILE)
+
+    def _apply_rules(self, mem_info):
+        """定时采样回调：评估清理规则并执行触发的动作"""
+        for action in self.rule_engine.evaluate(mem_info):
+            logger.info(f"Rule {action.rule} fired: {action.type}")
+            if action.type == "clean":
+                self._clean_now(action.params.get("mode"), trigger="rule")
+            elif action.type == "notify":
+                # Rule notifications share the alert rate limit and quiet hours
+                if self.alerts is not None:
+                    self.alerts.send(f"rule:{action.rule}", action.params["message"])
+                elif self.icon is not None:
+                    try:
+                        self.icon.notify(action.params["message"], title="内存清理工具")
+                    except Exception:
+                        logger.exception("Failed to show rule notification")
+
+    def on_toggle_profiling(self, icon=None, item=None):
+        """开始/停止性能分析，停止时写出 pstats 文件并输出最耗时的函数"""
+        if not metrics.profiling:
+            metrics.start_profiling()
+            logger.info("Profiling started; select the menu item again to stop")
+            return
+        path = os.path.join("logs", f"profile-{datetime.now():%Y%m%d-%H%M%S}.pstats")
+        stats = metrics.stop_profiling(path)
+        if stats is None:
+            logger.info("Profiling stopped: no hot-path calls were recorded")
+            return
+        logger.info(f"Profile saved to {path}\n{format_top_functions(stats)}")
 
-    def update_icon_state(self):
+    def update_icon_state(self, mem_info=None):
         """更新图标状态（颜色和提示）"""
         try:
-            mem_info = self.monitor.get_memory_info()
+            if mem_info is None:
+                mem_info = self.monitor.get_memory_info()
             color = self.get_icon_color(mem_info["percent"])
+            # 交换区/提交量等扩展指标超过各自阈值时同样显示红色
+            if "commit_percent" in mem_info and self.monitor.check_thresholds(mem_info):
+                color = "red"
             # Ensure icon exists before updating
             if self.icon is not None:
                 self.icon.icon = self.create_icon(color, mem_info=mem_info)
-                self.icon.title = self.update_tooltip()
-        except Exception as e:
-            # Silently handle update errors to avoid disrupting the tray app
-            pass
+                self.icon.title = self.update_tooltip(mem_info)
+        except Exception:
+            # Don't let update errors disrupt the tray app, but leave a trace for diagnosis
+            metrics.incr("errors.update_icon_state")
+            logger.exception("Failed to update tray icon")
+
+    def _install_signal_handlers(self):
+        """收到终止信号时先写出排队中的日志再退出"""
+        def handle_signal(signum, frame):
+            self.on_quit(self.icon)
+
+        for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                try:
+                    signal.signal(signum, handle_signal)
+                except (ValueError, OSError):
+                    # Not on the main thread or not supported by this platform
+                    pass
 
     def run(self):
         """启动托盘应用"""
         self.running = True
+        self._install_signal_handlers()
 
         # 创建菜单
         menu = pystray.Menu(
             pystray.MenuItem("显示内存状态", self.on_show_status),
             pystray.MenuItem("立即清理内存", self.on_clean),
+            pystray.MenuItem(
+                "性能分析",
+                self.on_toggle_profiling,
+                checked=lambda item: metrics.profiling
+            ),
             pystray.MenuItem("退出", self.on_quit)
         )
 
@@ -131,29 +392,68 @@ class MemoryTrayApp:
             "memory_cleaner",
             self.create_icon(initial_color, mem_info=mem_info),
             menu=menu,
-            title=self.update_tooltip()
+            title=self.update_tooltip(mem_info)
         )
 
-        # 启动图标
+        # 启动定时采样和图标
+        self.watchdog.start()
+        self.scheduler.start()
         self.icon.run()
 
     def on_show_status(self, icon=None, item=None):
         """显示内存状态（使用通知消息，避免与 tkinter 冲突）"""
-        mem_info = self.monitor.get_memory_info()
+        # Reuse the sampler's reading; a fresh snapshot here would reset its swap rate window
+        mem_info = self.scheduler.last_sample
+        if mem_info is None:
+            mem_info = self.monitor.get_extended_info(track=False)
 
-        # 同时在控制台输出详细信息
-        print(f"\n=== 内存状态 ===")
-        print(f"已用: {mem_info['used']} GB / {mem_info['total']} GB ({mem_info['percent']}%)")
-        print(f"可用: {mem_info['available']} GB")
-        print(f"\n最近清理记录:")
-        logs = self.logger.get_recent_logs(limit=5)
-        if not logs:
-            print("  暂无清理记录")
+        # 同时在日志中输出详细信息
+        lines = ["=== 内存状态 ===",
+                 f"已用: {mem_info['used']} GB / {mem_info['total']} GB ({mem_info['percent']}%)",
+                 f"可用: {mem_info['available']} GB"]
+        if mem_info["cached"] is not None:
+            lines.append(f"缓存: {mem_info['cached']} GB")
+        lines.append(f"交换区: {mem_info['swap_used']} GB / {mem_info['swap_total']} GB ({mem_info['swap_percent']}%)")
+        if mem_info["commit_percent"] is not None:
+            lines.append(f"提交: {mem_info['commit_total']} GB / {mem_info['commit_limit']} GB "
+                         f"({mem_info['commit_percent']}%)")
+        if mem_info["psi_some_avg10"] is not None:
+            lines.append(f"内存压力 (PSI avg10): some {mem_info['psi_some_avg10']}%, "
+                         f"full {mem_info['psi_full_avg10']}%")
+        over = self.monitor.check_thresholds(mem_info)
+        if over:
+            lines.append(f"超过阈值: {', '.join(over)}")
+        if self.alerts is not None:
+            lines.append(f"告警: 已发送 {self.alerts.sent} 条，免打扰拦截 {self.alerts.suppressed['quiet']} 次，"
+                         f"限流拦截 {self.alerts.suppressed['rate']} 次")
+        if self.alert_relay is not None:
+            lines.append(f"告警: 已显示后台服务的告警 {self.alert_relay.sent} 条")
+        if self.service_client is not None:
+            try:
+                health = self.service_client.health()
+                lines.append(f"后台服务: {'正常' if health['healthy'] else '异常'} (状态 {health['state']}, "
+                             f"已运行 {health['uptime']}s, 清理 {health['cleans']} 次)")
+            except ServiceError as e:
+                lines.append(f"后台服务不可用: {e}")
+        lines.append("最近清理记录:")
+        records = self._recent_records(LogManager.MAX_LOGS)
+        if not records:
+            lines.append("  暂无清理记录")
         else:
-            for log in logs[-5:]:
-                timestamp = log['timestamp'][:19]
-                print(f"  [{timestamp}] {log['before_percent']}% -> {log['after_percent']}%, 释放 {log['freed_gb']}GB")
-        print("=" * 40)
+            lines.extend(f"  {record.format_line()}" for record in records[-5:])
+            lines.append(f"  {format_records_summary(summarize_records(records))}")
+        if self.sampler is not None:
+            stats = self.sampler.stats()
+            lines.append(f"采样: {stats['samples']} 次 (固定间隔需 {stats['baseline_samples']} 次, "
+                         f"当前间隔 {stats['interval']}s)")
+        if self.watchdog.last_report is not None:
+            lines.append(format_report(self.watchdog.last_report))
+        if self.config.auto_clean:
+            lines.append(format_deferred_report(self.deferred.report()))
+        lines.append(format_cost_summary(self.cost_tracker.summary()))
+        lines.append("清理效果:")
+        lines.append(format_summary(self.analytics.summary()))
+        logger.info("\n".join(lines))
 
         # 尝试显示系统通知（如果 icon 可用）
         if icon is not None:
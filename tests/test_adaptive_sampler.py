@@ -0,0 +1,127 @@
+import pytest
+from types import SimpleNamespace
+from src.adaptive_sampler import AdaptiveSampler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _info(percent):
+    return {"total": 16.0, "used": 16.0 * percent / 100, "percent": percent, "available": 16.0 * (1 - percent / 100)}
+
+def _plugged(value):
+    return lambda: SimpleNamespace(power_plugged=value, percent=50)
+
+def _make(clock, battery=None, **kwargs):
+    return AdaptiveSampler(base_interval=5, min_interval=1, max_interval=60, warning_threshold=85,
+                           battery_source=battery or (lambda: None), clock=clock, **kwargs)
+
+def test_backs_off_when_stable():
+    """测试平稳时指数退避到上限"""
+    clock = FakeClock()
+    sampler = _make(clock)
+
+    intervals = []
+    for _ in range(8):
+        intervals.append(sampler.next_interval(_info(40.0)))
+        clock.now += intervals[-1]
+
+    assert intervals[:4] == [10, 20, 40, 60]
+    assert max(intervals) == 60
+
+def test_tightens_on_volatility():
+    """测试使用率快速变化时收紧间隔"""
+    clock = FakeClock()
+    sampler = _make(clock)
+
+    sampler.next_interval(_info(40.0))
+    clock.now += 10
+    assert sampler.next_interval(_info(40.5)) == 20
+    clock.now += 20
+    assert sampler.next_interval(_info(60.0)) == 1
+
+def test_noise_at_min_interval_backs_off():
+    """测试收紧到最短间隔后，正常的小幅抖动不会一直把间隔钉在最短值"""
+    clock = FakeClock()
+    sampler = _make(clock)
+
+    sampler.next_interval(_info(40.0))
+    clock.now += 10
+    assert sampler.next_interval(_info(60.0)) == 1  # real spike
+
+    intervals = []
+    for i in range(8):
+        clock.now += sampler.interval
+        intervals.append(sampler.next_interval(_info(60.0 + (0.5 if i % 2 else -0.5))))
+
+    assert intervals[:3] == [2, 4, 8]
+    assert intervals[-1] == 60
+
+def test_steady_climb_within_window_is_volatile():
+    """测试短间隔内累计变化达到阈值时仍视为波动"""
+    clock = FakeClock()
+    sampler = _make(clock)
+
+    results = []
+    for percent in (40.0, 40.7, 41.4, 42.1):
+        results.append(sampler.next_interval(_info(percent)))
+        clock.now += 1
+
+    # 0.7 and 1.4 points are below the 2-point threshold; 2.1 within the same 5 s window is not
+    assert results == [10, 20, 40, 1]
+
+def test_tightens_near_threshold():
+    """测试接近警告阈值时收紧间隔"""
+    clock = FakeClock()
+    sampler = _make(clock)
+
+    assert sampler.next_interval(_info(81.0)) == 1
+    clock.now += 1
+    assert sampler.next_interval(_info(81.0)) == 1
+
+def test_battery_backs_off_faster():
+    """测试电池供电时退避更快"""
+    clock = FakeClock()
+    sampler = _make(clock, battery=_plugged(False))
+
+    sampler.next_interval(_info(80.0))  # near threshold -> 1s
+    clock.now += 1
+    assert sampler.next_interval(_info(79.9)) == 10  # restarts from base_interval
+
+    on_mains = _make(FakeClock(), battery=_plugged(True))
+    on_mains.next_interval(_info(80.0))
+    on_mains._clock.now += 1
+    assert on_mains.next_interval(_info(79.9)) == 2
+
+def test_battery_errors_are_ignored():
+    """测试读取电池状态失败时按接入电源处理"""
+    def broken():
+        raise OSError("no battery sysfs")
+
+    sampler = _make(FakeClock(), battery=broken)
+    assert sampler.on_battery() is False
+
+def test_stats_against_fixed_baseline():
+    """测试与固定间隔相比的采样次数统计"""
+    clock = FakeClock()
+    sampler = _make(clock)
+
+    for _ in range(5):
+        clock.now += sampler.next_interval(_info(40.0))
+
+    stats = sampler.stats()
+    assert stats["samples"] == 5
+    # 10+20+40+60+60 = 190s -> 39 samples at a fixed 5 s rate
+    assert stats["baseline_samples"] == 39
+    assert stats["saved_ratio"] == round(1 - 5 / 39, 3)
+
+def test_invalid_bounds():
+    """测试无效的间隔上下限"""
+    with pytest.raises(ValueError, match="max_interval must be >= min_interval"):
+        AdaptiveSampler(base_interval=5, min_interval=10, max_interval=5)
+
+    with pytest.raises(ValueError, match="base_interval must be between"):
+        AdaptiveSampler(base_interval=100, min_interval=1, max_interval=60)
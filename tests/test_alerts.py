@@ -0,0 +1,179 @@
+import pytest
+from datetime import datetime
+from src.alerts import (AlertManager, CallbackNotifier, ServiceAlertRelay, TrayNotifier, WARNING, CRITICAL,
+                        parse_quiet_hours)
+
+NOON = datetime(2025, 1, 15, 12, 0)
+NIGHT = datetime(2025, 1, 15, 23, 0)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class RecordingNotifier:
+    def __init__(self):
+        self.alerts = []
+
+    def notify(self, alert):
+        self.alerts.append(alert)
+        return True
+
+def _manager(**kwargs):
+    clock = FakeClock()
+    notifier = RecordingNotifier()
+    kwargs.setdefault("rate_limit", 100)
+    manager = AlertManager([notifier], warning_threshold=85, critical_threshold=95, clock=clock, **kwargs)
+    return manager, notifier, clock
+
+def test_sustained_usage_alerts_once():
+    """测试持续超过阈值只通知一次，恢复后再次越过才重新通知"""
+    manager, notifier, clock = _manager(repeat_interval=0)
+
+    assert manager.evaluate({"percent": 80.0}, now=NOON) == []
+    alerts = manager.evaluate({"percent": 88.0}, now=NOON)
+    assert [(a.key, a.level) for a in alerts] == [("percent", WARNING)]
+    assert "88.0%" in alerts[0].message
+    for _ in range(100):
+        clock.now += 5
+        manager.evaluate({"percent": 90.0}, now=NOON)
+    assert len(notifier.alerts) == 1
+    assert manager.active() == {"percent": "warning"}
+
+    manager.evaluate({"percent": 82.0}, now=NOON)  # 回差范围内，仍算告警中
+    assert manager.active() == {"percent": "warning"}
+    manager.evaluate({"percent": 79.0}, now=NOON)
+    assert manager.active() == {}
+    manager.evaluate({"percent": 86.0}, now=NOON)
+    assert len(notifier.alerts) == 2
+
+def test_escalation_to_critical():
+    """测试从 warning 升到 critical 时立即通知，降级不通知"""
+    manager, notifier, clock = _manager()
+
+    manager.evaluate({"percent": 88.0}, now=NOON)
+    manager.evaluate({"percent": 96.0}, now=NOON)
+    manager.evaluate({"percent": 91.0}, now=NOON)  # 回差内仍为 critical
+    manager.evaluate({"percent": 89.0}, now=NOON)  # 降为 warning
+    manager.evaluate({"percent": 97.0}, now=NOON)  # 再次升级
+
+    assert [a.level for a in notifier.alerts] == [WARNING, CRITICAL, CRITICAL]
+
+def test_repeat_interval():
+    """测试未恢复时按 repeat_interval 再次提醒"""
+    manager, notifier, clock = _manager(repeat_interval=600)
+
+    manager.evaluate({"percent": 90.0}, now=NOON)
+    clock.now = 599
+    manager.evaluate({"percent": 90.0}, now=NOON)
+    clock.now = 600
+    manager.evaluate({"percent": 90.0}, now=NOON)
+
+    assert len(notifier.alerts) == 2
+
+def test_quiet_hours_hold_warnings_but_not_critical():
+    """测试免打扰时段只拦下 warning，结束后补发"""
+    manager, notifier, clock = _manager(quiet_hours=["22:00-08:00"])
+
+    assert manager.evaluate({"percent": 90.0}, now=NIGHT) == []
+    assert manager.suppressed["quiet"] == 1
+    assert [a.level for a in manager.evaluate({"percent": 96.0}, now=NIGHT)] == [CRITICAL]
+
+    manager, notifier, clock = _manager(quiet_hours=["22:00-08:00"])
+    manager.evaluate({"percent": 90.0}, now=NIGHT)
+    assert len(manager.evaluate({"percent": 90.0}, now=datetime(2025, 1, 16, 8, 0))) == 1
+
+def test_rate_limit():
+    """测试每个窗口内的发送上限，critical 不受限"""
+    manager, notifier, clock = _manager(rate_limit=2, rate_window=3600)
+
+    assert manager.send("rule:a", "a", now=NOON) == True
+    assert manager.send("rule:b", "b", now=NOON) == True
+    assert manager.send("rule:c", "c", now=NOON) == False
+    assert manager.suppressed["rate"] == 1
+    assert manager.send("rule:d", "d", level=CRITICAL, now=NOON) == True
+
+    clock.now = 3600
+    assert manager.send("rule:c", "c", now=NOON) == True
+    assert manager.sent == 4
+
+def test_extended_metrics_use_their_thresholds():
+    """测试扩展指标按各自阈值告警，平台不提供的指标被跳过"""
+    manager, notifier, clock = _manager(metric_thresholds={"swap_in_rate": 10, "psi_some_avg10": 10})
+
+    alerts = manager.evaluate({"percent": 50.0, "swap_in_rate": 12.5, "psi_some_avg10": None}, now=NOON)
+    assert [a.key for a in alerts] == ["swap_in_rate"]
+    assert "12.5MB/s" in alerts[0].message
+    manager.evaluate({"percent": 50.0, "swap_in_rate": 9.8}, now=NOON)   # 阈值的 5% 回差内
+    assert manager.active() == {"swap_in_rate": "warning"}
+    manager.evaluate({"percent": 50.0, "swap_in_rate": 9.0}, now=NOON)
+    assert manager.active() == {}
+
+def test_undelivered_alert_is_retried():
+    """测试通知器暂时不可用（托盘图标未创建）时之后补发"""
+    holder = {"icon": None}
+    notified = []
+
+    class Icon:
+        def notify(self, message, title):
+            notified.append(message)
+
+    manager = AlertManager([TrayNotifier(lambda: holder["icon"])], clock=FakeClock())
+    assert manager.evaluate({"percent": 90.0}, now=NOON) == []
+    holder["icon"] = Icon()
+    assert len(manager.evaluate({"percent": 90.0}, now=NOON)) == 1
+    assert len(notified) == 1
+
+def test_failing_notifier_does_not_break_others():
+    """测试一个通知器出错不影响其他通知器"""
+    def broken(alert):
+        raise RuntimeError("boom")
+
+    received = []
+    manager = AlertManager([CallbackNotifier(broken), CallbackNotifier(received.append)], clock=FakeClock())
+    manager.evaluate({"percent": 90.0}, now=NOON)
+
+    assert [a.to_dict()["level"] for a in received] == ["warning"]
+
+def test_validation():
+    """测试参数验证"""
+    with pytest.raises(ValueError, match="warning_threshold <= critical_threshold"):
+        AlertManager([], warning_threshold=90, critical_threshold=80)
+    with pytest.raises(ValueError, match="rate_limit and rate_window"):
+        AlertManager([], rate_limit=0)
+    with pytest.raises(ValueError, match=r"alert_quiet_hours\[0\]"):
+        parse_quiet_hours(["22-08"])
+    with pytest.raises(ValueError, match="must be a list"):
+        parse_quiet_hours("22:00-08:00")
+
+def test_service_alert_relay():
+    """测试按事件序号转发服务告警，跳过启动前的积压，服务重启后继续转发"""
+    queue = [{"seq": 1, "type": "alert", "data": {"key": "percent", "level": "warning", "message": "old"}}]
+    calls = []
+
+    def fetch(since):
+        # Same rule as the service: a position past the newest event means the service restarted
+        calls.append(since)
+        if since > queue[-1]["seq"]:
+            since = 0
+        return [event for event in queue if event["seq"] > since]
+
+    notifier = RecordingNotifier()
+    relay = ServiceAlertRelay(fetch, [notifier])
+    assert relay.poll() == []
+
+    queue.append({"seq": 2, "type": "clean", "data": {"success": True}})
+    queue.append({"seq": 3, "type": "alert", "data": {"key": "swap_percent", "level": "critical", "message": "swap",
+                                                     "value": 80.0, "threshold": 50}})
+    alerts = relay.poll()
+    assert [(a.key, a.level, a.value) for a in alerts] == [("swap_percent", CRITICAL, 80.0)]
+    assert notifier.alerts == alerts
+
+    # A restarted service numbers its events from 1 again
+    queue[:] = [{"seq": 1, "type": "alert", "data": {"key": "percent", "level": "warning", "message": "new"}}]
+    assert [a.message for a in relay.poll()] == ["new"]
+    assert calls == [0, 1, 3]
+    assert relay.sent == 2
+
@@ -0,0 +1,86 @@
+import pytest
+import psutil
+from benchmarks import run
+from benchmarks.pressure import MemoryPressure
+
+def test_run_suite_smoke():
+    """测试基准套件可以运行并输出统计"""
+    results = run.run_suite(name_filter="cleaner", iterations=3, warmup=1)
+
+    assert list(results) == ["cleaner.clean[fake]"]
+    stats = results["cleaner.clean[fake]"]
+    assert stats["iterations"] == 3
+    assert stats["min_us"] <= stats["p50_us"] <= stats["max_us"]
+
+def test_compare_flags_regressions(capsys):
+    """测试结果比较"""
+    baseline = {"a": {"p50_us": 10.0}, "b": {"p50_us": 10.0}}
+    current = {"a": {"p50_us": 11.0}, "b": {"p50_us": 30.0}, "c": {"skipped": "no PIL"}}
+
+    assert run.compare(baseline, current) == ["b"]
+
+def test_memory_pressure_allocates_in_child():
+    """测试压力进程确实占用了物理内存"""
+    with MemoryPressure(gb=0.05) as pressure:
+        rss = psutil.Process(pressure.pid).memory_info().rss
+        assert rss >= 0.05 * 1024 ** 3 * 0.9
+    assert pressure.pid is None
+
+def test_icon_render_case_misses_the_cache():
+    """测试 icon.render 每次都真正绘制，而不是只测到缓存命中"""
+    icon_renderer = pytest.importorskip("src.icon_renderer")
+    fn, cleanup = run.CASES["icon.render"](None)
+    try:
+        for _ in range(5):
+            fn()
+            info = icon_renderer._render_cached.cache_info()
+            assert (info.hits, info.misses) == (0, 1)
+    finally:
+        cleanup()
+
+def test_instrumentation_overhead_is_measured_directly():
+    """测试计时开销按每次调用直接测量，并折算为采样周期的占比"""
+    previous = run.metrics.enabled
+    overhead = run.measure_instrumentation_overhead(iterations=200, rounds=2)
+
+    assert run.metrics.enabled == previous
+    assert overhead["timed_calls_per_tick"] >= 1
+    assert overhead["tick_min_us"] > 0
+    assert overhead["enabled_ns"] >= 0 and overhead["disabled_ns"] >= 0
+    assert overhead["budget_percent"] == run.INSTRUMENTATION_BUDGET_PERCENT
+    assert overhead["within_budget"] == (overhead["enabled_percent"] <= overhead["budget_percent"])
+
+def test_pressure_scenario_drives_auto_clean():
+    """测试压力场景经过阈值判断触发一次自动清理，释放后读数回落"""
+    from src.memory_monitor import MemoryMonitor
+
+    GB = 1024 ** 3
+
+    class FakePressure:
+        held = False
+
+        def __enter__(self):
+            self.held = True
+            return self
+
+        def __exit__(self, *exc):
+            self.held = False
+
+    pressure = FakePressure()
+
+    def snapshot():
+        available = 4 * GB if pressure.held else 12 * GB
+        return {"total": 16 * GB, "available": available, "used": 16 * GB - available, "cached": None,
+                "swap_total": 0, "swap_used": 0, "swap_in_bytes": None, "swap_out_bytes": None,
+                "commit_total": None, "commit_limit": None, "time": 0.0}
+
+    report = run.run_pressure_scenario(8, interval=0.01, timeout=5,
+                                       monitor=MemoryMonitor(snapshot_source=snapshot), pressure=pressure)
+
+    assert report["threshold_percent"] == 50.0
+    assert report["triggered"] == True
+    assert report["trigger_percent"] == 75.0
+    assert report["auto_cleans"] == 1
+    assert report["recovered"] == True
+    assert report["recovered_percent"] == 25.0
+    assert report["trigger_seconds"] >= 0 and report["recovery_seconds"] >= 0
@@ -0,0 +1,160 @@
+import pytest
+import os
+from src.cgroup import Cgroup, detect_cgroup, limited_cgroup
+from src.clean_backends import CgroupReclaimBackend
+from src.memory_cleaner import MemoryCleaner
+from src.memory_monitor import MemoryMonitor
+
+MB = 1024 ** 2
+GB = 1024 ** 3
+
+MEMINFO = """MemTotal:       16777216 kB
+MemAvailable:    8388608 kB
+SwapTotal:       2097152 kB
+SwapFree:        2097152 kB
+"""
+
+V2_STAT = f"""anon {300 * MB}
+file {200 * MB}
+active_file {150 * MB}
+inactive_file {50 * MB}
+pgmajfault 12
+"""
+
+V1_STAT = f"""cache {200 * MB}
+rss {300 * MB}
+total_cache {200 * MB}
+total_inactive_file {100 * MB}
+"""
+
+PRESSURE = """some avg10=12.50 avg60=3.00 avg300=1.00 total=123456
+full avg10=4.25 avg60=1.00 avg300=0.50 total=6789
+"""
+
+def _write(directory, files):
+    os.makedirs(directory, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(content)
+
+def _fake_v2(tmp_path, limit=f"{1 * GB}", proc="0::/docker/abc\n", reclaim=True):
+    """伪造 cgroup v2 文件系统：root/docker/abc"""
+    root = os.path.join(tmp_path, "cgroup")
+    group = os.path.join(root, "docker", "abc")
+    files = {
+        "memory.current": f"{550 * MB}\n",
+        "memory.max": f"{limit}\n",
+        "memory.stat": V2_STAT,
+        "memory.swap.current": f"{10 * MB}\n",
+        "memory.swap.max": "max\n",
+        "memory.pressure": PRESSURE
+    }
+    if reclaim:
+        files["memory.reclaim"] = ""
+    _write(group, files)
+    _write(tmp_path, {"cgroup_proc": proc, "meminfo": MEMINFO})
+    return dict(proc_cgroup=os.path.join(tmp_path, "cgroup_proc"), mount_root=root,
+                meminfo_path=os.path.join(tmp_path, "meminfo"))
+
+def _fake_v1(tmp_path):
+    """伪造 cgroup v1 文件系统，容器内只挂载了自己的子树"""
+    root = os.path.join(tmp_path, "cgroup")
+    _write(os.path.join(root, "memory"), {
+        "memory.usage_in_bytes": f"{600 * MB}\n",
+        "memory.limit_in_bytes": f"{2 * GB}\n",
+        "memory.stat": V1_STAT,
+        "memory.memsw.usage_in_bytes": f"{650 * MB}\n",
+        "memory.memsw.limit_in_bytes": f"{3 * GB}\n"
+    })
+    _write(tmp_path, {"cgroup_proc": "4:memory:/kubepods/pod1/c1\n0::/\n", "meminfo": MEMINFO})
+    return dict(proc_cgroup=os.path.join(tmp_path, "cgroup_proc"), mount_root=root,
+                meminfo_path=os.path.join(tmp_path, "meminfo"))
+
+def test_detect_v2_and_collect(tmp_path):
+    """测试检测 cgroup v2 并按容器上限生成快照"""
+    cgroup = detect_cgroup(**_fake_v2(tmp_path))
+
+    assert cgroup.version == 2
+    assert cgroup.path.endswith(os.path.join("docker", "abc"))
+    assert cgroup.limit == 1 * GB
+
+    raw = cgroup.collect()
+    assert raw["total"] == 1 * GB
+    assert raw["used"] == 500 * MB          # 550MB - inactive_file 50MB
+    assert raw["available"] == 1 * GB - 500 * MB
+    assert raw["cached"] == 200 * MB
+    assert raw["swap_used"] == 10 * MB
+    assert raw["swap_total"] == 2 * GB      # 没有单独的交换区上限，使用宿主机的
+    assert raw["commit_total"] is None
+    assert raw["psi"]["some"]["avg10"] == 12.5
+    assert raw["psi"]["full"]["total"] == 6789
+
+def test_detect_v1_with_namespaced_mount(tmp_path):
+    """测试 v1 路径在容器内不存在时回退到挂载根目录"""
+    cgroup = detect_cgroup(**_fake_v1(tmp_path))
+
+    assert cgroup.version == 1
+    raw = cgroup.collect()
+    assert raw["total"] == 2 * GB
+    assert raw["used"] == 500 * MB          # 600MB - total_inactive_file 100MB
+    assert raw["swap_used"] == 50 * MB
+    assert raw["swap_total"] == 1 * GB
+    assert raw["psi"] is None
+    assert cgroup.supports_reclaim == False
+
+def test_unlimited_cgroup_is_not_scoped(tmp_path):
+    """测试没有内存上限时不限定监控范围，快照使用宿主机总量"""
+    paths = _fake_v2(tmp_path, limit="max")
+
+    assert limited_cgroup(**paths) is None
+    cgroup = detect_cgroup(**paths)
+    assert cgroup.limit is None
+    assert cgroup.collect()["total"] == 16 * GB
+
+def test_no_cgroup(tmp_path):
+    """测试找不到 cgroup 文件时返回 None"""
+    assert detect_cgroup(proc_cgroup=os.path.join(tmp_path, "missing")) is None
+    paths = _fake_v2(tmp_path, proc="0::/other\n")
+    os.remove(os.path.join(paths["mount_root"], "docker", "abc", "memory.current"))
+    assert detect_cgroup(**paths) is None
+
+def test_monitor_scoped_to_cgroup(tmp_path):
+    """测试监控器按容器上限计算使用率"""
+    monitor = MemoryMonitor(cgroup=limited_cgroup(**_fake_v2(tmp_path)))
+
+    assert monitor.scope == "cgroup"
+    info = monitor.get_memory_info()
+    assert info["total"] == 1.0
+    assert info["percent"] == pytest.approx(48.8, abs=0.1)
+    extended = monitor.get_extended_info()
+    assert extended["percent"] == info["percent"]
+    assert extended["psi_some_avg10"] == 12.5
+    assert extended["psi_full_avg10"] == 4.25
+
+def test_reclaim_backend(tmp_path):
+    """测试 memory.reclaim 后端写入回收量"""
+    cgroup = detect_cgroup(**_fake_v2(tmp_path))
+    backend = CgroupReclaimBackend(cgroup)
+    cleaner = MemoryCleaner(monitor=MemoryMonitor(cgroup=cgroup), backend=backend)
+
+    result = cleaner.clean()
+
+    assert result["success"] == True
+    assert result["mode"] == "cgroup_reclaim"
+    with open(os.path.join(cgroup.path, "memory.reclaim")) as f:
+        assert f.read() == f"{50 * MB}\n"  # 默认只回收不活跃页缓存，不波及匿名内存
+
+def test_unparsable_interface_files(tmp_path):
+    """测试接口文件内容异常时按缺失处理，不抛出 ValueError"""
+    cgroup = detect_cgroup(**_fake_v2(tmp_path))
+    _write(cgroup.path, {"memory.current": "garbage\n", "memory.stat": f"anon oops\ninactive_file {MB}\n"})
+
+    assert cgroup._read_int("memory.current") is None
+    assert cgroup.read_stat() == {"inactive_file": MB}
+    assert cgroup.collect()["used"] == 0
+
+def test_reclaim_backend_requires_support(tmp_path):
+    """测试不提供 memory.reclaim 时拒绝创建后端"""
+    cgroup = detect_cgroup(**_fake_v2(tmp_path, reclaim=False))
+    with pytest.raises(ValueError, match="does not provide memory.reclaim"):
+        CgroupReclaimBackend(cgroup)
@@ -0,0 +1,128 @@
+import pytest
+import os
+from datetime import datetime
+from src.clean_analytics import CleanAnalytics, format_summary
+
+def _ts(hour, minute=0, second=0):
+    return datetime(2025, 1, 15, hour, minute, second).timestamp()
+
+def test_freed_distribution(tmp_path):
+    """测试释放量分布统计"""
+    analytics = CleanAnalytics(os.path.join(tmp_path, "analytics.json"))
+
+    analytics.record_clean(85, 70, 0.05, timestamp=_ts(10))
+    analytics.record_clean(85, 70, 1.5, timestamp=_ts(10))
+    analytics.record_clean(85, 70, 10, timestamp=_ts(10))
+
+    overall = analytics.summary()["overall"]
+    assert overall["cleans"] == 3
+    assert overall["freed_hist"][0] == 1   # <= 0.1GB
+    assert overall["freed_hist"][4] == 1   # 1-2GB
+    assert overall["freed_hist"][-1] == 1  # > 4GB
+    assert overall["mean_freed_gb"] == round((0.05 + 1.5 + 10) / 3, 2)
+
+def test_time_to_regrow(tmp_path):
+    """测试回涨时间与无效清理判定"""
+    analytics = CleanAnalytics(os.path.join(tmp_path, "analytics.json"), wasted_seconds=120)
+
+    start = _ts(9)
+    analytics.record_clean(85, 60, 2.0, timestamp=start)
+    analytics.record_sample(70, timestamp=start + 30)
+    assert analytics.tracking == 1
+
+    # 回到 清理前 - 容差 即视为回涨
+    analytics.record_sample(84.5, timestamp=start + 90)
+    assert analytics.tracking == 0
+
+    overall = analytics.summary()["overall"]
+    assert overall["regrown"] == 1
+    assert overall["wasted"] == 1
+    assert overall["mean_regrow_seconds"] == 90
+    assert overall["median_regrow_seconds"] == 120
+    assert overall["effective_rate"] == 0
+
+def test_held_within_window(tmp_path):
+    """测试跟踪窗口内未回涨的清理记为保持"""
+    analytics = CleanAnalytics(os.path.join(tmp_path, "analytics.json"), regrow_window=600)
+
+    start = _ts(14)
+    analytics.record_clean(90, 60, 3.0, timestamp=start)
+    analytics.record_sample(65, timestamp=start + 601)
+
+    overall = analytics.summary()["overall"]
+    assert analytics.tracking == 0
+    assert overall["held"] == 1
+    assert overall["regrown"] == 0
+    assert overall["effective_rate"] == 1
+
+def test_by_mode_and_hour(tmp_path):
+    """测试按模式和时段划分的统计"""
+    analytics = CleanAnalytics(os.path.join(tmp_path, "analytics.json"))
+
+    analytics.record_clean(85, 70, 1.0, mode="working_set", timestamp=_ts(9))
+    analytics.record_clean(85, 70, 2.0, mode="standby_list", timestamp=_ts(21))
+
+    summary = analytics.summary()
+    assert summary["modes"]["working_set"]["cleans"] == 1
+    assert summary["modes"]["standby_list"]["freed_total_gb"] == 2.0
+    assert summary["hours"][9]["cleans"] == 1
+    assert summary["hours"][21]["cleans"] == 1
+    assert "standby_list" in format_summary(summary)
+
+def test_state_persists(tmp_path):
+    """测试聚合结果持久化"""
+    state_file = os.path.join(tmp_path, "analytics.json")
+    analytics = CleanAnalytics(state_file)
+    analytics.record_clean(85, 70, 1.0, timestamp=_ts(9))
+    analytics.close()
+
+    reloaded = CleanAnalytics(state_file)
+    assert reloaded.summary()["overall"]["cleans"] == 1
+
+def test_state_written_at_most_once_per_interval(tmp_path, monkeypatch):
+    """测试清理和采样路径上不同步写文件，间隔到达或 close() 时才写出"""
+    class FakeClock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    clock = FakeClock()
+    state_file = os.path.join(tmp_path, "analytics.json")
+    analytics = CleanAnalytics(state_file, save_interval=60, clock=clock)
+    writes = []
+    save = analytics._save_state
+    monkeypatch.setattr(analytics, "_save_state", lambda: (writes.append(clock.now), save()))
+
+    analytics.record_clean(85, 70, 1.0, timestamp=_ts(9))
+    analytics.record_sample(86, timestamp=_ts(9, 1))
+    assert writes == []
+    assert not os.path.exists(state_file)
+
+    clock.now = 60
+    analytics.record_sample(50, timestamp=_ts(9, 2))  # 没有跟踪中的清理，仍写出之前的改动
+    assert writes == [60]
+    analytics.record_clean(85, 70, 1.0, timestamp=_ts(10))
+    assert writes == [60]
+
+    analytics.close()
+    assert CleanAnalytics(state_file).summary()["overall"]["cleans"] == 2
+
+def test_validation():
+    """测试参数验证"""
+    with pytest.raises(ValueError, match="regrow_window must be positive"):
+        CleanAnalytics(None, regrow_window=0)
+    with pytest.raises(ValueError, match="wasted_seconds must be positive"):
+        CleanAnalytics(None, wasted_seconds=0)
+    with pytest.raises(ValueError, match="save_interval must be non-negative"):
+        CleanAnalytics(None, save_interval=-1)
+
+def test_corrupt_state_file(tmp_path, caplog):
+    """测试损坏的统计文件"""
+    state_file = os.path.join(tmp_path, "analytics.json")
+    with open(state_file, 'w', encoding='utf-8') as f:
+        f.write("{not json")
+
+    analytics = CleanAnalytics(state_file)
+    assert analytics.summary()["overall"]["cleans"] == 0
+    assert any("Failed to decode JSON" in record.message for record in caplog.records)
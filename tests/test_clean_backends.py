@@ -0,0 +1,56 @@
+import pytest
+import os
+from src.clean_backends import FakeBackend, LinuxDropCachesBackend
+from src.memory_cleaner import MemoryCleaner
+from src.memory_monitor import MemoryMonitor
+
+def test_clean_with_fake_backend():
+    """测试使用 fake 后端清理"""
+    backend = FakeBackend()
+    cleaner = MemoryCleaner(monitor=MemoryMonitor(), backend=backend)
+
+    result = cleaner.clean()
+
+    assert result["success"] == True
+    assert result["mode"] == "working_set"
+    assert result["freed"] >= 0
+    assert result["duration_ms"] >= 0
+    assert "processes" not in result  # 整个系统范围的清理
+    assert backend.calls == ["working_set"]
+
+def test_clean_backend_error():
+    """测试后端抛出异常时返回失败结果"""
+    backend = FakeBackend(error=OSError("access denied"))
+    cleaner = MemoryCleaner(monitor=MemoryMonitor(), backend=backend)
+
+    result = cleaner.clean()
+
+    assert result["success"] == False
+    assert result["freed"] == 0
+    assert "access denied" in result["error"]
+
+def test_unsupported_mode():
+    """测试后端不支持的清理模式"""
+    cleaner = MemoryCleaner(monitor=MemoryMonitor(), backend=FakeBackend(modes=("working_set",)))
+
+    with pytest.raises(ValueError, match="not supported"):
+        cleaner.clean(mode="standby_list")
+
+def test_explicit_mode():
+    """测试指定清理模式"""
+    backend = FakeBackend(modes=("working_set", "standby_list"))
+    cleaner = MemoryCleaner(monitor=MemoryMonitor(), backend=backend)
+
+    assert cleaner.modes == ("working_set", "standby_list")
+    assert cleaner.clean(mode="standby_list")["mode"] == "standby_list"
+    assert backend.calls == ["standby_list"]
+
+def test_linux_drop_caches_backend(tmp_path):
+    """测试 drop_caches 后端写入控制文件"""
+    control = os.path.join(tmp_path, "drop_caches")
+    backend = LinuxDropCachesBackend(drop_caches_path=control)
+
+    backend.clean("page_cache")
+
+    with open(control) as f:
+        assert f.read() == "1\n"
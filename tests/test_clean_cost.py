@@ -0,0 +1,172 @@
+import pytest
+import threading
+from src.clean_cost import CleanCostTracker, FaultWindows, format_cost_summary, PAGE_SIZE
+from src.deferred_clean import DeferredCleaner
+from src.idle_detector import FakeIdleDetector
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeCounters:
+    def __init__(self, swap_in=True):
+        self.page_faults = 0
+        self.swap_in_bytes = 0 if swap_in else None
+
+    def __call__(self):
+        return {"page_faults": self.page_faults, "swap_in_bytes": self.swap_in_bytes}
+
+def _tracker(**kwargs):
+    clock = FakeClock()
+    counters = FakeCounters(**kwargs)
+    annotated = {}
+    tracker = CleanCostTracker(window=60, on_complete=lambda i, f: annotated.update({i: f}),
+                               counter_source=counters, clock=clock)
+    return tracker, clock, counters, annotated
+
+def test_cost_compares_before_and_after():
+    """测试清理后缺页和换入超出清理前的部分计入代价"""
+    tracker, clock, counters, annotated = _tracker()
+
+    tracker.poll()                       # t=0 基线
+    clock.now = 60
+    counters.page_faults = 600           # 清理前 10 次/秒
+    tracker.begin("a", freed_gb=1.0, mode="working_set")
+
+    clock.now = 90
+    counters.page_faults = 2100
+    assert tracker.poll() == []          # 窗口未满
+    clock.now = 120
+    counters.page_faults = 3600          # 清理后 50 次/秒
+    counters.swap_in_bytes = 60 * 1024 ** 2
+    completed = tracker.poll()
+
+    cost = completed[0][1]
+    assert completed[0][0] == "a"
+    assert cost["faults_per_s_before"] == 10
+    assert cost["faults_per_s_after"] == 50
+    assert cost["extra_faults"] == 2400
+    assert cost["swap_in_mb_per_s_after"] == 1.0
+    expected = 1024 - 2400 * PAGE_SIZE / 1024 ** 2 - 60
+    assert cost["net_benefit_mb"] == round(expected, 1)
+    assert annotated["a"] == {"cost": cost}
+    assert tracker.measuring == 0
+
+def test_cost_without_history_uses_zero_baseline():
+    """测试没有清理前样本时以 0 为基线"""
+    tracker, clock, counters, _ = _tracker(swap_in=False)
+    tracker.begin("a", freed_gb=0.5)
+    clock.now = 60
+    counters.page_faults = 60
+    cost = tracker.poll()[0][1]
+
+    assert cost["faults_per_s_before"] is None
+    assert cost["swap_in_mb_per_s_after"] is None
+    assert cost["extra_faults"] == 60
+    assert cost["net_benefit_mb"] == round(512 - 60 * PAGE_SIZE / 1024 ** 2, 1)
+
+def test_poll_throttles_counter_reads():
+    """测试没有到期的测量时每半个窗口才读取一次计数器"""
+    reads = []
+    clock = FakeClock()
+    tracker = CleanCostTracker(window=60, counter_source=lambda: reads.append(1) or
+                               {"page_faults": 0, "swap_in_bytes": 0}, clock=clock)
+    for t in range(0, 60, 5):
+        clock.now = t
+        tracker.poll()
+    assert len(reads) == 2  # t=0 和 t=30
+
+def test_summary_by_mode():
+    """测试按模式汇总平均净收益"""
+    tracker, clock, counters, _ = _tracker()
+    tracker.begin("a", freed_gb=1.0, mode="working_set")
+    tracker.begin("b", freed_gb=2.0, mode="standby_list")
+    clock.now = 60
+    tracker.poll()
+
+    summary = tracker.summary()
+    assert summary["working_set"] == {"count": 1, "mean_net_benefit_mb": 1024.0}
+    assert summary["standby_list"]["mean_net_benefit_mb"] == 2048.0
+    assert "standby_list: +2048.0 MB (1 次)" in format_cost_summary(summary)
+
+def test_windows_shared_with_deferred_cleaner():
+    """测试清理代价和延迟清理共用一组窗口，同一次清理只读取一次计数器"""
+    clock = FakeClock()
+    counters = FakeCounters()
+    reads = []
+
+    def source():
+        reads.append(clock.now)
+        return counters()
+
+    windows = FaultWindows(window=60, counter_source=source, clock=clock)
+    tracker = CleanCostTracker(fault_windows=windows)
+    deferred = DeferredCleaner(lambda mode: {"success": True}, FakeIdleDetector(), fault_windows=windows, clock=clock)
+
+    tracker.begin("a", freed_gb=1.0)
+    deferred.track_clean("immediate")
+    assert reads == [0]
+    assert windows.measuring == 2
+
+    clock.now = 60
+    counters.page_faults = 600
+    deferred.poll({"percent": 50})      # closes both windows
+    assert tracker.poll()[0][0] == "a"
+    assert reads == [0, 60]
+    assert deferred.report()["busy_faults_mean"] == 600
+    assert tracker.measuring == 0
+
+def test_counter_going_backwards_counts_as_zero():
+    """测试计数器回退（32 位计数器回绕等）时速率按 0 计，不出现负数"""
+    clock = FakeClock()
+    counters = FakeCounters()
+    counters.page_faults = 1000
+    counters.swap_in_bytes = 4096
+    windows = FaultWindows(window=60, counter_source=counters, clock=clock)
+    closed = []
+    windows.open(lambda before, after: closed.append(after))
+
+    clock.now = 60
+    counters.page_faults = 10
+    counters.swap_in_bytes = 0
+    windows.poll()
+    assert closed == [{"page_faults": 0.0, "swap_in_bytes": 0.0}]
+
+def test_begin_and_poll_on_different_threads():
+    """测试清理线程 begin() 与采样线程 poll() 并发时不出错"""
+    clock = FakeClock()
+    tracker = CleanCostTracker(window=1, counter_source=FakeCounters(), history_size=8, clock=clock)
+    errors = []
+
+    def cleans():
+        try:
+            for i in range(2000):
+                tracker.begin(i, freed_gb=0.1)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=cleans)
+    thread.start()
+    completed = 0
+    while thread.is_alive() or tracker.measuring:
+        clock.now += 1
+        completed += len(tracker.poll())
+    thread.join()
+
+    assert errors == []
+    assert completed == 2000
+
+def test_unavailable_counters():
+    """测试计数器不可用时不测量"""
+    tracker = CleanCostTracker(counter_source=lambda: None, clock=FakeClock())
+    tracker.begin("a", freed_gb=1.0)
+    assert tracker.measuring == 0
+    assert tracker.poll() == []
+
+def test_invalid_window():
+    """测试无效窗口"""
+    with pytest.raises(ValueError, match="window must be positive"):
+        CleanCostTracker(window=0)
@@ -0,0 +1,66 @@
+import pytest
+from datetime import datetime
+from src.clean_record import (CleanRecord, decode_log, encode_log, summarize_records,
+                              format_records_summary, SCHEMA_VERSION)
+
+def _record(**kwargs):
+    fields = {"id": "a", "timestamp": "2025-01-15T14:00:00.500000", "before_percent": 85.0,
+              "after_percent": 70.0, "freed_gb": 1.2}
+    fields.update(kwargs)
+    return CleanRecord(**fields)
+
+def test_round_trip_keeps_unknown_fields():
+    """测试转换为字典再读回不丢失字段，包括未知字段"""
+    record = CleanRecord.from_dict({
+        "id": "a", "timestamp": "2025-01-15T14:00:00", "before_percent": 85.0, "after_percent": 70.0,
+        "freed_gb": 1.2, "trigger": "rule", "processes": ["a.exe"], "future_field": 1
+    })
+
+    assert record.processes == ("a.exe",)
+    assert record.extra == {"future_field": 1}
+    assert CleanRecord.from_dict(record.to_dict()) == record
+    assert "mode" not in record.to_dict()
+
+def test_legacy_freed_key():
+    """测试旧的 freed 字段名也能读取"""
+    record = CleanRecord.from_dict({"timestamp": "2025-01-15T14:00:00", "before_percent": 85,
+                                    "after_percent": 70, "freed": 0.5})
+    assert record.freed_gb == 0.5
+    assert "freed" not in record.to_dict()
+
+def test_invalid_records_are_skipped():
+    """测试无效记录被跳过，无法识别的文件结构抛出 ValueError"""
+    records, version = decode_log([{"timestamp": "x"}, 3, _record().to_dict()])
+    assert version == 1
+    assert len(records) == 1
+
+    assert decode_log(encode_log(records)) == (records, SCHEMA_VERSION)
+
+    with pytest.raises(ValueError, match="must be a list"):
+        decode_log({"entries": []})
+
+def test_format_line_and_time():
+    """测试摘要行包含触发方式、模式、耗时和净收益，时间只解析一次"""
+    record = _record(mode="working_set", trigger="manual", duration_ms=15.2)
+    record.update({"cost": {"net_benefit_mb": 256.0}})
+
+    assert record.format_line() == ("[2025-01-15T14:00:00] 85.0% -> 70.0%, 释放 1.2GB "
+                                    "(手动, working_set, 15ms), 净收益 +256.0 MB")
+    assert record.time == datetime(2025, 1, 15, 14, 0, 0, 500000)
+    assert record.time is record.time
+    assert _record().format_line() == "[2025-01-15T14:00:00] 85.0% -> 70.0%, 释放 1.2GB"
+
+def test_summary_by_trigger():
+    """测试按触发方式汇总"""
+    summary = summarize_records([
+        _record(trigger="auto", freed_gb=1.0, duration_ms=10.0),
+        _record(trigger="auto", freed_gb=2.0),
+        _record(freed_gb=0.5),
+    ])
+
+    assert summary == {
+        "auto": {"count": 2, "mean_freed_gb": 1.5, "mean_duration_ms": 10.0},
+        "unknown": {"count": 1, "mean_freed_gb": 0.5, "mean_duration_ms": None}
+    }
+    assert format_records_summary(summary).startswith("按触发方式: 自动 2 次")
+    assert format_records_summary({}) == "按触发方式: 暂无数据"
@@ -147,3 +147,199 @@ def test_save_error_handling(tmp_path):
 
     # Restore original path
     manager.config_path = original_path
+
+def test_log_write_settings_validation(tmp_path):
+    """测试日志落盘配置验证"""
+    temp_config = os.path.join(tmp_path, "test_config.json")
+    manager = ConfigManager(temp_config)
+
+    assert manager.log_durability == "flush"
+    assert manager.log_flush_interval == 2
+    assert manager.log_max_pending == 20
+
+    manager.log_durability = "fsync"
+    assert manager.log_durability == "fsync"
+
+    with pytest.raises(ValueError, match="log_durability must be one of"):
+        manager.log_durability = "sometimes"
+
+    with pytest.raises(ValueError, match="must be a positive number"):
+        manager.log_flush_interval = 0
+
+    with pytest.raises(TypeError, match="must be an integer"):
+        manager.log_max_pending = 1.5
+
+    with pytest.raises(ValueError, match="must be a positive integer"):
+        manager.log_max_pending = 0
+
+def test_sampling_settings_validation(tmp_path):
+    """测试自适应采样配置验证"""
+    temp_config = os.path.join(tmp_path, "test_config.json")
+    manager = ConfigManager(temp_config)
+
+    assert manager.adaptive_sampling == True
+    assert manager.sampling_min_interval == 1
+    assert manager.sampling_max_interval == 60
+
+    with pytest.raises(TypeError, match="must be a boolean"):
+        manager.adaptive_sampling = "yes"
+
+    with pytest.raises(ValueError, match="must be a positive number"):
+        manager.sampling_min_interval = 0
+
+    manager.sampling_min_interval = 2
+    with pytest.raises(ValueError, match="sampling_max_interval must be >= sampling_min_interval"):
+        manager.sampling_max_interval = 1
+
+def test_metric_threshold_settings_validation(tmp_path):
+    """测试扩展指标阈值配置验证"""
+    temp_config = os.path.join(tmp_path, "test_config.json")
+    manager = ConfigManager(temp_config)
+
+    assert manager.swap_warning_threshold == 50
+    assert manager.commit_warning_threshold == 90
+    assert manager.swap_in_rate_threshold == 10
+
+    with pytest.raises(ValueError, match="must be between 0 and 100"):
+        manager.commit_warning_threshold = 101
+
+    with pytest.raises(TypeError, match="must be a number"):
+        manager.swap_warning_threshold = "50"
+
+    with pytest.raises(ValueError, match="must be non-negative"):
+        manager.swap_in_rate_threshold = -1
+
+def test_self_watchdog_settings_validation(tmp_path):
+    """测试自身内存看门狗配置验证"""
+    temp_config = os.path.join(tmp_path, "test_config.json")
+    manager = ConfigManager(temp_config)
+
+    assert manager.self_rss_budget_mb == 150
+    assert manager.self_watchdog_interval == 600
+    assert manager.self_tracemalloc == False
+
+    with pytest.raises(ValueError, match="must be a positive number"):
+        manager.self_rss_budget_mb = 0
+
+    with pytest.raises(TypeError, match="must be a number"):
+        manager.self_watchdog_interval = "10"
+
+    with pytest.raises(TypeError, match="must be a boolean"):
+        manager.self_tracemalloc = 1
+
+def test_idle_clean_settings_validation(tmp_path):
+    """测试空闲清理配置验证"""
+    temp_config = os.path.join(tmp_path, "test_config.json")
+    manager = ConfigManager(temp_config)
+
+    assert manager.idle_clean == True
+    assert manager.idle_seconds == 120
+    assert manager.idle_max_defer == 1800
+    assert manager.critical_threshold == 95
+
+    manager.idle_max_defer = 0
+    assert manager.idle_max_defer == 0
+
+    assert manager.clean_min_interval == 300
+    manager.clean_min_interval = 0
+    assert manager.clean_min_interval == 0
+    with pytest.raises(ValueError, match="clean_min_interval must be non-negative"):
+        manager.clean_min_interval = -1
+
+    with pytest.raises(ValueError, match="must be a positive number"):
+        manager.idle_seconds = 0
+
+    with pytest.raises(ValueError, match="must be between 0 and 100"):
+        manager.critical_threshold = 120
+
+    with pytest.raises(TypeError, match="must be a boolean"):
+        manager.idle_clean = "yes"
+
+def test_clean_cost_window_validation(tmp_path):
+    """测试清理代价统计窗口配置验证"""
+    manager = ConfigManager(os.path.join(tmp_path, "test_config.json"))
+    assert manager.clean_cost_window == 60
+
+    with pytest.raises(ValueError, match="must be a positive number"):
+        manager.clean_cost_window = 0
+
+def test_pressure_settings_validation(tmp_path):
+    """测试 PSI 压力相关配置验证"""
+    manager = ConfigManager(os.path.join(tmp_path, "test_config.json"))
+
+    assert manager.auto_clean_trigger == "percent"
+    assert manager.psi_some_threshold == 10
+    assert manager.psi_full_threshold == 5
+    assert manager.psi_trigger == True
+
+    manager.auto_clean_trigger = "pressure"
+    assert manager.auto_clean_trigger == "pressure"
+
+    with pytest.raises(ValueError, match="auto_clean_trigger must be one of"):
+        manager.auto_clean_trigger = "load"
+
+    with pytest.raises(ValueError, match="must be between 0 and 100"):
+        manager.psi_full_threshold = 0
+
+    with pytest.raises(TypeError, match="must be a boolean"):
+        manager.psi_trigger = 1
+
+def test_fleet_url_validation(tmp_path):
+    """测试汇总服务地址配置验证"""
+    manager = ConfigManager(os.path.join(tmp_path, "test_config.json"))
+    assert manager.fleet_url == ""
+
+    manager.fleet_url = "http://10.0.0.5:8765"
+    assert manager.fleet_url == "http://10.0.0.5:8765"
+    manager.fleet_url = ""
+
+    with pytest.raises(ValueError, match="must start with http"):
+        manager.fleet_url = "10.0.0.5:8765"
+
+    with pytest.raises(TypeError, match="must be a string"):
+        manager.fleet_url = None
+
+    assert manager.fleet_token == ""
+    manager.fleet_token = "s3cret"
+    assert manager.fleet_token == "s3cret"
+    with pytest.raises(TypeError, match="must be a string"):
+        manager.fleet_token = None
+
+def test_alert_settings_validation(tmp_path):
+    """测试告警配置验证"""
+    manager = ConfigManager(os.path.join(tmp_path, "test_config.json"))
+    assert manager.alerts_enabled == True
+    assert manager.alert_quiet_hours == []
+    assert manager.alert_rate_limit == 3
+    assert manager.alert_repeat_interval == 1800
+
+    manager.alert_quiet_hours = ["22:00-08:00"]
+    assert manager.alert_quiet_hours == ["22:00-08:00"]
+
+    with pytest.raises(ValueError, match=r"alert_quiet_hours\[1\]"):
+        manager.alert_quiet_hours = ["22:00-08:00", "noon"]
+
+    with pytest.raises(ValueError, match="must be a positive integer"):
+        manager.alert_rate_limit = 0
+
+    with pytest.raises(TypeError, match="must be a boolean"):
+        manager.alerts_enabled = "yes"
+
+def test_service_settings_validation(tmp_path):
+    """测试后台服务配置验证"""
+    manager = ConfigManager(os.path.join(tmp_path, "test_config.json"))
+    assert manager.use_service == False
+    assert manager.service_address == ""
+    assert manager.service_group == ""
+
+    manager.service_group = "memcleaner"
+    assert manager.service_group == "memcleaner"
+    manager.service_address = r"\\.\pipe\memory-cleaner-test"
+    assert manager.service_address == r"\\.\pipe\memory-cleaner-test"
+
+    with pytest.raises(TypeError, match="must be a boolean"):
+        manager.use_service = "yes"
+    with pytest.raises(TypeError, match="must be a string"):
+        manager.service_address = None
+    with pytest.raises(TypeError, match="must be a string"):
+        manager.service_group = 0
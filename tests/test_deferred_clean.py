@@ -0,0 +1,160 @@
+import pytest
+from src.deferred_clean import DeferredCleaner, format_deferred_report
+from src.idle_detector import FakeIdleDetector
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeFaults:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self):
+        return self.count
+
+def _cleaner(**kwargs):
+    clock = FakeClock()
+    detector = FakeIdleDetector(idle=False)
+    faults = FakeFaults()
+    calls = []
+
+    def clean(mode):
+        calls.append(mode)
+        return {"success": True}
+
+    options = dict(max_defer=600, critical_percent=95, min_interval=300, fault_window=60)
+    options.update(kwargs)
+    deferred = DeferredCleaner(clean, detector, fault_source=faults, clock=clock, **options)
+    return deferred, detector, clock, faults, calls
+
+def test_clean_waits_for_idle():
+    """测试请求在空闲前不执行，空闲后执行一次"""
+    deferred, detector, clock, _, calls = _cleaner()
+
+    assert deferred.request(mode="working_set") == True
+    assert deferred.request() == False  # 合并为一个请求
+    clock.now = 10
+    assert deferred.poll({"percent": 85}) is None
+    assert calls == []
+
+    detector.idle = True
+    clock.now = 40
+    trigger, result = deferred.poll({"percent": 85})
+    assert trigger == "idle"
+    assert result["success"] == True
+    assert calls == ["working_set"]
+    assert deferred.pending is None
+    assert deferred.report()["mean_wait_seconds"] == 40
+
+def test_detector_not_queried_without_request():
+    """测试没有排队请求时不调用空闲检测"""
+    deferred, detector, _, _, _ = _cleaner()
+    deferred.poll({"percent": 85})
+    assert detector.calls == 0
+
+def test_deadline_and_critical_override():
+    """测试超时和内存紧急时不再等待空闲"""
+    deferred, _, clock, _, calls = _cleaner()
+
+    deferred.request()
+    clock.now = 600
+    assert deferred.poll({"percent": 85})[0] == "deadline"
+
+    clock.now = 1000
+    deferred.request()
+    assert deferred.poll({"percent": 96})[0] == "critical"
+    assert deferred.report()["runs"] == {"idle": 0, "deadline": 1, "critical": 1}
+    assert len(calls) == 2
+
+def test_cancel_when_condition_clears():
+    """测试使用率在空闲前回落时撤回请求，之后空闲也不再清理"""
+    deferred, detector, clock, _, calls = _cleaner()
+
+    deferred.request(reason="auto_clean")
+    assert deferred.cancel(reason="rule") == False
+    assert deferred.pending is not None
+    assert deferred.cancel(reason="auto_clean") == True
+    assert deferred.cancel(reason="auto_clean") == False
+
+    detector.idle = True
+    clock.now = 700
+    assert deferred.poll({"percent": 60}) is None
+    assert calls == []
+    assert deferred.report()["cancelled"] == 1
+    assert "取消 1 次" in format_deferred_report(deferred.report())
+
+def test_zero_max_defer_runs_immediately():
+    """测试 max_defer=0 时下一个样本即执行"""
+    deferred, _, _, _, calls = _cleaner(max_defer=0)
+    deferred.request()
+    assert deferred.poll({"percent": 85})[0] == "deadline"
+
+def test_min_interval_ignores_requests():
+    """测试上次清理后的最短间隔内忽略新请求"""
+    deferred, detector, clock, _, calls = _cleaner()
+    detector.idle = True
+    deferred.request()
+    deferred.poll({"percent": 85})
+
+    clock.now = 299
+    assert deferred.request() == False
+    clock.now = 300
+    assert deferred.request() == True
+
+def test_failed_clean_is_not_tracked():
+    """测试失败的清理不计入缺页统计"""
+    clock = FakeClock()
+    deferred = DeferredCleaner(lambda mode: {"success": False}, FakeIdleDetector(idle=True),
+                               fault_source=FakeFaults(), clock=clock)
+    deferred.request()
+    assert deferred.poll({"percent": 85})[0] == "idle"
+    clock.now = 100
+    deferred.poll({"percent": 85})
+    assert deferred.report()["idle_faults_mean"] is None
+
+def test_faults_avoided_estimate():
+    """测试空闲清理与非空闲清理的缺页差值估计"""
+    deferred, detector, clock, faults, _ = _cleaner(min_interval=0)
+
+    # 手动清理后 60 秒内 1000 次缺页
+    deferred.track_clean("immediate")
+    clock.now = 60
+    faults.count = 1000
+    deferred.poll({"percent": 85})
+
+    # 空闲清理后 120 秒（样本间隔较长）内 400 次缺页，折算为 60 秒内 200 次
+    detector.idle = True
+    deferred.request()
+    deferred.poll({"percent": 85})
+    clock.now = 180
+    faults.count = 1400
+    deferred.poll({"percent": 85})
+
+    report = deferred.report()
+    assert report["busy_faults_mean"] == 1000
+    assert report["idle_faults_mean"] == 200
+    assert report["faults_avoided"] == 800
+    assert "估计避免缺页 800 次" in format_deferred_report(report)
+
+def test_unsupported_fault_source():
+    """测试平台不支持缺页计数时只统计执行次数"""
+    deferred = DeferredCleaner(lambda mode: {"success": True}, FakeIdleDetector(idle=True),
+                               fault_source=lambda: None, clock=FakeClock())
+    deferred.request()
+    deferred.poll({"percent": 85})
+    report = deferred.report()
+    assert report["runs"]["idle"] == 1
+    assert report["faults_avoided"] is None
+
+def test_validation():
+    """测试参数验证"""
+    with pytest.raises(ValueError, match="max_defer must be non-negative"):
+        DeferredCleaner(lambda mode: None, FakeIdleDetector(), max_defer=-1)
+    with pytest.raises(ValueError, match="critical_percent must be between 0 and 100"):
+        DeferredCleaner(lambda mode: None, FakeIdleDetector(), critical_percent=0)
+    with pytest.raises(ValueError, match="min_interval must be non-negative"):
+        DeferredCleaner(lambda mode: None, FakeIdleDetector(), min_interval=-1)
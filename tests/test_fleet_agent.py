@@ -0,0 +1,116 @@
+import pytest
+import json
+import threading
+import time
+from src.fleet_agent import FleetAgent
+
+class FakeSender:
+    def __init__(self, status=202):
+        self.status = status
+        self.bodies = []
+
+    def __call__(self, url, body):
+        self.url = url
+        if isinstance(self.status, Exception):
+            raise self.status
+        self.bodies.append([json.loads(line) for line in body.decode("utf-8").splitlines()])
+        return self.status
+
+def _agent(sender, **kwargs):
+    kwargs.setdefault("batch_size", 100)
+    kwargs.setdefault("max_buffer", 1000)
+    return FleetAgent("http://aggregator:8765/", host="ws-1", flush_interval=3600,
+                      sender=sender, clock=lambda: 100.0, **kwargs)
+
+def test_records_are_batched_as_json_lines():
+    """测试样本只保留上报的指标，清理结果带模式和释放量"""
+    sender = FakeSender()
+    agent = _agent(sender)
+    agent.record_sample({"percent": 70.0, "used": 11.2, "swap_percent": None, "psi_some_avg10": 2.5})
+    agent.record_clean({"success": True, "mode": "working_set", "freed": 1.2, "before": {}})
+
+    assert agent.flush() == True
+    assert sender.url == "http://aggregator:8765/ingest"
+    assert sender.bodies == [[
+        {"host": "ws-1", "type": "sample", "ts": 100.0, "percent": 70.0, "psi_some_avg10": 2.5},
+        {"host": "ws-1", "type": "clean", "ts": 100.0, "success": True, "mode": "working_set", "freed_gb": 1.2},
+    ]]
+    assert agent.sent == 2
+    assert agent.pending_count == 0
+    assert agent.flush() == True  # 没有记录时不发送
+    assert len(sender.bodies) == 1
+    agent.close()
+
+def test_failed_send_keeps_records():
+    """测试汇总服务不可达时保留记录，下次成功时一起上报"""
+    sender = FakeSender(status=OSError("connection refused"))
+    agent = _agent(sender)
+    agent.record_sample({"percent": 70.0})
+
+    assert agent.flush() == False
+    assert agent.send_errors == 1
+    assert agent.pending_count == 1
+
+    sender.status = 500
+    assert agent.flush() == False
+    assert agent.pending_count == 1
+
+    sender.status = 202
+    agent.record_sample({"percent": 71.0})
+    assert agent.flush() == True
+    assert [r["percent"] for r in sender.bodies[-1]] == [70.0, 71.0]
+    agent.close()
+
+def test_buffer_drops_oldest_when_full():
+    """测试汇总服务不可达且缓冲超过上限时丢弃最旧的记录"""
+    sender = FakeSender(status=OSError("down"))
+    agent = _agent(sender, batch_size=2, max_buffer=3)
+    for i in range(5):
+        agent.record_sample({"percent": float(i)})
+    agent.close()
+
+    assert agent.pending_count == 3
+    assert agent.dropped == 2
+    sender.status = 202
+    assert agent.flush() == True
+    assert [r["percent"] for r in sender.bodies[0]] == [2.0, 3.0, 4.0]
+
+def test_batch_size_triggers_background_flush():
+    """测试攒够 batch_size 条时后台线程立即上报，close() 上报剩余记录"""
+    sender = FakeSender()
+    agent = _agent(sender, batch_size=2)
+    agent.record_sample({"percent": 1.0})
+    agent.record_sample({"percent": 2.0})
+    for _ in range(200):
+        if agent.sent == 2:
+            break
+        time.sleep(0.01)
+    assert agent.sent == 2
+
+    agent.record_sample({"percent": 3.0})
+    agent.close()
+    assert agent.sent == 3
+    agent.record_sample({"percent": 4.0})  # 关闭后忽略
+    assert agent.pending_count == 0
+
+def test_close_does_not_wait_for_unreachable_aggregator():
+    """测试汇总服务无响应时 close() 在 timeout 内返回，不拖慢退出"""
+    release = threading.Event()
+
+    def hanging_sender(url, body):
+        release.wait(10)
+        return 202
+
+    agent = _agent(hanging_sender)
+    agent.record_sample({"percent": 70.0})
+    started = time.monotonic()
+    agent.close(timeout=0.2)
+    assert time.monotonic() - started < 2
+    release.set()
+
+def test_validation():
+    """测试参数验证"""
+    with pytest.raises(ValueError, match="flush_interval must be positive"):
+        FleetAgent("http://x", flush_interval=0)
+    with pytest.raises(ValueError, match="batch_size <= max_buffer"):
+        FleetAgent("http://x", batch_size=10, max_buffer=5)
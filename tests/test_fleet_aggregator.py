@@ -0,0 +1,172 @@
+import pytest
+import asyncio
+import json
+import threading
+import urllib.error
+import urllib.request
+from src.fleet_aggregator import FleetStore, FleetAggregator, parse_address
+from src.fleet_agent import FleetAgent, post_lines
+
+def _sample(host, ts, **fields):
+    return {"host": host, "type": "sample", "ts": ts, **fields}
+
+def _clean(host, ts, success, mode="working_set", freed_gb=1.0):
+    return {"host": host, "type": "clean", "ts": ts, "success": success, "mode": mode, "freed_gb": freed_gb}
+
+def test_ring_buffer_keeps_newest_samples():
+    """测试每台主机只保留最近 sample_capacity 个样本"""
+    store = FleetStore(sample_capacity=3)
+    store.ingest([_sample("a", t, percent=t) for t in range(10)])
+
+    hosts = store.hosts()
+    assert hosts["a"]["samples"] == 3
+    assert hosts["a"]["latest"]["percent"] == 9
+    assert hosts["a"]["last_seen"] == 9
+    assert store.top_hosts("percent", agg="mean") == [{"host": "a", "value": 8.0}]
+
+def test_invalid_records_are_rejected():
+    """测试缺少主机名、类型错误或无法解析的记录被拒绝"""
+    store = FleetStore(max_hosts=1)
+    lines = b"\n".join([
+        json.dumps(_sample("a", 1, percent=50)).encode(),
+        b"{not json",
+        json.dumps({"type": "sample", "percent": 50}).encode(),
+        json.dumps({"host": "a", "type": "alert"}).encode(),
+        json.dumps(_clean("a", 2, success="yes")).encode(),
+        json.dumps(_sample("b", 1, percent=50)).encode(),  # 超出 max_hosts
+        b"",
+    ])
+
+    assert store.ingest_lines(lines) == (1, 5)
+    assert store.accepted == 1
+    assert store.rejected == 5
+    assert len(store) == 1
+
+def test_top_hosts():
+    """测试按最近值、均值和最大值排出指标最高的主机"""
+    store = FleetStore()
+    store.ingest([
+        _sample("a", 1, psi_some_avg10=30.0), _sample("a", 2, psi_some_avg10=2.0),
+        _sample("b", 1, psi_some_avg10=10.0), _sample("b", 2, psi_some_avg10=12.0),
+        _sample("c", 1, percent=50.0),  # 没有 PSI，不参与排名
+    ])
+
+    assert store.top_hosts("psi_some_avg10", n=1) == [{"host": "b", "value": 12.0}]
+    assert [h["host"] for h in store.top_hosts("psi_some_avg10", agg="mean")] == ["a", "b"]
+    assert store.top_hosts("psi_some_avg10", agg="max")[0] == {"host": "a", "value": 30.0}
+
+    with pytest.raises(ValueError, match="unknown metric"):
+        store.top_hosts("cpu")
+    with pytest.raises(ValueError, match="agg must be one of"):
+        store.top_hosts("percent", agg="min")
+
+def test_percentiles():
+    """测试全体主机的最近秩百分位数"""
+    store = FleetStore()
+    store.ingest([_sample(f"h{i}", 1, percent=float(i)) for i in range(1, 101)])
+
+    assert store.percentiles("percent", (50, 90, 99, 100)) == {
+        "count": 100, "p50": 50.0, "p90": 90.0, "p99": 99.0, "p100": 100.0
+    }
+    assert store.percentiles("psi_full_avg10") == {"count": 0, "p50": None, "p90": None, "p99": None}
+
+    with pytest.raises(ValueError, match="percentile must be between"):
+        store.percentiles("percent", (0,))
+
+def test_percentiles_over_all_samples():
+    """测试 scope=samples 时统计缓冲中的全部样本"""
+    store = FleetStore()
+    store.ingest([_sample("a", t, percent=float(t)) for t in range(1, 5)])
+
+    assert store.percentiles("percent", (50,), scope="latest") == {"count": 1, "p50": 4.0}
+    assert store.percentiles("percent", (50,), scope="samples") == {"count": 4, "p50": 2.0}
+
+def test_clean_stats():
+    """测试清理成功率按模式和主机统计"""
+    store = FleetStore()
+    store.ingest([
+        _clean("a", 1, True, freed_gb=2.0), _clean("a", 2, True, freed_gb=1.0),
+        _clean("b", 1, False), _clean("b", 2, True, mode="standby_list", freed_gb=0.5),
+    ])
+
+    stats = store.clean_stats(n=1)
+    assert stats["total"] == 4
+    assert stats["success"] == 3
+    assert stats["rate"] == 0.75
+    assert stats["by_mode"]["working_set"] == {"total": 3, "success": 2, "rate": 0.667, "mean_freed_gb": 1.5}
+    assert stats["by_mode"]["standby_list"]["rate"] == 1.0
+    assert stats["worst_hosts"] == [{"host": "b", "total": 2, "rate": 0.5}]
+
+def test_parse_address():
+    """测试监听地址解析"""
+    assert parse_address("127.0.0.1:9000") == ("127.0.0.1", 9000)
+    assert parse_address(":9000") == ("127.0.0.1", 9000)
+    assert parse_address("") == ("127.0.0.1", 8765)
+    assert parse_address("0.0.0.0:8765") == ("0.0.0.0", 8765)
+    assert parse_address("localhost") == ("localhost", 8765)
+    assert FleetAggregator().host == "127.0.0.1"
+
+@pytest.fixture
+def aggregator():
+    """在后台线程的事件循环中启动汇总服务，端口由系统分配"""
+    loop = asyncio.new_event_loop()
+    server = FleetAggregator(host="127.0.0.1", port=0)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+def _get(server, path, token=None):
+    request = urllib.request.Request(f"http://127.0.0.1:{server.port}{path}")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.load(response)
+
+def test_agent_reports_to_aggregator(aggregator):
+    """测试 FleetAgent 通过 HTTP 上报，汇总服务可以查询"""
+    for host, percent in (("ws-1", 91.0), ("ws-2", 40.0)):
+        agent = FleetAgent(f"http://127.0.0.1:{aggregator.port}", host=host)
+        agent.record_sample({"percent": percent, "available": 2.0, "used": 14.0, "psi_some_avg10": None})
+        agent.record_clean({"success": True, "mode": "working_set", "freed": 1.5})
+        assert agent.flush() == True
+        agent.close()
+
+    assert _get(aggregator, "/health")["accepted"] == 4
+    assert _get(aggregator, "/top?metric=percent&n=1") == [{"host": "ws-1", "value": 91.0}]
+    assert _get(aggregator, "/percentiles?metric=percent&p=50")["p50"] == 40.0
+    assert _get(aggregator, "/cleans")["rate"] == 1.0
+    assert _get(aggregator, "/hosts")["ws-2"]["latest"]["available"] == 2.0
+
+def test_http_errors(aggregator):
+    """测试未知路径、错误方法和无效参数的响应"""
+    for path, status in (("/nowhere", 404), ("/ingest", 405), ("/top?metric=cpu", 400)):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            _get(aggregator, path)
+        assert e.value.code == status
+
+def test_ingest_requires_token(aggregator):
+    """测试设置共享令牌后拒绝不带令牌或令牌错误的上报和查询，/health 不受影响"""
+    aggregator.token = "s3cret"
+    url = f"http://127.0.0.1:{aggregator.port}/ingest"
+    body = b'{"host": "intruder", "type": "sample", "ts": 1.0, "percent": 99.0}\n'
+    for token in (None, "wrong"):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            post_lines(url, body, token=token)
+        assert e.value.code == 401
+
+    agent = FleetAgent(f"http://127.0.0.1:{aggregator.port}", host="ws-1", token="s3cret")
+    agent.record_sample({"percent": 50.0})
+    assert agent.flush() == True
+    agent.close()
+
+    for path in ("/hosts", "/top?metric=percent", "/cleans"):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            _get(aggregator, path)
+        assert e.value.code == 401
+    assert list(_get(aggregator, "/hosts", token="s3cret")) == ["ws-1"]
+    assert _get(aggregator, "/health")["status"] == "ok"
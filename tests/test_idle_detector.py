@@ -0,0 +1,110 @@
+import pytest
+from src.idle_detector import LoadIdleDetector, FakeIdleDetector, WindowsInputIdleDetector
+
+class FakeUser32:
+    def __init__(self, last_input):
+        self.last_input = last_input
+
+    def GetLastInputInfo(self, ref):
+        ref._obj.dwTime = self.last_input
+        return 1
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeKernel32:
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def GetTickCount(self):
+        return self.ticks
+
+def test_load_detector_thresholds():
+    """测试按每核负载和 CPU 使用率判断空闲"""
+    state = {"load": 0.4, "cpu": 5.0}
+    clock = FakeClock()
+    detector = LoadIdleDetector(idle_seconds=60, load_threshold=0.3, cpu_threshold=10,
+                                load_source=lambda: state["load"],
+                                cpu_source=lambda: state["cpu"], cpu_count=4, clock=clock)
+
+    assert detector.is_idle() == False  # 0.4 / 4 核 = 0.1，但还没有持续 60 秒
+    clock.now = 60
+    assert detector.is_idle() == True
+
+    state["load"] = 2.0
+    assert detector.is_idle() == False
+
+    state["load"] = 0.4
+    state["cpu"] = 50.0
+    assert detector.is_idle() == False
+
+def test_load_detector_without_loadavg():
+    """测试平台没有 loadavg 时只看 CPU 使用率"""
+    clock = FakeClock()
+    detector = LoadIdleDetector(idle_seconds=1, load_source=lambda: None, cpu_source=lambda: 3.0,
+                                cpu_count=1, clock=clock)
+    detector.is_idle()
+    clock.now = 1
+    assert detector.is_idle() == True
+
+def test_load_detector_requires_sustained_quiet():
+    """测试低负载中间出现一次繁忙会重新计时"""
+    cpu = [5.0]
+    clock = FakeClock()
+    detector = LoadIdleDetector(idle_seconds=60, load_source=lambda: None, cpu_source=lambda: cpu[0],
+                                cpu_count=1, clock=clock)
+
+    detector.is_idle()
+    clock.now = 50
+    cpu[0] = 80.0
+    assert detector.is_idle() == False
+    cpu[0] = 5.0
+    clock.now = 70
+    assert detector.is_idle() == False  # quiet again only since t=70
+    clock.now = 130
+    assert detector.is_idle() == True
+
+def test_load_detector_primes_cpu_percent():
+    """测试创建时先调用一次 cpu_percent，第一次检查不会拿到无意义的 0.0"""
+    readings = iter([0.0, 90.0])
+    calls = []
+
+    def cpu():
+        calls.append(1)
+        return next(readings)
+
+    detector = LoadIdleDetector(idle_seconds=1, load_source=lambda: None, cpu_source=cpu, cpu_count=1,
+                                clock=FakeClock())
+    assert len(calls) == 1
+    assert detector.is_idle() == False
+
+def test_load_detector_validation():
+    """测试参数验证"""
+    with pytest.raises(ValueError, match="load_threshold must be positive"):
+        LoadIdleDetector(load_threshold=0)
+    with pytest.raises(ValueError, match="cpu_threshold must be between 0 and 100"):
+        LoadIdleDetector(cpu_threshold=101)
+    with pytest.raises(ValueError, match="idle_seconds must be positive"):
+        LoadIdleDetector(idle_seconds=0)
+
+def test_windows_input_idle_wraparound():
+    """测试 Windows 输入空闲时间在 GetTickCount 回绕后仍然正确"""
+    detector = WindowsInputIdleDetector(idle_seconds=120,
+                                        user32=FakeUser32(0xFFFFFFFF - 1000),
+                                        kernel32=FakeKernel32(200000))
+    assert detector.input_idle_seconds() == pytest.approx(201.001)
+    assert detector.is_idle() == True
+
+    detector = WindowsInputIdleDetector(idle_seconds=120, user32=FakeUser32(100000),
+                                        kernel32=FakeKernel32(150000))
+    assert detector.is_idle() == False
+
+def test_fake_detector():
+    """测试 fake 检测器"""
+    detector = FakeIdleDetector(idle=True)
+    assert detector.is_idle() == True
+    assert detector.calls == 1
@@ -0,0 +1,138 @@
+import pytest
+import json
+import os
+import threading
+from src.instrumentation import Histogram, Instrumentation, format_metrics, format_top_functions, timed
+
+def test_histogram_buckets_and_percentiles():
+    """测试直方图分桶与百分位估算"""
+    histogram = Histogram()
+    for _ in range(98):
+        histogram.record(0.000003)   # 3us -> [2, 4) 桶
+    histogram.record(0.0005)         # 500us
+    histogram.record(0.002)          # 2ms
+
+    assert histogram.count == 100
+    assert histogram.percentile(50) == 4
+    assert histogram.percentile(99) == 512
+    assert histogram.to_dict()["max_us"] == 2000.0
+
+def test_timed_records_calls():
+    """测试计时装饰器记录调用次数和耗时"""
+    registry = Instrumentation()
+
+    @timed("work", registry=registry)
+    def work(x):
+        return x * 2
+
+    assert work(21) == 42
+    work(1)
+
+    timing = registry.snapshot()["timings"]["work"]
+    assert timing["count"] == 2
+    assert timing["max_us"] >= 0
+
+def test_timed_records_failures():
+    """测试抛出异常的调用同样计时"""
+    registry = Instrumentation()
+
+    @timed("broken", registry=registry)
+    def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        broken()
+    assert registry.snapshot()["timings"]["broken"]["count"] == 1
+
+def test_disabled_registry_records_no_timings():
+    """测试关闭计时后不记录耗时，但计数器照常计数"""
+    registry = Instrumentation(enabled=False)
+
+    @timed("work", registry=registry)
+    def work():
+        return 1
+
+    work()
+    registry.incr("errors")
+    snapshot = registry.snapshot()
+    assert snapshot["timings"] == {}
+    assert snapshot["counters"] == {"errors": 1}
+
+def test_dump_and_format(tmp_path):
+    """测试导出指标文件及格式化输出"""
+    registry = Instrumentation()
+    registry.observe("monitor.get_memory_info", 0.00005)
+    registry.incr("errors.update_icon_state")
+    path = os.path.join(tmp_path, "metrics.json")
+
+    registry.dump(path)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    text = format_metrics(snapshot)
+    assert "monitor.get_memory_info" in text
+    assert "errors.update_icon_state" in text
+
+def test_profiling_writes_pstats(tmp_path):
+    """测试性能分析开关写出 pstats 文件"""
+    registry = Instrumentation()
+
+    def inner():
+        return sum(range(1000))
+
+    @timed("outer", registry=registry)
+    def outer():
+        return inner()
+
+    registry.start_profiling()
+    assert registry.profiling
+    outer()
+    path = os.path.join(tmp_path, "profile.pstats")
+    stats = registry.stop_profiling(path)
+
+    assert not registry.profiling
+    assert os.path.exists(path)
+    assert any(func[2] == "inner" for func in stats.stats)
+
+def test_profiling_with_timing_disabled(tmp_path):
+    """测试关闭计时时性能分析仍然记录热路径调用"""
+    registry = Instrumentation(enabled=False)
+
+    @timed("work", registry=registry)
+    def work():
+        return sum(range(1000))
+
+    registry.start_profiling()
+    work()
+    stats = registry.stop_profiling(os.path.join(tmp_path, "profile.pstats"))
+
+    assert stats is not None
+    assert "work" in format_top_functions(stats)
+    assert registry.snapshot()["timings"] == {}
+
+def test_profiling_without_calls(tmp_path):
+    """测试分析期间没有热路径调用时不写文件"""
+    registry = Instrumentation()
+    registry.start_profiling()
+    path = os.path.join(tmp_path, "profile.pstats")
+
+    assert registry.stop_profiling(path) is None
+    assert not os.path.exists(path)
+
+def test_profiling_from_multiple_threads(tmp_path):
+    """测试多个线程同时调用被分析的热路径"""
+    registry = Instrumentation()
+
+    @timed("work", registry=registry)
+    def work():
+        return sum(range(100))
+
+    registry.start_profiling()
+    threads = [threading.Thread(target=lambda: [work() for _ in range(50)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert registry.stop_profiling(os.path.join(tmp_path, "p.pstats")) is not None
+    assert registry.snapshot()["timings"]["work"]["count"] > 0
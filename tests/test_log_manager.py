@@ -3,6 +3,8 @@ import pytest
 import tempfile
 import os
 import json
+import threading
+import time
 from src.log_manager import LogManager
 
 def test_add_and_get_logs(tmp_path):
@@ -21,10 +23,10 @@ def test_add_and_get_logs(tmp_path):
     logs = manager.get_recent_logs(limit=10)
 
     assert len(logs) == 1
-    assert logs[0]["before_percent"] == 85.5
-    assert logs[0]["after_percent"] == 72.3
-    assert logs[0]["freed_gb"] == 2.1
-    assert "timestamp" in logs[0]
+    assert logs[0].before_percent == 85.5
+    assert logs[0].after_percent == 72.3
+    assert logs[0].freed_gb == 2.1
+    assert logs[0].timestamp is not None
 
 def test_log_limit(tmp_path):
     """测试日志数量限制"""
@@ -99,8 +101,8 @@ def test_valid_boundary_values(tmp_path):
 
     logs = manager.get_recent_logs(limit=10)
     assert len(logs) == 2
-    assert logs[0]["before_percent"] == 0
-    assert logs[1]["before_percent"] == 100
+    assert logs[0].before_percent == 0
+    assert logs[1].before_percent == 100
 
 def test_load_logs_with_corrupt_json(tmp_path, caplog):
     """测试加载损坏的JSON文件"""
@@ -135,3 +137,236 @@ def test_save_logs_with_io_error(tmp_path, monkeypatch, caplog):
 
     # Check that an error was logged
     assert any("Failed to write log file" in record.message for record in caplog.records)
+
+def test_write_behind_read_your_writes(tmp_path):
+    """测试异步写入模式下未落盘的日志也能读到"""
+    log_file = os.path.join(tmp_path, "test_clean.log")
+    manager = LogManager(log_file, write_behind=True, flush_interval=60, max_pending=50)
+
+    manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.5)
+
+    assert manager.pending_count == 1
+    assert not os.path.exists(log_file)
+    logs = manager.get_recent_logs()
+    assert len(logs) == 1
+    assert logs[0].freed_gb == 1.5
+
+    manager.close()
+    assert manager.pending_count == 0
+    with open(log_file, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)["records"]) == 1
+
+def test_write_behind_flushes_on_size(tmp_path):
+    """测试队列达到 max_pending 时触发写盘"""
+    log_file = os.path.join(tmp_path, "test_clean.log")
+    manager = LogManager(log_file, write_behind=True, flush_interval=60, max_pending=5)
+
+    for _ in range(5):
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+
+    # The writer thread is woken by the size trigger, not the 60 s timer
+    deadline = time.monotonic() + 5
+    while manager.pending_count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.pending_count == 0
+    assert len(manager._load_logs()) == 5
+    manager.close()
+
+def test_write_behind_flushes_on_interval(tmp_path):
+    """测试最旧条目超过 flush_interval 后触发写盘"""
+    log_file = os.path.join(tmp_path, "test_clean.log")
+    manager = LogManager(log_file, write_behind=True, flush_interval=0.05, max_pending=100)
+
+    manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+
+    deadline = time.monotonic() + 5
+    while not os.path.exists(log_file) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(manager._load_logs()) == 1
+    manager.close()
+
+def test_write_behind_pending_is_bounded(tmp_path, monkeypatch):
+    """测试写盘持续失败时队列长度不超过 max_pending"""
+    log_file = os.path.join(tmp_path, "test_clean.log")
+    manager = LogManager(log_file, write_behind=True, flush_interval=0.01, max_pending=3)
+
+    def failing_save(logs):
+        raise IOError("disk full")
+
+    monkeypatch.setattr(manager, "_save_logs", failing_save)
+
+    for _ in range(10):
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+        assert manager.pending_count <= 3
+
+    assert manager.dropped > 0
+    manager.close()
+    # Every accepted entry was either written or counted as dropped
+    assert manager.pending_count == 0
+    assert manager.dropped == 10
+
+def test_write_behind_full_queue_does_not_block(tmp_path, monkeypatch):
+    """测试写线程卡住、队列已满时 add_clean_log 立即丢弃最旧条目而不等待"""
+    log_file = os.path.join(tmp_path, "test_clean.log")
+    manager = LogManager(log_file, write_behind=True, flush_interval=5, max_pending=3)
+    release = threading.Event()
+    writing = threading.Event()
+    save_logs = manager._save_logs
+
+    def slow_save(logs):
+        writing.set()
+        release.wait(10)
+        save_logs(logs)
+
+    monkeypatch.setattr(manager, "_save_logs", slow_save)
+
+    for _ in range(3):
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+    assert writing.wait(5)  # the writer holds the first batch
+    start = time.monotonic()
+    for _ in range(7):
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+    assert time.monotonic() - start < 1
+    assert manager.pending_count == 3
+    assert manager.dropped == 4
+
+    release.set()
+    manager.close()
+    assert len(LogManager(log_file).get_recent_logs(100)) + manager.dropped == 10
+
+def test_durability_policies(tmp_path):
+    """测试各落盘策略都能正确写入"""
+    for policy in LogManager.DURABILITY_POLICIES:
+        log_file = os.path.join(tmp_path, f"{policy}.log")
+        manager = LogManager(log_file, durability=policy)
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+        assert len(manager.get_recent_logs()) == 1
+        assert not os.path.exists(log_file + ".tmp")
+
+def test_durability_policies_differ(tmp_path, monkeypatch):
+    """测试 none 直接覆盖、flush 原子替换、fsync 另外同步文件和目录"""
+    calls = []
+    real_replace, real_fsync = os.replace, os.fsync
+    monkeypatch.setattr(os, "replace", lambda src, dst: (calls.append("replace"), real_replace(src, dst)))
+    monkeypatch.setattr(os, "fsync", lambda fd: (calls.append("fsync"), real_fsync(fd)))
+
+    expected = {"none": [], "flush": ["replace"],
+                "fsync": ["fsync", "replace", "fsync"] if os.name == "posix" else ["fsync", "replace"]}
+    for policy in LogManager.DURABILITY_POLICIES:
+        calls.clear()
+        LogManager(os.path.join(tmp_path, f"{policy}.log"), durability=policy).add_clean_log(
+            before_percent=80, after_percent=60, freed_gb=1.0)
+        assert calls == expected[policy], policy
+
+def test_crash_mid_write_keeps_old_log(tmp_path, monkeypatch):
+    """测试 flush 策略下写入中途失败时原日志完整，none 策略则会留下截断的文件"""
+    for policy, survives in (("flush", True), ("none", False)):
+        log_file = os.path.join(tmp_path, f"{policy}.log")
+        manager = LogManager(log_file, durability=policy)
+        manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+
+        def crash(obj, f, **kwargs):
+            f.write("{\"version\": ")
+            raise OSError("disk gone")
+
+        with monkeypatch.context() as m:
+            m.setattr(json, "dump", crash)
+            with pytest.raises(OSError):
+                manager.add_clean_log(before_percent=80, after_percent=60, freed_gb=1.0)
+        assert (len(LogManager(log_file).get_recent_logs()) == 1) == survives
+
+def test_invalid_write_behind_settings(tmp_path):
+    """测试无效的落盘参数"""
+    log_file = os.path.join(tmp_path, "test_clean.log")
+
+    with pytest.raises(ValueError, match="durability must be one of"):
+        LogManager(log_file, durability="always")
+
+    with pytest.raises(ValueError, match="flush_interval must be a positive number"):
+        LogManager(log_file, flush_interval=0)
+
+    with pytest.raises(ValueError, match="max_pending must be a positive integer"):
+        LogManager(log_file, max_pending=0)
+
+def test_annotate_entry(tmp_path):
+    """测试给已写盘和排队中的日志补充字段"""
+    log_file = os.path.join(tmp_path, "test.log")
+    manager = LogManager(log_file)
+    entry_id = manager.add_clean_log(80, 60, 1.0, mode="working_set")
+
+    assert manager.annotate(entry_id, {"cost": {"net_benefit_mb": 512.0}}) == True
+    log = manager.get_recent_logs()[0]
+    assert log.mode == "working_set"
+    assert log.net_benefit_mb == 512.0
+    assert manager.annotate("missing", {"cost": {}}) == False
+
+    queued = LogManager(os.path.join(tmp_path, "queued.log"), write_behind=True, flush_interval=60)
+    queued_id = queued.add_clean_log(80, 60, 1.0)
+    assert queued.annotate(queued_id, {"cost": {"net_benefit_mb": -3.0}}) == True
+    queued.close()
+    with open(os.path.join(tmp_path, "queued.log"), 'r', encoding='utf-8') as f:
+        assert json.load(f)["records"][0]["cost"]["net_benefit_mb"] == -3.0
+
+def test_richer_fields_round_trip(tmp_path):
+    """测试触发方式、耗时和目标进程写入文件后能原样读回"""
+    log_file = os.path.join(tmp_path, "test.log")
+    manager = LogManager(log_file)
+    manager.add_clean_log(80, 60, 1.0, mode="working_set", trigger="auto", duration_ms=12.34,
+                          processes=["chrome.exe"])
+
+    with open(log_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data["version"] == 2
+    record = LogManager(log_file).get_recent_logs()[0]
+    assert (record.trigger, record.duration_ms, record.processes) == ("auto", 12.3, ("chrome.exe",))
+
+    with pytest.raises(TypeError, match="trigger must be a string"):
+        manager.add_clean_log(80, 60, 1.0, trigger=1)
+    with pytest.raises(ValueError, match="duration_ms must be non-negative"):
+        manager.add_clean_log(80, 60, 1.0, duration_ms=-1)
+
+def test_v1_log_is_migrated(tmp_path):
+    """测试旧版本的裸列表日志在第一次读取时迁移为 v2，并保留原文件"""
+    log_file = os.path.join(tmp_path, "clean.log")
+    v1 = [
+        {"timestamp": "2025-01-15T14:00:00.123456", "before_percent": 85.0, "after_percent": 70.0, "freed_gb": 1.2},
+        {"timestamp": "2025-01-15T15:00:00", "before_percent": 80.0, "after_percent": 75.0, "freed_gb": 0.4,
+         "id": "abc", "mode": "standby_list", "cost": {"net_benefit_mb": 100.0}},
+        {"timestamp": "bad", "before_percent": "80"},
+    ]
+    with open(log_file, 'w', encoding='utf-8') as f:
+        json.dump(v1, f)
+
+    manager = LogManager(log_file)
+    records = manager.get_recent_logs()
+    assert [r.freed_gb for r in records] == [1.2, 0.4]
+    assert records[1].mode == "standby_list"
+    assert records[1].net_benefit_mb == 100.0
+
+    with open(log_file, 'r', encoding='utf-8') as f:
+        assert json.load(f)["version"] == 2
+    with open(log_file + ".v1", 'r', encoding='utf-8') as f:
+        assert json.load(f) == v1
+
+    # 迁移后的文件继续追加
+    assert manager.annotate("abc", {"cost": {"net_benefit_mb": 50.0}}) == True
+    manager.add_clean_log(80, 60, 1.0)
+    assert len(LogManager(log_file).get_recent_logs()) == 3
+
+def test_unchanged_file_is_not_reparsed(tmp_path, monkeypatch):
+    """测试文件没有变化时读取直接使用缓存"""
+    log_file = os.path.join(tmp_path, "test.log")
+    manager = LogManager(log_file)
+    manager.add_clean_log(80, 60, 1.0)
+
+    loads = []
+    original = json.load
+    monkeypatch.setattr(json, "load", lambda f: loads.append(1) or original(f))
+    for _ in range(5):
+        manager.get_recent_logs()
+    assert loads == []
+
+    # 其他进程改写了文件时重新读取
+    other = LogManager(log_file)
+    other.add_clean_log(70, 50, 2.0)
+    assert len(manager.get_recent_logs()) == 2
@@ -32,3 +32,101 @@ def test_check_threshold():
     # 设置极低阈值，应该触发警告
     monitor.set_threshold(0)
     assert monitor.is_over_threshold() == True
+
+GB = 1024 ** 3
+
+def _raw(t, swap_in=0, commit_total=8 * GB):
+    return {
+        "total": 16 * GB, "available": 4 * GB, "used": 12 * GB, "cached": 2 * GB,
+        "swap_total": 4 * GB, "swap_used": 1 * GB,
+        "swap_in_bytes": swap_in, "swap_out_bytes": 0,
+        "commit_total": commit_total, "commit_limit": 20 * GB,
+        "time": t
+    }
+
+def test_get_extended_info_real_platform():
+    """测试在当前平台采集扩展信息"""
+    info = MemoryMonitor().get_extended_info()
+
+    for key in ("total", "used", "percent", "available", "swap_total", "swap_used", "swap_percent"):
+        assert key in info
+    assert 0 <= info["percent"] <= 100
+    assert info["swap_in_rate"] is None  # 首次采样没有速率
+
+def test_extended_info_rates_from_consecutive_samples():
+    """测试由相邻两次采样计算换入速率"""
+    samples = [_raw(0.0, swap_in=0), _raw(2.0, swap_in=40 * 1024 ** 2)]
+    monitor = MemoryMonitor(snapshot_source=lambda: samples.pop(0))
+
+    first = monitor.get_extended_info()
+    second = monitor.get_extended_info()
+
+    assert first["percent"] == 75.0
+    assert first["swap_percent"] == 25.0
+    assert first["commit_percent"] == 40.0
+    assert first["swap_in_rate"] is None
+    assert second["swap_in_rate"] == 20.0
+    assert second["swap_out_rate"] == 0.0
+
+def test_untracked_snapshot_keeps_rate_window():
+    """测试 track=False 的旁路读取不改变采样线程的速率基准"""
+    samples = [_raw(0.0, swap_in=0), _raw(1.0, swap_in=40 * 1024 ** 2), _raw(4.0, swap_in=80 * 1024 ** 2)]
+    monitor = MemoryMonitor(snapshot_source=lambda: samples.pop(0))
+
+    monitor.get_extended_info()
+    assert monitor.get_extended_info(track=False)["swap_in_rate"] == 40.0
+    assert monitor.get_extended_info()["swap_in_rate"] == 20.0
+
+def test_extended_info_missing_platform_fields():
+    """测试平台不提供的字段为 None"""
+    raw = _raw(0.0)
+    raw.update(swap_in_bytes=None, commit_total=None, commit_limit=None, cached=None)
+    monitor = MemoryMonitor(snapshot_source=lambda: dict(raw))
+
+    monitor.get_extended_info()
+    info = monitor.get_extended_info()
+
+    assert info["swap_in_rate"] is None
+    assert info["commit_total"] is None
+    assert info["commit_percent"] is None
+    assert info["cached"] is None
+
+def test_check_metric_thresholds():
+    """测试扩展指标分别的阈值"""
+    monitor = MemoryMonitor(snapshot_source=lambda: _raw(0.0, commit_total=19 * GB))
+    monitor.set_threshold(99)
+    info = monitor.get_extended_info()
+
+    assert monitor.check_thresholds(info) == ["commit_percent"]
+
+    monitor.set_metric_threshold("swap_percent", 20)
+    assert set(monitor.check_thresholds(info)) == {"commit_percent", "swap_percent"}
+
+    with pytest.raises(ValueError):
+        monitor.set_metric_threshold("unknown", 10)
+    with pytest.raises(ValueError):
+        monitor.set_metric_threshold("swap_percent", 120)
+
+def test_pressure_based_auto_clean():
+    """测试按 PSI 压力判断是否需要自动清理"""
+    monitor = MemoryMonitor(snapshot_source=lambda: None)
+    calm_full = {"percent": 90.0, "psi_some_avg10": 1.0, "psi_full_avg10": 0.0}
+    stalling = {"percent": 70.0, "psi_some_avg10": 25.0, "psi_full_avg10": 2.0}
+    no_psi = {"percent": 90.0, "psi_some_avg10": None, "psi_full_avg10": None}
+
+    assert monitor.is_under_pressure(calm_full) == False
+    assert monitor.is_under_pressure(stalling) == True
+    assert monitor.is_under_pressure(no_psi) is None
+    assert "psi_some_avg10" in monitor.check_thresholds(stalling)
+
+    assert monitor.should_auto_clean(calm_full, "percent", 80) == True
+    assert monitor.should_auto_clean(calm_full, "pressure", 80) == False
+    assert monitor.should_auto_clean(stalling, "pressure", 80) == True
+    assert monitor.should_auto_clean(stalling, "either", 80) == True
+    assert monitor.should_auto_clean(no_psi, "pressure", 80) == True  # 不支持 PSI 时退回使用率
+
+    monitor.set_metric_threshold("psi_some_avg10", 30)
+    assert monitor.is_under_pressure(stalling) == False
+
+    with pytest.raises(ValueError, match="trigger must be one of"):
+        monitor.should_auto_clean(calm_full, "load", 80)
@@ -0,0 +1,171 @@
+import ctypes
+import pytest
+import os
+import sys
+import src.memory_sources as memory_sources
+from src.memory_sources import (collect_linux, read_fault_counters, read_linux_meminfo, read_linux_vmstat,
+                                read_page_faults, read_pressure, WindowsPagingCounters)
+
+MEMINFO = """MemTotal:       16000000 kB
+MemFree:         2000000 kB
+MemAvailable:    6000000 kB
+Buffers:          500000 kB
+Cached:          3000000 kB
+SReclaimable:     500000 kB
+SwapTotal:       4000000 kB
+SwapFree:        3000000 kB
+CommitLimit:    12000000 kB
+Committed_AS:    9000000 kB
+HugePages_Total:       0
+"""
+
+VMSTAT = """nr_free_pages 500000
+pswpin 100
+pswpout 50
+pgmajfault 7
+"""
+
+def _write_proc(tmp_path):
+    meminfo = os.path.join(tmp_path, "meminfo")
+    vmstat = os.path.join(tmp_path, "vmstat")
+    with open(meminfo, 'w') as f:
+        f.write(MEMINFO)
+    with open(vmstat, 'w') as f:
+        f.write(VMSTAT)
+    return meminfo, vmstat
+
+def test_read_linux_meminfo(tmp_path):
+    """测试解析 /proc/meminfo"""
+    meminfo, _ = _write_proc(tmp_path)
+    values = read_linux_meminfo(meminfo)
+
+    assert values["MemTotal"] == 16000000 * 1024
+    assert values["HugePages_Total"] == 0  # 无单位字段保持原值
+
+def test_read_linux_vmstat(tmp_path):
+    """测试读取 /proc/vmstat 指定计数器"""
+    _, vmstat = _write_proc(tmp_path)
+    assert read_linux_vmstat(vmstat) == {"pswpin": 100, "pswpout": 50}
+    assert read_linux_vmstat(vmstat, keys=("pgmajfault",)) == {"pgmajfault": 7}
+
+def test_collect_linux(tmp_path):
+    """测试一次读取得到全部字段"""
+    meminfo, vmstat = _write_proc(tmp_path)
+    raw = collect_linux(meminfo, vmstat)
+
+    assert raw["total"] == 16000000 * 1024
+    assert raw["used"] == (16000000 - 6000000) * 1024
+    assert raw["cached"] == 3500000 * 1024
+    assert raw["swap_used"] == 1000000 * 1024
+    assert raw["commit_total"] == 9000000 * 1024
+    assert raw["commit_limit"] == 12000000 * 1024
+    assert raw["swap_in_bytes"] == 100 * os.sysconf("SC_PAGE_SIZE")
+
+def test_collect_linux_without_vmstat(tmp_path):
+    """测试 /proc/vmstat 不可读时换入换出为 None"""
+    meminfo, _ = _write_proc(tmp_path)
+    raw = collect_linux(meminfo, os.path.join(tmp_path, "missing"), os.path.join(tmp_path, "missing"))
+
+    assert raw["swap_in_bytes"] is None
+    assert raw["swap_out_bytes"] is None
+    assert raw["psi"] is None  # 内核未启用 PSI
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="pgmajfault is Linux-only")
+def test_read_page_faults_linux(tmp_path):
+    """测试 Linux 上读取硬缺页计数"""
+    _, vmstat = _write_proc(tmp_path)
+    assert read_page_faults(vmstat) == 7
+    assert read_page_faults(os.path.join(tmp_path, "missing")) is None
+
+class FakePdh:
+    """按计数器路径返回预设累计值的 pdh.dll 替身"""
+
+    def __init__(self, values):
+        self.values = values
+        self.paths = {}
+        self.collections = 0
+
+    def PdhOpenQueryW(self, source, user_data, query):
+        query._obj.value = 1
+        return 0
+
+    def PdhAddEnglishCounterW(self, query, path, user_data, counter):
+        counter._obj.value = len(self.paths) + 100
+        self.paths[counter._obj.value] = path
+        return 0
+
+    def PdhCollectQueryData(self, query):
+        self.collections += 1
+        return 0
+
+    def PdhGetRawCounterValue(self, counter, counter_type, raw):
+        value = self.values.get(self.paths[counter.value])
+        if value is None:
+            raw._obj.CStatus = 0xC0000BB8  # PDH_CSTATUS_NO_OBJECT
+        else:
+            raw._obj.FirstValue = value
+        return 0
+
+def test_windows_paging_counters():
+    """测试从 PDH 原始值读取系统级分页计数，无效的计数器为 None"""
+    pdh = FakePdh({r"\Memory\Page Reads/sec": 1234})
+    counters = WindowsPagingCounters(pdh)
+
+    assert counters.read() == {"page_reads": 1234, "pages_input": None, "pages_output": None}
+    assert pdh.collections == 1
+
+def test_read_fault_counters_windows(monkeypatch):
+    """测试 Windows 上缺页计数来自 PDH，不遍历进程"""
+    counters = WindowsPagingCounters(FakePdh({r"\Memory\Page Reads/sec": 50, r"\Memory\Pages Input/sec": 80}))
+    monkeypatch.setattr(memory_sources.sys, "platform", "win32")
+    monkeypatch.setattr(memory_sources, "windows_paging_counters", lambda: counters)
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("process_iter must not be called")
+
+    monkeypatch.setattr(memory_sources.psutil, "process_iter", no_scan)
+
+    assert read_fault_counters() == {"page_faults": 50, "swap_in_bytes": 80 * 4096}
+
+    # PDH unavailable: unsupported rather than a process scan
+    monkeypatch.setattr(memory_sources, "windows_paging_counters", lambda: None)
+    assert read_fault_counters() == {"page_faults": None, "swap_in_bytes": None}
+
+class FakePsapi:
+    def GetPerformanceInfo(self, perf, size):
+        info = perf._obj
+        info.PageSize = 4096
+        info.PhysicalTotal = 1000
+        info.PhysicalAvailable = 400
+        info.CommitTotal = 900
+        info.CommitLimit = 1500
+        info.SystemCache = 100
+        return 1
+
+def test_collect_windows_swap_rates_from_pdh(monkeypatch):
+    """测试 Windows 快照的换入 / 换出字节数来自 PDH，使 swap_in_rate 阈值可以触发"""
+    monkeypatch.setattr(ctypes, "windll", type("windll", (), {"psapi": FakePsapi()}), raising=False)
+    counters = WindowsPagingCounters(FakePdh({r"\Memory\Pages Input/sec": 10, r"\Memory\Pages Output/sec": 3}))
+    monkeypatch.setattr(memory_sources, "windows_paging_counters", lambda: counters)
+
+    raw = memory_sources.collect_windows()
+    assert raw["swap_in_bytes"] == 10 * 4096
+    assert raw["swap_out_bytes"] == 3 * 4096
+    assert raw["swap_total"] == 500 * 4096
+    assert raw["swap_used"] == 300 * 4096
+
+    monkeypatch.setattr(memory_sources, "windows_paging_counters", lambda: None)
+    raw = memory_sources.collect_windows()
+    assert raw["swap_in_bytes"] is None
+    assert raw["swap_out_bytes"] is None
+
+def test_read_pressure(tmp_path):
+    """测试解析 PSI 压力文件"""
+    path = os.path.join(tmp_path, "memory")
+    with open(path, 'w') as f:
+        f.write("some avg10=1.50 avg60=0.80 avg300=0.20 total=4242\nfull avg10=0.00 avg60=0.00 avg300=0.00 total=17\n")
+    pressure = read_pressure(path)
+
+    assert pressure["some"] == {"avg10": 1.5, "avg60": 0.8, "avg300": 0.2, "total": 4242}
+    assert pressure["full"]["total"] == 17
+    assert read_pressure(os.path.join(tmp_path, "missing")) is None
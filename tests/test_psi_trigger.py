@@ -0,0 +1,81 @@
+import pytest
+import os
+import select
+import threading
+import time
+from src.cgroup import Cgroup
+from src.psi_trigger import HOST_PRESSURE_PATH, PsiTrigger, open_psi_trigger, pressure_path
+
+pytestmark = pytest.mark.skipif(not hasattr(select, "poll"), reason="PSI triggers need poll()")
+
+def test_trigger_registration_and_timeout(tmp_path):
+    """测试注册时写入触发参数，没有压力时等待超时"""
+    path = os.path.join(tmp_path, "memory")
+    open(path, 'w').close()
+
+    with PsiTrigger.from_percent(10, window_ms=2000, path=path) as trigger:
+        assert trigger.wait(0.01) == False
+    with open(path, 'rb') as f:
+        assert f.read() == b"some 200000 2000000\0"
+
+def test_interrupt_wakes_waiter(tmp_path):
+    """测试 interrupt() 唤醒其他线程中的 wait()"""
+    path = os.path.join(tmp_path, "memory")
+    open(path, 'w').close()
+    trigger = PsiTrigger(path=path).open()
+    result = []
+
+    waiter = threading.Thread(target=lambda: result.append(trigger.wait(30)))
+    start = time.monotonic()
+    waiter.start()
+    time.sleep(0.05)
+    trigger.interrupt()
+    waiter.join(5)
+
+    assert result == [False]
+    assert time.monotonic() - start < 5
+    trigger.close()
+    trigger.close()  # 可重复调用
+
+def test_validation():
+    """测试参数验证"""
+    with pytest.raises(ValueError, match="kind must be"):
+        PsiTrigger(kind="most")
+    with pytest.raises(ValueError, match="window_ms must be between"):
+        PsiTrigger(window_ms=100)
+    with pytest.raises(ValueError, match="stall_ms must be between"):
+        PsiTrigger(stall_ms=5000, window_ms=2000)
+    with pytest.raises(RuntimeError, match="not open"):
+        PsiTrigger().wait(0)
+
+def test_unavailable_trigger_returns_none(tmp_path):
+    """测试不支持 PSI 时返回 None"""
+    assert open_psi_trigger(10, path=os.path.join(tmp_path, "missing")) is None
+
+def test_trigger_follows_monitor_scope(tmp_path):
+    """测试 cgroup v2 范围监听该 cgroup 的 memory.pressure，v1 不注册，宿主机用 /proc/pressure/memory"""
+    v2 = Cgroup(str(tmp_path), 2)
+    open(os.path.join(tmp_path, "memory.pressure"), 'w').close()
+
+    assert pressure_path() == HOST_PRESSURE_PATH
+    assert pressure_path(v2) == os.path.join(tmp_path, "memory.pressure")
+    assert pressure_path(Cgroup(str(tmp_path), 1)) is None
+    assert open_psi_trigger(10, cgroup=Cgroup(str(tmp_path), 1)) is None
+
+    trigger = open_psi_trigger(10, cgroup=v2)
+    try:
+        assert trigger.path == os.path.join(tmp_path, "memory.pressure")
+    finally:
+        trigger.close()
+    with open(os.path.join(tmp_path, "memory.pressure"), 'rb') as f:
+        assert f.read() == b"some 200000 2000000\0"
+
+def test_real_trigger_if_supported():
+    """测试在支持 PSI 的内核上注册真实触发器"""
+    trigger = open_psi_trigger(10)
+    if trigger is None:
+        pytest.skip("kernel PSI triggers unavailable")
+    try:
+        assert trigger.wait(0.01) in (True, False)
+    finally:
+        trigger.close()
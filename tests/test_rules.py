@@ -0,0 +1,156 @@
+import pytest
+from datetime import datetime
+from src.rules import RuleEngine, RuleError, compile_rules, in_time_window, parse_time_window
+from src.memory_monitor import MemoryMonitor
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+SAMPLE = {"percent": 88.0, "available": 1.5, "commit_percent": 70.0, "swap_in_rate": None}
+
+STANDBY_RULE = {
+    "name": "purge-standby",
+    "when": {"all": [
+        {"metric": "available", "op": "<", "value": 2},
+        {"process": "msbuild*", "running": False}
+    ]},
+    "blackout": ["09:00-10:00"],
+    "cooldown": 600,
+    "action": {"type": "clean", "mode": "standby_list"}
+}
+
+def _engine(rules, processes=(), clock=None):
+    calls = []
+
+    def source():
+        calls.append(1)
+        return set(processes)
+
+    engine = RuleEngine(rules, metric_names=MemoryMonitor.EXTENDED_METRICS,
+                        clean_modes=("working_set", "standby_list"),
+                        process_source=source, clock=clock or FakeClock())
+    return engine, calls
+
+def test_rule_fires_with_params():
+    """测试满足条件时触发并带上动作参数"""
+    engine, _ = _engine([STANDBY_RULE])
+
+    actions = engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 14, 0))
+
+    assert len(actions) == 1
+    assert actions[0].rule == "purge-standby"
+    assert actions[0].type == "clean"
+    assert actions[0].params == {"mode": "standby_list"}
+
+def test_process_presence_blocks_rule():
+    """测试匹配的进程在运行时不触发（不区分大小写）"""
+    engine, _ = _engine([STANDBY_RULE], processes={"msbuild.exe"})
+    assert engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 14, 0)) == []
+
+    engine, _ = _engine([STANDBY_RULE], processes={"MSBuild.exe".lower()})
+    assert engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 14, 0)) == []
+
+def test_blackout_window():
+    """测试禁止时间窗口"""
+    engine, _ = _engine([STANDBY_RULE])
+    assert engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 9, 30)) == []
+    assert len(engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 10, 0))) == 1
+
+def test_cooldown():
+    """测试两次触发的最短间隔"""
+    clock = FakeClock()
+    engine, _ = _engine([STANDBY_RULE], clock=clock)
+    now = datetime(2025, 1, 15, 14, 0)
+
+    assert len(engine.evaluate(SAMPLE, now=now)) == 1
+    clock.now += 599
+    assert engine.evaluate(SAMPLE, now=now) == []
+    clock.now += 1
+    assert len(engine.evaluate(SAMPLE, now=now)) == 1
+
+def test_cheap_conditions_short_circuit_process_scan():
+    """测试指标不满足时不扫描进程列表，且每次评估最多扫描一次"""
+    rules = [dict(STANDBY_RULE, name=f"r{i}", cooldown=0) for i in range(20)]
+    engine, calls = _engine(rules)
+
+    engine.evaluate(dict(SAMPLE, available=8.0), now=datetime(2025, 1, 15, 14, 0))
+    assert calls == []
+
+    engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 14, 0))
+    assert calls == [1]
+
+def test_any_not_and_time_window():
+    """测试 any / not / 跨午夜时间窗口"""
+    rules = [{
+        "name": "night",
+        "when": {"any": [
+            {"time": "22:00-06:00"},
+            {"not": {"metric": "percent", "op": "<", "value": 95}}
+        ]},
+        "action": {"type": "notify", "message": "hi"}
+    }]
+    engine, _ = _engine(rules)
+
+    assert len(engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 23, 0))) == 1
+    assert len(engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 3, 0))) == 1
+    assert engine.evaluate(SAMPLE, now=datetime(2025, 1, 15, 12, 0)) == []
+    assert len(engine.evaluate(dict(SAMPLE, percent=96.0), now=datetime(2025, 1, 15, 12, 0))) == 1
+
+def test_time_window_helpers():
+    """测试时间窗口解析和跨午夜的判断"""
+    window = parse_time_window("quiet[0]", "22:00-06:30")
+    assert window == (22 * 60, 6 * 60 + 30)
+    assert in_time_window(window, 23 * 60) == True
+    assert in_time_window(window, 6 * 60 + 29) == True
+    assert in_time_window(window, 12 * 60) == False
+    assert in_time_window(parse_time_window("t", "09:00-24:00"), 23 * 60 + 59) == True
+
+    with pytest.raises(RuleError, match=r"quiet\[1\]"):
+        parse_time_window("quiet[1]", "25:00-26:00")
+
+def test_missing_metric_is_false():
+    """测试平台不提供的指标视为不满足"""
+    rules = [{"name": "swap", "when": {"metric": "swap_in_rate", "op": ">", "value": 1},
+              "action": {"type": "clean"}}]
+    engine, _ = _engine(rules)
+    assert engine.evaluate(SAMPLE) == []
+
+@pytest.mark.parametrize("rules, path", [
+    ("not a list", "rules"),
+    ([{"when": {"metric": "percent", "op": "=>", "value": 1}, "action": {"type": "clean"}}], "rules[0].when.op"),
+    ([{"when": {"metric": "bogus", "op": ">", "value": 1}, "action": {"type": "clean"}}], "rules[0].when.metric"),
+    ([{"when": {"all": [{"metric": "percent", "op": ">", "value": "80"}]}, "action": {"type": "clean"}}],
+     "rules[0].when.all[0].value"),
+    ([{"when": {"time": "9am-10am"}, "action": {"type": "clean"}}], "rules[0].when.time"),
+    ([{"when": {"process": "x", "running": "no"}, "action": {"type": "clean"}}], "rules[0].when.running"),
+    ([{"when": {"frobnicate": 1}, "action": {"type": "clean"}}], "rules[0].when"),
+    ([{"when": {"time": "01:00-02:00"}, "action": {"type": "reboot"}}], "rules[0].action.type"),
+    ([{"when": {"time": "01:00-02:00"}, "action": {"type": "clean", "mode": "everything"}}], "rules[0].action.mode"),
+    ([{"when": {"time": "01:00-02:00"}, "action": {"type": "clean"}, "cooldown": -1}], "rules[0].cooldown"),
+    ([{"when": {"time": "01:00-02:00"}}], "rules[0]"),
+    ([{"name": "a", "when": {"time": "01:00-02:00"}, "action": {"type": "clean"}},
+      {"name": "a", "when": {"time": "01:00-02:00"}, "action": {"type": "clean"}}], "rules[1].name"),
+])
+def test_validation_errors(rules, path):
+    """测试无效规则给出带路径的错误"""
+    with pytest.raises(RuleError) as excinfo:
+        compile_rules(rules, metric_names=MemoryMonitor.EXTENDED_METRICS, clean_modes=("working_set",))
+    assert excinfo.value.path == path
+    assert str(excinfo.value).startswith(path + ": ")
+
+def test_config_rules_validation(tmp_path):
+    """测试配置中的规则在设置时校验"""
+    import os
+    from src.config import ConfigManager
+    manager = ConfigManager(os.path.join(tmp_path, "config.json"))
+
+    assert manager.rules == []
+    manager.rules = [STANDBY_RULE]
+    assert manager.rules[0]["name"] == "purge-standby"
+
+    with pytest.raises(ValueError, match=r"rules\[0\]\.when\.op"):
+        manager.rules = [{"when": {"metric": "percent", "op": "~", "value": 1}, "action": {"type": "clean"}}]
@@ -0,0 +1,105 @@
+import pytest
+import threading
+from src.scheduler import MonitorScheduler
+
+class FakeMonitor:
+    def __init__(self, percents):
+        self._percents = list(percents)
+
+    def get_memory_info(self):
+        percent = self._percents.pop(0) if len(self._percents) > 1 else self._percents[0]
+        return {"total": 16.0, "used": 16.0 * percent / 100, "percent": percent, "available": 16.0 * (1 - percent / 100)}
+
+def test_tick_notifies_listeners():
+    """测试采样结果分发给监听器"""
+    scheduler = MonitorScheduler(FakeMonitor([42.0]))
+    seen = []
+    scheduler.add_listener(lambda info: seen.append(info["percent"]))
+
+    assert scheduler.last_sample is None
+    info = scheduler.tick()
+
+    assert info["percent"] == 42.0
+    assert seen == [42.0]
+    assert scheduler.last_sample is info
+
+def test_failing_listener_does_not_block_others():
+    """测试单个监听器异常不影响其他监听器"""
+    scheduler = MonitorScheduler(FakeMonitor([50.0]))
+    seen = []
+
+    def broken(info):
+        raise RuntimeError("boom")
+
+    scheduler.add_listener(broken)
+    scheduler.add_listener(lambda info: seen.append(info))
+    scheduler.tick()
+
+    assert len(seen) == 1
+
+def test_start_and_stop():
+    """测试后台采样线程启动与停止"""
+    scheduler = MonitorScheduler(FakeMonitor([50.0]), interval=0.01)
+    ticked = threading.Event()
+    scheduler.add_listener(lambda info: ticked.set())
+
+    scheduler.start()
+    assert ticked.wait(2)
+    scheduler.stop(timeout=2)
+    assert not scheduler.running
+
+def test_invalid_interval():
+    """测试无效采样间隔"""
+    with pytest.raises(ValueError, match="interval must be a positive number"):
+        MonitorScheduler(FakeMonitor([50.0]), interval=0)
+
+def test_sampler_controls_delay():
+    """测试提供采样器时由其决定等待时间"""
+    class StubSampler:
+        def next_interval(self, mem_info):
+            return 0.25
+
+    scheduler = MonitorScheduler(FakeMonitor([50.0]), interval=5, sampler=StubSampler())
+    assert scheduler._next_delay(scheduler.tick()) == 0.25
+    assert scheduler._next_delay(None) == 5
+
+def test_extended_sampling():
+    """测试 extended=True 时采集扩展信息"""
+    class ExtendedMonitor(FakeMonitor):
+        def get_extended_info(self):
+            info = self.get_memory_info()
+            info["commit_percent"] = 40.0
+            return info
+
+    scheduler = MonitorScheduler(ExtendedMonitor([50.0]), extended=True)
+    assert scheduler.tick()["commit_percent"] == 40.0
+
+def test_waker_cuts_sleep_short():
+    """测试唤醒源触发时立即采样，停止时被中断"""
+    class StubWaker:
+        def __init__(self):
+            self.interrupted = threading.Event()
+            self.timeouts = []
+
+        def wait(self, timeout):
+            self.timeouts.append(timeout)
+            if len(self.timeouts) == 1:
+                return True  # 第一次等待即有压力事件
+            self.interrupted.wait(timeout)
+            return False
+
+        def interrupt(self):
+            self.interrupted.set()
+
+    waker = StubWaker()
+    scheduler = MonitorScheduler(FakeMonitor([50.0]), interval=60, waker=waker)
+    ticks = []
+    second = threading.Event()
+    scheduler.add_listener(lambda info: (ticks.append(1), len(ticks) >= 2 and second.set()))
+
+    scheduler.start()
+    assert second.wait(2)  # 不必等 60 秒
+    scheduler.stop(timeout=2)
+    assert not scheduler.running
+    assert scheduler.wakeups == 1
+    assert waker.timeouts[0] == 60
@@ -0,0 +1,145 @@
+import pytest
+import gc
+import os
+import tracemalloc
+from src.self_watchdog import SelfWatchdog, format_report, trim_process_memory
+from src.scheduler import MonitorScheduler
+from src.clean_analytics import CleanAnalytics
+from src.adaptive_sampler import AdaptiveSampler
+from src.log_manager import LogManager
+from src.icon_renderer import render_memory_icon, clear_icon_cache, _render_cached
+
+MB = 1024 ** 2
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_over_budget_triggers_trim():
+    """测试 RSS 超预算时调用清理函数"""
+    rss = [100 * MB, 200 * MB, 120 * MB]
+    trimmed = []
+    watchdog = SelfWatchdog(
+        rss_budget_mb=150,
+        rss_source=lambda: rss.pop(0),
+        object_counter=lambda: 1000,
+        process_trimmer=lambda: trimmed.append("process")
+    )
+    watchdog.add_trim_callback("cache", lambda: trimmed.append("cache"))
+
+    first = watchdog.check()
+    assert not first["over_budget"]
+    assert trimmed == []
+
+    second = watchdog.check()
+    assert second["over_budget"]
+    assert second["trimmed"]
+    assert second["rss_growth_mb"] == 100.0
+    assert second["rss_after_trim_mb"] == 120.0
+    assert trimmed == ["cache", "process"]
+    assert watchdog.trim_count == 1
+    assert "超出预算" in format_report(second)
+
+def test_failing_trim_callback_is_isolated():
+    """测试单个清理函数出错不影响其他清理"""
+    called = []
+    watchdog = SelfWatchdog(rss_budget_mb=1, rss_source=lambda: 10 * MB,
+                            object_counter=lambda: 0, process_trimmer=lambda: called.append("process"))
+
+    def broken():
+        raise RuntimeError("boom")
+
+    watchdog.add_trim_callback("broken", broken)
+    watchdog.check()
+    assert called == ["process"]
+
+def test_maybe_check_respects_interval():
+    """测试检查间隔"""
+    clock = FakeClock()
+    watchdog = SelfWatchdog(interval=600, rss_source=lambda: 50 * MB, object_counter=lambda: 0, clock=clock)
+
+    assert watchdog.maybe_check() is not None
+    clock.now += 599
+    assert watchdog.maybe_check() is None
+    clock.now += 1
+    assert watchdog.maybe_check() is not None
+    assert len(watchdog.history) == 2
+
+def test_tracemalloc_reports_growing_site():
+    """测试 tracemalloc 报告增长最多的分配位置"""
+    watchdog = SelfWatchdog(use_tracemalloc=True, top_n=3)
+    leak = []
+    try:
+        watchdog.start()
+        for _ in range(2000):
+            leak.append(bytearray(512))
+        report = watchdog.check()
+    finally:
+        watchdog.stop()
+
+    assert not tracemalloc.is_tracing()
+    assert report["top_growth"]
+    site, size_kb, count = report["top_growth"][0]
+    assert site.startswith(__file__)
+    assert size_kb >= 1000
+
+def test_trim_process_memory_does_not_fail():
+    """测试收缩本进程内存在当前平台上可以调用"""
+    assert trim_process_memory() in (True, False)
+
+def test_icon_cache_is_bounded():
+    """测试图标缓存复用并有上限"""
+    clear_icon_cache()
+    assert render_memory_icon("red", 50) is render_memory_icon("red", 50.5)
+
+    for i in range(10000):
+        render_memory_icon(("green", "yellow", "red", "blue")[i % 4], i / 100)
+    assert _render_cached.cache_info().currsize <= 3 * 29
+
+    clear_icon_cache()
+    assert _render_cached.cache_info().currsize == 0
+
+def test_long_run_memory_is_bounded(tmp_path):
+    """模拟长时间运行：采样、绘制图标、统计和写日志，Python 堆不持续增长"""
+    class FakeMonitor:
+        def __init__(self):
+            self.i = 0
+
+        def get_extended_info(self):
+            self.i += 1
+            percent = 40 + (self.i % 50)
+            return {"total": 16.0, "used": 16.0 * percent / 100, "percent": float(percent),
+                    "available": 16.0 * (1 - percent / 100), "commit_percent": 30.0}
+
+    analytics = CleanAnalytics(state_file=None)
+    sampler = AdaptiveSampler()
+    logger = LogManager(os.path.join(tmp_path, "clean.log"), write_behind=True, flush_interval=60)
+    scheduler = MonitorScheduler(FakeMonitor(), extended=True, sampler=sampler)
+    scheduler.add_listener(lambda info: render_memory_icon("green", info["percent"]))
+    scheduler.add_listener(lambda info: analytics.record_sample(info["percent"]))
+
+    def run(ticks):
+        for i in range(ticks):
+            info = scheduler.tick()
+            sampler.next_interval(info)
+            if i % 50 == 0:
+                logger.add_clean_log(info["percent"], 40.0, 1.0)
+                analytics.record_clean(info["percent"], 40.0, 1.0)
+
+    tracemalloc.start()
+    try:
+        run(2000)  # warm up caches and bounded buffers
+        gc.collect()
+        warm, _ = tracemalloc.get_traced_memory()
+        run(20000)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        logger.close()
+
+    assert after - warm < 256 * 1024
+    assert len(logger.get_recent_logs(limit=1000)) <= LogManager.MAX_LOGS
@@ -0,0 +1,308 @@
+import pytest
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from multiprocessing.connection import Client
+from src.clean_backends import FakeBackend
+from src.alerts import CallbackNotifier
+from src.config import ConfigManager
+from src.idle_detector import FakeIdleDetector
+from src.log_manager import LogManager
+from src.memory_cleaner import MemoryCleaner
+from src.memory_monitor import MemoryMonitor
+from src.service import (MemoryService, ServiceClient, ServiceError, default_key_file,
+                         load_or_create_authkey, secure_runtime_dir)
+from src.service_host import PosixDaemonHost, read_pidfile, scheduled_task_command
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="harness uses Unix sockets")
+
+AUTHKEY = b"test-key"
+
+def _service(tmp_path, **kwargs):
+    config = ConfigManager(os.path.join(tmp_path, "config.json"))
+    config.refresh_interval = 0.05
+    monitor = MemoryMonitor()
+    cleaner = MemoryCleaner(monitor=monitor, backend=FakeBackend(modes=("working_set", "standby_list")))
+    log_manager = LogManager(os.path.join(tmp_path, "clean.log"))
+    kwargs.setdefault("address", os.path.join(tmp_path, "service.sock"))
+    return MemoryService(config=config, monitor=monitor, cleaner=cleaner, log_manager=log_manager,
+                         authkey=AUTHKEY, **kwargs)
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+@pytest.fixture
+def hosted(tmp_path):
+    """在 POSIX 宿主中运行服务（不 fork，不注册信号），结束时停止"""
+    service = _service(tmp_path)
+    host = PosixDaemonHost(pidfile=os.path.join(tmp_path, "service.pid"), detach=False, install_signals=False)
+    thread = threading.Thread(target=host.run, args=(service,), daemon=True)
+    thread.start()
+    assert _wait_for(lambda: service.state == "running" and service.samples > 0)
+    yield service, host, ServiceClient(service.address, authkey=AUTHKEY, timeout=5)
+    host.stop()
+    thread.join(5)
+
+def test_lifecycle_under_daemon_host(hosted, tmp_path):
+    """测试宿主启动服务、写 pid 文件，停止后清理 pid 文件"""
+    service, host, client = hosted
+
+    assert client.ping() == True
+    health = client.health()
+    assert health["healthy"] == True
+    assert health["state"] == "running"
+    assert health["backend"] == "fake"
+    assert health["clients"] == 1
+    assert read_pidfile(os.path.join(tmp_path, "service.pid")) == os.getpid()
+    assert "percent" in client.call("status")
+
+    client.close()
+    host.stop()
+    assert _wait_for(lambda: service.state == "stopped")
+    assert service.health()["healthy"] == False
+    assert not os.path.exists(os.path.join(tmp_path, "service.pid"))
+    assert client.ping() == False
+
+def test_clean_through_channel(hosted):
+    """测试客户端请求清理，服务写日志并限制请求频率"""
+    service, host, client = hosted
+
+    result = client.clean("standby_list", trigger="manual")
+    assert result["success"] == True
+    assert result["mode"] == "standby_list"
+    logs = client.call("recent_logs", limit=5)
+    assert logs[-1]["id"] == result["log_id"]
+    assert logs[-1]["trigger"] == "manual"
+
+    with pytest.raises(ServiceError, match="too soon"):
+        client.clean()
+    events = client.call("events", since=0)
+    assert [e["type"] for e in events] == ["clean"]
+    assert client.call("events", since=events[-1]["seq"]) == []
+
+def test_service_alerts_reach_the_tray(hosted):
+    """测试服务评估的告警经事件队列转交给托盘的通知器，启动前的旧告警不补发"""
+    from src.alerts import CRITICAL, ServiceAlertRelay
+
+    service, host, client = hosted
+    shown = []
+    relay = ServiceAlertRelay(client.events, [CallbackNotifier(shown.append)])
+    service._add_event("alert", {"key": "percent", "level": "warning", "message": "old"})
+    assert relay.poll() == []
+
+    service._on_sample({"percent": 97.0})
+    relay.poll()
+    assert [(a.key, a.level) for a in shown] == [("percent", CRITICAL)]
+    assert "97.0%" in shown[0].message
+
+def test_auto_clean_withdrawn_when_usage_drops(tmp_path):
+    """测试自动清理请求在系统空闲前、使用率已回落时被撤回"""
+    service = _service(tmp_path, address="")
+    service.config.auto_clean = True
+    service.config.auto_clean_threshold = 80
+    service._build()
+    service.deferred._idle_detector = FakeIdleDetector(idle=False)
+
+    service._on_sample({"percent": 85})
+    assert service.deferred.pending["reason"] == "auto_clean"
+    service._on_sample({"percent": 60})
+    assert service.deferred.pending is None
+
+    service.deferred._idle_detector.idle = True
+    service._on_sample({"percent": 60})
+    assert service.cleans == 0
+
+def test_commands_are_allowlisted(tmp_path):
+    """测试只接受白名单中的命令和参数"""
+    service = _service(tmp_path, address="")
+    service.start()
+    try:
+        assert service.handle({"cmd": "shutdown"}) == {"ok": False, "error": "unknown command 'shutdown'"}
+        assert "unexpected arguments" in service.handle({"cmd": "ping", "args": {"x": 1}})["error"]
+        assert "mode must be one of" in service.handle({"cmd": "clean", "args": {"mode": "rm -rf"}})["error"]
+        for trigger in ("unknown", "auto", "remote"):
+            # Only the service itself records automatic cleans
+            error = service.handle({"cmd": "clean", "args": {"trigger": trigger}})["error"]
+            assert "trigger must be one of ['manual', 'rule']" in error
+        assert "limit must be" in service.handle({"cmd": "recent_logs", "args": {"limit": 10 ** 6}})["error"]
+        assert service.handle(["ping"]) == {"ok": False, "error": "request must be an object"}
+    finally:
+        service.stop()
+
+def test_pickled_requests_are_not_loaded(hosted):
+    """测试通道只接受 JSON，不反序列化 pickle"""
+    service, host, client = hosted
+    conn = Client(service.address, family="AF_UNIX", authkey=AUTHKEY)
+    try:
+        conn.send({"cmd": "ping"})  # pickled
+        assert json.loads(conn.recv_bytes()) == {"ok": False, "error": "request must be JSON"}
+    finally:
+        conn.close()
+
+def test_wrong_key_is_rejected(hosted):
+    """测试密钥错误时握手失败，服务继续接受其他连接"""
+    service, host, client = hosted
+    intruder = ServiceClient(service.address, authkey=b"wrong", timeout=1)
+
+    with pytest.raises(ServiceError, match="rejected the key"):
+        intruder.call("ping")
+    assert client.ping() == True
+
+def test_bad_peers_do_not_block_the_channel(hosted):
+    """测试不握手的连接和 accept 失败都不会阻塞或停止命令通道"""
+    service, host, client = hosted
+    server = service._server
+    server.handshake_timeout = 0.2
+    accept = server._listener.accept
+    failures = []
+
+    def flaky_accept():
+        if not failures:
+            failures.append(1)
+            raise ConnectionResetError("reset by peer")
+        return accept()
+
+    server._listener.accept = flaky_accept
+    silent = socket.socket(socket.AF_UNIX)
+    silent.settimeout(5)
+    silent.connect(service.address)
+    try:
+        assert client.ping() == True
+        assert failures == [1]
+        assert server.running == True
+        assert client.health()["channel_running"] == True
+        # The silent peer gets the challenge, then is dropped when the handshake times out
+        assert silent.recv(1024)
+        assert _wait_for(lambda: silent.recv(1024) == b"")
+    finally:
+        silent.close()
+
+def test_health_reports_dead_channel(hosted):
+    """测试命令通道的线程退出后服务不再报告健康"""
+    service, host, client = hosted
+    assert service.health()["healthy"] == True
+
+    finished = threading.Thread(target=lambda: None)
+    finished.start()
+    finished.join()
+    service._server._thread = finished
+    assert service.health()["channel_running"] == False
+    assert service.health()["healthy"] == False
+
+def test_failed_start_stops_everything(tmp_path, monkeypatch):
+    """测试命令通道启动失败时抛出原始错误，采样线程和日志线程都已停止"""
+    from src.service import CommandServer
+
+    def refuse(self):
+        raise OSError("address in use")
+
+    monkeypatch.setattr(CommandServer, "start", refuse)
+    service = _service(tmp_path)
+    with pytest.raises(OSError, match="address in use") as e:
+        service.start()
+
+    assert not isinstance(e.value.__context__, AttributeError)
+    assert service.state == "stopped"
+    assert service.scheduler.running == False
+    assert service.health()["healthy"] == False
+
+def test_pidfile_blocks_second_instance(tmp_path):
+    """测试 pid 文件中的进程仍在运行时拒绝再次启动，失效的 pid 文件被忽略"""
+    pidfile = os.path.join(tmp_path, "service.pid")
+    with open(pidfile, 'w') as f:
+        f.write(f"{os.getpid()}\n")
+    host = PosixDaemonHost(pidfile=pidfile, detach=False, install_signals=False)
+    with pytest.raises(RuntimeError, match="already running"):
+        host.run(_service(tmp_path))
+
+    with open(pidfile, 'w') as f:
+        f.write("not a pid")
+    assert read_pidfile(pidfile) is None
+
+def test_authkey_file(tmp_path):
+    """测试密钥文件只对所有者可读，再次读取得到相同的密钥"""
+    path = os.path.join(tmp_path, "run", "service.key")
+    with pytest.raises(ServiceError, match="not found"):
+        load_or_create_authkey(path, create=False)
+
+    key = load_or_create_authkey(path)
+    assert len(key) == 64
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert load_or_create_authkey(path, create=False) == key
+
+def test_runtime_dir_must_belong_to_service(tmp_path):
+    """测试运行时目录被其他用户预先创建或其他用户可写时拒绝使用"""
+    path = os.path.join(tmp_path, "run")
+    assert secure_runtime_dir(path) == path
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+    os.chmod(path, 0o777)
+    with pytest.raises(ServiceError, match="writable by other users"):
+        load_or_create_authkey(os.path.join(path, "service.key"))
+    assert not os.path.exists(os.path.join(path, "service.key"))
+
+    if os.geteuid() == 0:
+        os.chmod(path, 0o755)
+        os.chown(path, 65534, -1)
+        with pytest.raises(ServiceError, match="not a directory owned by this user"):
+            secure_runtime_dir(path)
+
+def _ping_as(address, uid, gids):
+    """在以其他用户身份运行的子进程中 ping 服务，返回子进程的退出码"""
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            os.setgroups(gids)
+            os.setgid(gids[0])
+            os.setuid(uid)
+            code = 0 if ServiceClient(address, timeout=5).ping() else 2
+        finally:
+            os._exit(code)
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="needs root to switch users")
+def test_unprivileged_client_in_service_group(tmp_path):
+    """测试 root 服务的套接字和密钥对 service_group 中的普通用户可用，组外的用户无法连接"""
+    import grp
+    import pwd
+    import shutil
+    import tempfile
+
+    nobody = pwd.getpwnam("nobody")
+    # Outside tmp_path, which other users cannot traverse
+    run_dir = os.path.join(tempfile.gettempdir(), f"wmc-test-{os.getpid()}-{time.monotonic_ns()}")
+    address = os.path.join(run_dir, "service.sock")
+    config = ConfigManager(os.path.join(tmp_path, "config.json"))
+    config.refresh_interval = 0.05
+    config.service_group = grp.getgrgid(nobody.pw_gid).gr_name
+    service = MemoryService(config=config, cleaner=MemoryCleaner(backend=FakeBackend()),
+                            log_manager=LogManager(os.path.join(tmp_path, "clean.log")), address=address)
+    try:
+        service.start()
+        assert stat.S_IMODE(os.stat(run_dir).st_mode) == 0o750
+        assert stat.S_IMODE(os.stat(address).st_mode) == 0o660
+        assert stat.S_IMODE(os.stat(default_key_file(address)).st_mode) == 0o640
+        assert os.stat(default_key_file(address)).st_gid == nobody.pw_gid
+
+        assert _ping_as(address, nobody.pw_uid, [nobody.pw_gid]) == 0
+        assert _ping_as(address, nobody.pw_uid, [1]) == 2
+    finally:
+        service.stop()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+def test_scheduled_task_command():
+    """测试计划任务以 SYSTEM 身份开机运行 --service"""
+    command = scheduled_task_command(python=r"C:\Python\python.exe", script=r"C:\app\main.py")
+
+    assert command[:2] == ["schtasks", "/Create"]
+    assert command[command.index("/RU") + 1] == "SYSTEM"
+    assert command[command.index("/SC") + 1] == "ONSTART"
+    assert command[-1] == r'"C:\Python\python.exe" "C:\app\main.py" --service run'